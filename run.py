@@ -1,14 +1,19 @@
+import argparse
 import json
 
 from src.config import Config
 from src.pipeline.matching import match_recipes_pipeline
 from src.pipeline.questions import process_questions_pipeline
 from src.pipeline.recipes import process_recipes_pipeline
-from src.utils.misc import get_output_df, normalise_keys
+from src.utils.misc import normalise_keys
 
 
-def main():
-    """Main pipeline"""
+def main(retry_dead_letters: bool = False):
+    """Main pipeline
+
+    Args:
+        retry_dead_letters (bool): Whether to re-run the LLM extraction of the items that failed in a previous run.
+    """
     print("Starting pipeline")
 
     # Get data paths
@@ -20,6 +25,7 @@ def main():
     questions_data = process_questions_pipeline(
         input_path=paths["input_questions_path"],
         output_path=paths["output_questions_path"],
+        retry_dead_letters=retry_dead_letters,
     )
 
     # Process recipes
@@ -31,24 +37,30 @@ def main():
         input_path=paths["input_recipes_path"],
         recipes_output_path=paths["output_recipes_path"],
         restaurant_output_path=paths["output_restaurants_path"],
+        retry_dead_letters=retry_dead_letters,
+        legal_quantities_output_path=paths["output_legal_quantities_path"],
+        technique_groups_output_path=paths["output_technique_groups_path"],
     )
 
-    # Match recipes with questions
+    # Match recipes with questions, results are written as they come
     print("Matching recipes with questions")
-    questions_recipes_mapped = match_recipes_pipeline(
-        output_path=paths["output_result_json"],
+    match_recipes_pipeline(
+        output_path=paths["output_result_jsonl"],
+        csv_output_path=paths["output_result_path"],
         recipes_data=recipes_data,
         questions_data=questions_data,
         mapping=recipes_mapping,
     )
 
-    # Save results
-    print("Saving results")
-    df = get_output_df(questions_recipes_mapped)
-    df.to_csv(paths["output_result_path"], index=False)
-
     # print("Pipeline completed successfully")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Hackapizza pipeline")
+    parser.add_argument(
+        "--retry-dead-letters",
+        action="store_true",
+        help="re-run the LLM extraction only for the items that failed in a previous run",
+    )
+    args = parser.parse_args()
+    main(retry_dead_letters=args.retry_dead_letters)
@@ -9,6 +9,60 @@ class Config:
     provider = "groq"
     model = "deepseek-r1-distill-llama-70b"  # "deepseek-r1-distill-llama-70b",  "llama-3.3-70b-versatile"
 
+    # llm clients, keys ending in "_env" are read from the environment
+    provider_configs = {
+        "groq": {"api_key_env": "GROQ_API_KEY", "timeout": 60},
+    }
+
+    # provider budgets, requests and tokens (prompt + expected completion) per minute
+    rate_limits = {
+        "default": {"rpm": 1_000, "tpm": 300_000},
+        "groq": {"rpm": 1_000, "tpm": 300_000},
+    }
+    expected_completion_tokens = 500
+    llm_max_attempts = 6
+    backoff_multiplier = 1  # seconds, doubled at every retry
+    backoff_max = 60  # seconds
+
+    # offline provider, selected with provider = "mock"
+    mock_mode = "synthetic"  # "record", "replay" or "synthetic"
+    mock_record_provider = "groq"  # real provider used in "record" mode
+    mock_recordings_path = Path("data/recordings/llm.jsonl")
+    mock_latency_mean = 0.5  # seconds
+    mock_latency_std = 0.1
+    mock_error_rate = 0.0
+    mock_rate_limit_rate = 0.0
+    mock_seed = 0
+
+    # llm extraction
+    max_concurrency = 16  # number of requests in flight at once
+    batch_token_budget = 3000  # estimated tokens of recipe text per batched request
+    batch_max_items = 10
+
+    # llm response cache
+    use_cache = True
+    cache_path = Path("data/cache/llm_cache.sqlite")
+    cache_max_entries = 100_000
+    cache_max_age_days = 30
+
+    # matching, "index" answers the questions one by one, "batch" all at once with matrix products
+    matching_mode = "index"
+    batch_matching_chunk_size = 1024  # questions per matrix product
+    matching_workers = 1  # processes of the "index" mode, 1 matches in the current process
+    matching_chunk_size = 256  # questions sent to a worker at once
+    match_cache_max_entries = 100_000  # matches kept by canonical question key
+    matching_stream_window = 4096  # questions matched before their results are written
+    matching_profile_path = None  # e.g. data_path / "matching_profile.json", records every filter stage
+
+    # question ingredients and techniques that no recipe holds are reported, and replaced
+    # with the closest recipe term when snap_question_terms is set
+    snap_question_terms = False
+    question_terms_cutoff = 0.8
+
+    # snapping of extracted strings to the lookup lists, "difflib" or "trigram" (large lists)
+    fuzzy_method = "difflib"
+    fuzzy_cutoff = 0.0  # values below this similarity are kept as they are
+
     # data paths
     data_path = Path("data/debug") if debug else Path("data/processed")
     data_path_dict = {
@@ -20,13 +74,16 @@ class Config:
         "output_questions_path": data_path / "questions.json",
         "output_recipes_path": data_path / "recipes.json",
         "output_restaurants_path": data_path / "restaurants.json",
-        "output_result_json": data_path / "result.json",
+        "output_legal_quantities_path": data_path / "legal_quantities.json",
+        "output_technique_groups_path": data_path / "technique_groups.json",
+        "output_result_jsonl": data_path / "result.jsonl",
         "output_result_path": data_path / "result.csv",
     }
     distances_path = Path("data/raw/Misc/Distanze.csv")
+    planet_index_cache_path = Path("data/cache/planet_distances.npz")  # keyed by CSV hash
     illegal_ingredients_path = Path("data/raw/illegal_ingredients.csv")
 
-    # prompt templates
+    # prompt templates, the static part comes first so provider-side prefix caching can hit
     # questions
     system_message_template_questions = """
     You are a helpful assistant that parses the request of the user.
@@ -111,7 +168,7 @@ class Config:
         "group": null,
         "licence_name": certificazione di grado tecnologico LTK ,
         "licence_level": 1,
-        "licence_condition": "greater",
+        "licence_condition": "higher",
         "planet": ["Asgard"],
         "planet_distance": null,
         "galactic_code": [],
@@ -123,9 +180,9 @@ class Config:
     }}
     """
     message_template_questions = """
-    This is the client request: {request}.
     Don't translate, you must keep the original text language.
     Return only the JSON instance representing the request, with every field (empty ones as well).
+    This is the client request: {request}
     """
 
     # recipes
@@ -140,9 +197,34 @@ class Config:
         - Grigliatura Elettro Molecolare A Spaziatura Variabile
     """
     message_template_recipes = """
-    This is the text containing information about the recipe: {request}.
     Don't translate, you must keep the original text language.
     Return only the JSON instance representing information about the recipe.
+    This is the text containing information about the recipe: {request}
+    """
+
+    # validation of the answers, invalid fields that can't be coerced are asked again
+    coercion_cutoff = 0.6  # similarity needed to snap an out-of-vocabulary literal
+    coercion_rounds = 3
+    message_template_reask = """
+    Don't translate, you must keep the original text language.
+    Some fields of your previous answer were not valid:
+    {errors}
+    Return only a JSON object with these fields:
+    {fields}
+    This is the text: {request}
+    """
+
+    # batched requests
+    message_template_batch = """
+    Don't translate, you must keep the original text language.
+    Extract the information of every text below independently.
+    Return only a JSON object with a single key "items": a list with one JSON instance per text, each with an additional "item_id" key holding the id of the text.
+    These are the texts, each one introduced by its item id:
+    {requests}
+    """
+    batch_item_template = """
+    ### item_id: {item_id}
+    {request}
     """
 
     # restaurant
@@ -163,7 +245,7 @@ class Config:
     If licences are mentioned in the text, there might be either the name (e.g "licenza pisonica") or the abbreviation (e.g licenza "P"), always report the full name.
     """
     message_template_restaurant = """
-    This is the text containing information about the restaurant: {request}.
     Don't translate, you must keep the original text language.
     Return only the JSON instance representing information about the restaurant.
+    This is the text containing information about the restaurant: {request}
     """
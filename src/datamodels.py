@@ -1,16 +1,32 @@
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field, conlist
+from pydantic import BaseModel, ConfigDict, Field, conlist
+from typing_extensions import TypedDict
+
+# conditions on the ingredients or techniques of a request, "and", "or" and "not" are
+# keywords so the functional syntax is used
+RequestClause = TypedDict(
+    "RequestClause",
+    {
+        "and": Optional[List[str]],
+        "or": Optional[List[str]],
+        "or_length": Optional[int],
+        "not": Optional[List[str]],
+    },
+    total=False,
+)
+# unknown keys are errors, so that a misspelled one is snapped rather than dropped
+RequestClause.__pydantic_config__ = ConfigDict(extra="forbid")
 
 
 class RequestModel(BaseModel):
     """A Pydantic model to extract and validate the request information from clients."""
 
-    ingredients: Dict[Literal["and", "or", "or_length", "not"], List[str]] = Field(
+    ingredients: RequestClause = Field(
         default=None,
         description="Dictionary with keys: 'and' for desired ingredients, 'or' for optional ingredients, 'or_length' for the length of optional ingredients ('A or B' would be 1, 'at least two would' be 2,...) and 'not' for undesired ingredients",
     )
-    techniques: Dict[Literal["and", "or", "or_length", "not"], List[str]] = Field(
+    techniques: RequestClause = Field(
         default=None,
         description="Dictionary with keys: 'and' for desired techniques, 'or' for optional techniques, 'or_length' for the length of optional techniques ('A or B' would be 1, 'at least two would' be 2,...), 'not' for undesired techniques",
     )
@@ -67,25 +83,28 @@ class RequestModel(BaseModel):
         "licenza luce (C)",
         "licenza tecnologica LTK",
     ] = Field(default=None, description="Name of the license")
-    licence_level: str = Field(
+    licence_level: Union[str, int] = Field(
         default=None,
         description="Level of the license",
     )
     licence_condition: Literal["higher", "equal"] = Field(
         default=None, description="Condition for the license level"
     )
-    planet: Literal[
-        "Tatooine",
-        "Asgard",
-        "Namecc",
-        "Arrakis",
-        "Krypton",
-        "Pandora",
-        "Cybertron",
-        "Ego",
-        "Montressosr",
-        "Klyntar",
-    ] = Field(
+    planet: conlist(
+        Literal[
+            "Tatooine",
+            "Asgard",
+            "Namecc",
+            "Arrakis",
+            "Krypton",
+            "Pandora",
+            "Cybertron",
+            "Ego",
+            "Montressosr",
+            "Klyntar",
+        ],
+        min_length=0,
+    ) = Field(
         default=None,
         description="List of desired planets",
     )
@@ -178,7 +197,7 @@ class RestaurantModel(BaseModel):
             "licenza luce (C)",
             "licenza tecnologica LTK",
         ],
-        str,
+        Union[str, int],
     ] = Field(
         default=None,
         description="List of licenses held by the chef with their levels (e.g. {'licenza psionica (P)': 'II', 'licenza quantica (Q)': 'VI+',...})",
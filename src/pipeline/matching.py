@@ -1,92 +1,244 @@
+import csv
 import json
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 
-from src.utils.matching import (
-    check_additional_filters,
-    check_and_conditions,
-    check_not_conditions,
-    check_or_conditions,
-)
+from src.config import Config
+from src.utils.batch_matching import BatchMatcher
+from src.utils.match_cache import corpus_version, get_match_cache
+from src.utils.match_profile import save_profiles
+from src.utils.misc import format_result_ids
+from src.utils.parallel_matching import ParallelMatcher
+from src.utils.recipe_index import RecipeIndex
+from src.utils.terms import find_unknown_terms, snap_question_terms, term_dictionaries
 
 
 def match_recipes_pipeline(
     output_path: Path | str,
+    csv_output_path: Path | str,
     recipes_data: List[Dict],
     questions_data: List[Dict],
     mapping: Dict,
-):
+) -> int:
     """
-    Matches recipes with questions and maps dishes, then saves the result to a JSON file.
+    Matches recipes with questions and maps dishes, writing each result as soon as it is ready.
+    Results go to `<output>.partial` files, renamed once every question is matched. After a crash
+    the next run keeps the complete results of the partial files and goes on from there.
     Args:
-        output_path (Path|str): Path to the output JSON file.
+        output_path (Path|str): Path to the output JSONL file, one question with its matches per line.
+        csv_output_path (Path|str): Path to the output CSV file, with the row_id and result columns.
         recipes_data (list): List of recipes.
         questions_data (list): List of questions.
         mapping (dict): Dictionary containing the dish mappings.
     Returns:
-        list: List of questions with matching recipes and mapped dishes.
+        int: Number of questions in the outputs.
     """
     output_file = Path(output_path)
+    csv_file = Path(csv_output_path)
 
-    if output_file.exists():
+    if output_file.exists() and csv_file.exists():
+        print(f"Results already in {output_file}")
         with output_file.open("r") as f:
-            questions_recipes_mapped = json.load(f)
-    else:
-        questions_recipes = match_recipes(recipes_data, questions_data)
-        questions_recipes_mapped = map_dishes(questions_recipes, mapping)
-
-        with output_file.open("w") as f:
-            json.dump(questions_recipes_mapped, f, indent=4)
-
-    return questions_recipes_mapped
-
-
-def match_recipes(recipe_data: List[Dict], question_data: List[Dict]) -> List[Dict]:
+            return sum(1 for _ in f)
+
+    resolve_question_terms(recipes_data, questions_data)
+
+    partial_file = output_file.with_name(output_file.name + ".partial")
+    partial_csv_file = csv_file.with_name(csv_file.name + ".partial")
+    done = load_partial_results(partial_file)
+    if done:
+        print(f"Resuming after {len(done)} matched questions")
+
+    with (
+        partial_file.open("w") as f_json,
+        partial_csv_file.open("w", newline="") as f_csv,
+    ):
+        writer = csv.writer(f_csv, lineterminator="\n")
+        writer.writerow(["row_id", "result"])
+        for record in done:
+            f_json.write(json.dumps(record) + "\n")
+            writer.writerow(
+                [record["row_id"], format_result_ids(record["matching_recipes_ids"])]
+            )
+
+        start = len(done)
+        stream = stream_matches(
+            recipes_data,
+            questions_data[start:],
+            mapping,
+            profile_path=Config.matching_profile_path,
+        )
+        for idx, names, ids in stream:
+            idx += start
+            record = {
+                "row_id": idx + 1,
+                **questions_data[idx],
+                "matching_recipes": names,
+                "matching_recipes_ids": ids,
+            }
+            f_json.write(json.dumps(record) + "\n")
+            writer.writerow([idx + 1, format_result_ids(ids)])
+            if (idx + 1) % Config.matching_stream_window == 0:
+                f_json.flush()
+                f_csv.flush()
+
+    partial_file.replace(output_file)
+    partial_csv_file.replace(csv_file)
+
+    return len(questions_data)
+
+
+def resolve_question_terms(
+    recipes_data: List[Dict], questions_data: List[Dict]
+) -> Dict:
     """
-    Matches recipes with the corresponding ingredients and techniques.
+    Reports the question terms that no recipe holds in the clause's field, snapping them to
+    the closest term of that field first when Config.snap_question_terms is set.
+    Args:
+        recipes_data (list): List of recipes.
+        questions_data (list): List of questions, updated in place when snapping.
     Returns:
-        list: A list of questions with appended matching recipes.
+        dict: Positions of the questions using each (clause key, term) still unknown.
     """
-    keys = [
-        ("ingredients", "recipe_ingredients"),
-        ("techniques", "recipe_techniques"),
-    ]
-
-    for question in question_data:
-        matching_recipes = []
-
-        for recipe in recipe_data:
-            if not check_and_conditions(question, recipe, keys):
-                continue  # skip recipe
-            if not check_or_conditions(question, recipe, keys):
-                continue
-            if not check_not_conditions(question, recipe, keys):
-                continue
-            if not check_additional_filters(question, recipe):
-                continue
-
-            matching_recipes.append(recipe.get("recipe_name"))
-
-        question["matching_recipes"] = matching_recipes
-
-    return question_data
+    dictionaries = term_dictionaries(recipes_data)
+    if Config.snap_question_terms:
+        snap_question_terms(
+            questions_data,
+            dictionaries,
+            method=Config.fuzzy_method,
+            cutoff=Config.question_terms_cutoff,
+        )
+
+    unknown = find_unknown_terms(questions_data, dictionaries)
+    if unknown:
+        questions = {i for positions in unknown.values() for i in positions}
+        print(
+            f"{len(unknown)} question terms are in no recipe, "
+            f"used by {len(questions)} questions: "
+            + ", ".join(f"{term} ({q_key})" for q_key, term in list(unknown)[:10])
+            + (", ..." if len(unknown) > 10 else "")
+        )
+    return unknown
+
+
+def load_partial_results(partial_path: Path) -> List[Dict]:
+    """Reads the complete records of a partial JSONL output, stopping at a truncated line."""
+    records = []
+    if not partial_path.exists():
+        return records
+    with partial_path.open("r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def stream_matches(
+    recipe_data: List[Dict],
+    question_data: Iterable[Dict],
+    mapping: Dict,
+    mode: str = None,
+    profile_path: Path | str = None,
+) -> Iterator[Tuple[int, List[str], List[int]]]:
+    """
+    Matches the questions window by window and yields the results in question order.
+    Args:
+        recipe_data (list): List of recipes.
+        question_data (iterable): Questions, possibly a generator.
+        mapping (dict): Dish ids by recipe name; recipes without an id are left out of the ids.
+        mode (str): "index" or "batch", defaults to Config.matching_mode.
+        profile_path (str): If given, every question is matched on its own with
+            `RecipeIndex.explain` and the reports are saved there, with a summary per stage.
+    Yields:
+        tuple: Position of the question, names of the matching recipes and their dish ids.
+    """
+    index = RecipeIndex(recipe_data)
+
+    def resolve(recipe_ids: List[int]) -> Tuple[List[str], List[int]]:
+        names = [recipe_data[i].get("recipe_name") for i in recipe_ids]
+        return names, [mapping[name] for name in names if name in mapping]
+
+    if profile_path is not None:
+        reports = []
+        for idx, question in enumerate(question_data):
+            recipe_ids, report = index.explain(question)
+            reports.append({"question_index": idx, **report})
+            yield idx, *resolve(recipe_ids)
+
+        summary = save_profiles(reports, profile_path)
+        print(f"Matching profile saved to {profile_path}")
+        print(summary.to_string(index=False))
+        return
+
+    # identical questions are matched once, see canonical_question_key
+    cache = get_match_cache()
+    cache.use_version(corpus_version(recipe_data))
+
+    questions = iter(question_data)
+    start = 0
+    # the evaluator, and its worker processes, serve every window
+    with get_evaluator(index, mode or Config.matching_mode) as evaluate:
+        while window := list(islice(questions, Config.matching_stream_window)):
+            for offset, recipe_ids in enumerate(cache.match(window, evaluate)):
+                yield start + offset, *resolve(recipe_ids)
+            start += len(window)
+
+    stats = cache.stats()
+    print(
+        f"Match cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate)"
+    )
+
+
+@contextmanager
+def get_evaluator(
+    index: RecipeIndex, mode: str
+) -> Iterator[Callable[[List[Dict]], List[List[int]]]]:
+    """
+    Provides the function matching a list of questions on the index, for the `with` block.
+    Args:
+        index (RecipeIndex): Index of the recipes.
+        mode (str): "index" answers the questions one by one with bitset operations, on
+            Config.matching_workers processes started once for the block; "batch" evaluates
+            them together with matrix products.
+    Yields:
+        callable: Function returning the positions of the matching recipes of each question.
+    """
+    if mode == "batch":
+        yield BatchMatcher(index, chunk_size=Config.batch_matching_chunk_size).match
+    elif mode == "index":
+        with ParallelMatcher(
+            index,
+            workers=Config.matching_workers,
+            chunk_size=Config.matching_chunk_size,
+        ) as matcher:
+            yield matcher.match
+    else:
+        raise ValueError(f"Unknown matching mode: {mode}")
 
 
-def map_dishes(data: List[Dict], mapping: Dict) -> List[Dict]:
+def match_recipes(
+    recipe_data: List[Dict],
+    question_data: List[Dict],
+    mode: str = None,
+    profile_path: Path | str = None,
+) -> List[Dict]:
     """
-    Maps dishes to their identifiers and adds the mapping to each question.
+    Matches recipes with the corresponding ingredients and techniques.
     Args:
-        data (list): List of questions with matching recipes.
-        mapping (dict): Dictionary containing the dish mappings.
+        recipe_data (list): List of recipes.
+        question_data (list): List of questions.
+        mode (str): "index" or "batch", defaults to Config.matching_mode.
+        profile_path (str): If given, path of the per-stage matching profile, see stream_matches.
     Returns:
-        list: List of questions with added dish mappings.
+        list: A list of questions with appended matching recipes.
     """
+    stream = stream_matches(recipe_data, question_data, {}, mode, profile_path)
+    for idx, names, _ in stream:
+        question_data[idx]["matching_recipes"] = names
 
-    for question in data:
-        matching_recipes_ids = []
-        for recipe_name in question.get("matching_recipes", []):
-            if recipe_name in mapping:
-                matching_recipes_ids.append(mapping[recipe_name])
-        question["matching_recipes_ids"] = matching_recipes_ids
-
-    return data
+    return question_data
@@ -5,35 +5,36 @@ from typing import Dict, List
 import pandas as pd
 
 from src.config import Config
-from src.utils.llm import get_model_source, process_data
-from src.utils.lookup_lists import (
-    license_names,
-    planets_names,
-    restaurant_names,
-    technique_groups_names,
-    technique_names,
-)
+from src.datamodels import RequestModel
+from src.utils.journal import ExtractionJournal
+from src.utils.llm import process_data
+from src.utils.lookup_lists import get_vocabulary
 from src.utils.misc import (
     clean_data,
     normalise_strings,
     roman_to_int,
 )
+from src.utils.planets import add_question_planet_ids, get_planet_index
 from src.utils.questions import update_planet_keys
 
 
-def process_questions_pipeline(input_path: Path | str, output_path: Path | str):
+def process_questions_pipeline(
+    input_path: Path | str, output_path: Path | str, retry_dead_letters: bool = False
+):
     """
     Reads questions from a CSV file, processes them, and returns the processed questions.
     Args:
         input_path (str): Path to the input CSV file.
         output_path (str): Path to the output JSON file.
+        retry_dead_letters (bool): Whether to re-run the extraction of the questions that failed in a previous run.
     Returns:
         dict: A dictionary containing the processed questions.
     """
     input_file = Path(input_path)
     output_file = Path(output_path)
+    journal = ExtractionJournal.for_output(output_file)
 
-    if output_file.exists():
+    if output_file.exists() and not (retry_dead_letters and journal.has_dead_letters()):
         with output_file.open("r") as f:
             processed_questions_list = json.load(f)
     else:
@@ -44,7 +45,8 @@ def process_questions_pipeline(input_path: Path | str, output_path: Path | str):
             key="domanda",
             system_message_template=Config.system_message_template_questions,
             message_template=Config.message_template_questions,
-            output_model_str=get_model_source("src.datamodels", "RequestModel"),
+            output_model=RequestModel,
+            journal=journal,
         )
 
     out = postprocess_results(processed_questions_list)
@@ -94,15 +96,16 @@ def postprocess_results(question_data: List[Dict]) -> List[Dict]:
         "sirius_techniques_groups",
     ]
     mapping_list = [
-        technique_names,
-        restaurant_names,
-        license_names,
-        planets_names,
-        technique_groups_names,
+        get_vocabulary("techniques"),
+        get_vocabulary("restaurants"),
+        get_vocabulary("licences"),
+        get_vocabulary("planets"),
+        get_vocabulary("technique_groups"),
     ]
     for key, map in zip(keys, mapping_list):
         out = clean_data(out, key, map)
 
     out = normalise_strings(out)
+    out = add_question_planet_ids(out, get_planet_index(Config.distances_path))
 
     return out
@@ -1,30 +1,42 @@
 import json
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
 from src.config import Config
-from src.utils.ingestion import ingest_md_to_json
-from src.utils.llm import get_model_source, process_data
+from src.datamodels import RecipeModel, RestaurantModel
+from src.utils.ingestion import (
+    diff_manifest,
+    hash_md_files,
+    ingest_md_to_json,
+    load_manifest,
+    manifest_path_for,
+    save_manifest,
+)
+from src.utils.journal import ExtractionJournal
+from src.utils.llm import process_data
 from src.utils.lookup_lists import (
-    license_names,
-    planets_names,
-    restaurant_names,
-    technique_groups_names,
-    technique_names,
+    get_vocabulary,
+    technique_group_table,
 )
+from src.utils.matching import add_legal_compliance, load_legal_limits
 from src.utils.misc import (
     clean_data,
     extract_technique_groups,
+    normalise_string,
     normalise_strings,
     roman_to_int,
 )
-from src.utils.recipes import add_restaurant_info_to_recipes
+from src.utils.planets import add_recipe_planet_ids, get_planet_index
+from src.utils.recipe_store import RecipeStore
 
 
 def process_recipes_pipeline(
     input_path: Path | str,
     recipes_output_path: Path | str,
     restaurant_output_path: Path | str,
+    retry_dead_letters: bool = False,
+    legal_quantities_output_path: Path | str = None,
+    technique_groups_output_path: Path | str = None,
 ) -> List[Dict]:
     """
     Processes the recipe data from markdown files, adds ingredients and techniques, and saves the result to a JSON file.
@@ -32,35 +44,63 @@ def process_recipes_pipeline(
         input_path (str): Path to the input directory containing markdown files.
         recipes_output_path (str): Path to the output JSON file.
         restaurant_output_path (str): Path to the output JSON file for restaurants.
+        retry_dead_letters (bool): Whether to re-run the extraction of the items that failed in a previous run.
+        legal_quantities_output_path (str): Path to the output JSON file of the galactic code compliance table.
+        technique_groups_output_path (str): Path to the output JSON file of the technique group table.
     Returns:
-        list: A list of dictionaries containing the processed recipe data.
+        tuple: The recipes, as RecipeRecord read like the recipe dicts, and the restaurants.
     """
     all_recipes = load_and_process_recipes(
-        input_path, recipes_output_path, restaurant_output_path
+        input_path, recipes_output_path, restaurant_output_path, retry_dead_letters
+    )
+    all_restaurants = load_and_process_restaurants(
+        input_path, restaurant_output_path, retry_dead_letters
     )
-    all_restaurants = load_and_process_restaurants(input_path, restaurant_output_path)
-
-    all_recipes = add_restaurant_info_to_recipes(all_recipes, all_restaurants)
-
-    keys = [
-        "recipe_techniques",
-        "recipe_techniques_groups",
-        "recipe_restaurant",
-        "chef_licences",
-        "restaurant_planet",
-    ]
-    mapping_list = [
-        technique_names,
-        technique_groups_names,
-        restaurant_names,
-        license_names,
-        planets_names,
-    ]
-    for key, map in zip(keys, mapping_list):
-        all_recipes = clean_data(all_recipes, key, map)
 
-    with recipes_output_path.open("w") as f:
-        json.dump(all_recipes, f, indent=4)
+    # restaurant fields are cleaned once per restaurant, recipes reference their restaurant
+    restaurants = clean_data(
+        all_restaurants, "chef_licences", get_vocabulary("licences")
+    )
+    restaurants = clean_data(
+        restaurants, "restaurant_planet", get_vocabulary("planets")
+    )
+    if Path(Config.distances_path).exists():
+        restaurants = add_recipe_planet_ids(
+            restaurants, get_planet_index(Config.distances_path)
+        )
+
+    store = RecipeStore.from_json(all_recipes, restaurants)
+    store.clean("recipe_techniques", get_vocabulary("techniques"))
+    store.clean("recipe_restaurant", get_vocabulary("restaurants"))
+    all_recipes = store.records
+
+    # groups are looked up on the snapped techniques
+    for recipe in all_recipes:
+        if "recipe_techniques" in recipe:
+            recipe["recipe_technique_groups"] = extract_technique_groups(
+                recipe["recipe_techniques"]
+            )
+
+    technique_groups_output_path = Path(
+        technique_groups_output_path
+        or Config.data_path_dict["output_technique_groups_path"]
+    )
+    with technique_groups_output_path.open("w") as f:
+        json.dump(technique_group_table, f, indent=4)
+
+    # galactic code limits are checked once here, matching reads `within_legal_limits`
+    if Path(Config.illegal_ingredients_path).exists():
+        compliance = add_legal_compliance(all_recipes, load_legal_limits())
+        legal_quantities_output_path = Path(
+            legal_quantities_output_path
+            or Config.data_path_dict["output_legal_quantities_path"]
+        )
+        with legal_quantities_output_path.open("w") as f:
+            json.dump(compliance, f, indent=4)
+    else:
+        print(f"No galactic code limits at {Config.illegal_ingredients_path}")
+
+    store.save(recipes_output_path)
 
     with restaurant_output_path.open("w") as f:
         json.dump(all_restaurants, f, indent=4)
@@ -72,6 +112,7 @@ def load_and_process_recipes(
     input_path: Path | str,
     recipes_output_path: Path | str,
     restaurant_output_path: Path | str,
+    retry_dead_letters: bool = False,
 ) -> List[Dict]:
     """
     Loads and processes the recipe data from markdown files.
@@ -79,72 +120,69 @@ def load_and_process_recipes(
         input_path (str): Path to the input directory containing markdown files.
         recipes_output_path (str): Path to the output JSON file.
         restaurant_output_path (str): Path to the output JSON file for restaurants.
+        retry_dead_letters (bool): Whether to re-run the extraction of the recipes that failed in a previous run.
     Returns:
         list: A list of dictionaries containing the processed recipe data.
     """
     recipes_output_path = Path(recipes_output_path)
 
-    if recipes_output_path.exists():
-        with recipes_output_path.open("r") as f:
-            all_recipes = json.load(f)
-    else:
-        ingestion_dict = ingest_md_to_json(input_path)
-        all_recipes = ingestion_dict["recipes"]
-
+    def extract(recipes: List[Dict], journal: ExtractionJournal) -> List[Dict]:
         print("Processing menus")
-        all_recipes = process_data(
-            data=all_recipes,
+        return process_data(
+            data=recipes,
             key="recipe_text",
             system_message_template=Config.system_message_template_recipes,
             message_template=Config.message_template_recipes,
-            output_model_str=get_model_source("src.datamodels", "RecipeModel"),
+            output_model=RecipeModel,
+            batch_token_budget=Config.batch_token_budget,
+            group_key="recipe_restaurant",
+            journal=journal,
         )
 
-    all_recipes = normalise_strings(all_recipes)
-
-    for recipe in all_recipes:
-        if "recipe_techniques" in recipe:
-            recipe_techniques = recipe["recipe_techniques"]
-            recipe_technique_groups = {}
+    all_recipes, hashes = load_incrementally(
+        input_path, recipes_output_path, "recipes", extract, retry_dead_letters
+    )
 
-            recipe_technique_groups = extract_technique_groups(recipe_techniques)
-            recipe["recipe_technique_groups"] = recipe_technique_groups
+    all_recipes = normalise_strings(all_recipes)
 
     with recipes_output_path.open("w") as f:
         json.dump(all_recipes, f, indent=4)
+    save_manifest(manifest_path_for(recipes_output_path), hashes)
 
     return all_recipes
 
 
 def load_and_process_restaurants(
-    input_path: Path | str, restaurant_output_path: Path | str
+    input_path: Path | str,
+    restaurant_output_path: Path | str,
+    retry_dead_letters: bool = False,
 ) -> List[Dict]:
     """
     Loads and processes the restaurant data from markdown files.
     Args:
         input_path (str): Path to the input directory containing markdown files.
         restaurant_output_path (str): Path to the output JSON file.
+        retry_dead_letters (bool): Whether to re-run the extraction of the restaurants that failed in a previous run.
     Returns:
         list: A list of dictionaries containing the processed restaurant data.
     """
     restaurant_output_path = Path(restaurant_output_path)
 
-    if restaurant_output_path.exists():
-        with restaurant_output_path.open("r") as f:
-            all_restaurants = json.load(f)
-    else:
-        ingestion_dict = ingest_md_to_json(input_path)
-        all_restaurants = ingestion_dict["restaurants"]
-
+    def extract(restaurants: List[Dict], journal: ExtractionJournal) -> List[Dict]:
         print("Processing restaurants info")
-        all_restaurants = process_data(
-            data=all_restaurants,
+        return process_data(
+            data=restaurants,
             key="restaurant_text",
             system_message_template=Config.system_message_template_restaurant,
             message_template=Config.message_template_restaurant,
-            output_model_str=get_model_source("src.datamodels", "RestaurantModel"),
+            output_model=RestaurantModel,
+            journal=journal,
         )
 
+    all_restaurants, hashes = load_incrementally(
+        input_path, restaurant_output_path, "restaurants", extract, retry_dead_letters
+    )
+
     all_restaurants = normalise_strings(all_restaurants)
 
     for restaurant in all_restaurants:
@@ -157,5 +195,59 @@ def load_and_process_restaurants(
 
     with restaurant_output_path.open("w") as f:
         json.dump(all_restaurants, f, indent=4)
+    save_manifest(manifest_path_for(restaurant_output_path), hashes)
 
     return all_restaurants
+
+
+def load_incrementally(
+    input_path: Path | str,
+    output_path: Path,
+    ingestion_key: str,
+    extract: Callable[[List[Dict], ExtractionJournal], List[Dict]],
+    retry_dead_letters: bool = False,
+) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Loads the records of a previous run and re-extracts only the markdown files that changed.
+    Records are matched to their file through `source_file`. Records of changed or deleted files
+    are dropped and the added or changed files are ingested and extracted again. Without an output
+    or a manifest every file is extracted; the journal and the LLM cache keep that cheap.
+    Args:
+        input_path (str): Path to the input directory containing markdown files.
+        output_path (Path): Path to the output JSON file.
+        ingestion_key (str): Key of the records in the ingestion output, "recipes" or "restaurants".
+        extract (callable): Function running the LLM extraction on a list of records.
+        retry_dead_letters (bool): Whether to re-run the extraction of the records that failed in a previous run.
+    Returns:
+        tuple: The records and the current file hashes, to be saved as manifest once the output is written.
+    """
+    journal = ExtractionJournal.for_output(output_path)
+    hashes = hash_md_files(input_path)
+    manifest = load_manifest(manifest_path_for(output_path))
+
+    if (
+        output_path.exists()
+        and manifest is not None
+        and not (retry_dead_letters and journal.has_dead_letters())
+    ):
+        with output_path.open("r") as f:
+            records = json.load(f)
+        changed, deleted = diff_manifest(manifest, hashes)
+    else:
+        records = []
+        changed, deleted = list(hashes), []
+
+    if changed or deleted:
+        print(
+            f"Menu files: {len(changed)} added or changed, {len(deleted)} deleted, "
+            f"{len(hashes) - len(changed)} unchanged"
+        )
+        # records carry their file name normalised like every other string
+        stale = {normalise_string(name) for name in [*changed, *deleted]}
+        records = [r for r in records if r.get("source_file") not in stale]
+
+    if changed:
+        new_records = ingest_md_to_json(input_path, files=changed)[ingestion_key]
+        records.extend(extract(new_records, journal))
+
+    return records, hashes
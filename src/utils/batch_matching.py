@@ -0,0 +1,227 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from .matching import CLAUSE_KEYS
+from .question_plan import LICENCE_COST
+from .recipe_index import RecipeIndex, iter_bits
+
+
+class BatchMatcher:
+    """Evaluates many questions at once with recipe x term incidence matrices.
+
+    For every clause field the recipes are one-hot encoded over the field vocabulary and the
+    questions over the same vocabulary, so that a single matrix product per operator gives, for
+    every (recipe, question) pair, how many of the question terms the recipe holds:
+
+        and: hits == number of "and" terms
+        or:  hits >= or_length, "or" terms counted with their multiplicity
+        not: hits == 0
+
+    Groups, restaurants and planets are encoded as integer codes and looked up in a
+    question x code table; sirius technique groups work like an "and" clause. The licence and
+    galactic code filters, and the records the index leaves to the per-recipe checks, go through
+    the compiled plan of each question, so results are the same as `RecipeIndex.match`.
+
+    Args:
+        index (RecipeIndex): Index of the recipes.
+        chunk_size (int): Number of questions evaluated per matrix product, bounding memory to
+            about `len(recipes) * chunk_size` bytes per operator.
+    """
+
+    def __init__(self, index: RecipeIndex, chunk_size: int = 1024):
+        self.index = index
+        self.chunk_size = chunk_size
+
+        # recipes with unexpected shapes are left to the per-recipe checks
+        self.base = ~bits_to_array(index.bits["irregular"], index.size)
+        self.base &= bits_to_array(index.bits["licensed"], index.size)
+
+        self.vocab = {}
+        self.incidence = {}
+        self.present = {}
+        for _, r_key in CLAUSE_KEYS:
+            self._encode_terms(r_key)
+            self.present[r_key] = bits_to_array(
+                index.bits[f"present:{r_key}"], index.size
+            )
+        self._encode_terms("recipe_technique_groups")
+        self.truthy_groups = bits_to_array(
+            index.bits["truthy:recipe_technique_groups"], index.size
+        )
+
+        # code 0 is a recipe without value, which no filter rejects
+        self.codes = {}
+        for r_key in [
+            "recipe_group",
+            "recipe_restaurant",
+            "restaurant_planet",
+            "restaurant_planet_id",
+        ]:
+            codes = np.zeros(index.size, dtype=np.int64)
+            values = {}
+            for code, (value, bits) in enumerate(index.terms[r_key].items(), start=1):
+                codes[bits_to_array(bits, index.size)] = code
+                values[value] = code
+            self.codes[r_key] = (codes, values)
+
+    def _encode_terms(self, r_key: str):
+        terms = self.index.terms[r_key]
+        incidence = np.zeros((self.index.size, len(terms)), dtype=np.float32)
+        for j, bits in enumerate(terms.values()):
+            incidence[:, j] = bits_to_array(bits, self.index.size)
+        self.vocab[r_key] = {term: j for j, term in enumerate(terms)}
+        self.incidence[r_key] = incidence
+
+    def match_bits(self, questions: List[Dict]) -> List[int]:
+        """Returns the bitset of the recipes matching each question."""
+        results = [None] * len(questions)
+        regular = []
+        for i, question in enumerate(questions):
+            if self.index.is_regular_question(question):
+                regular.append(i)
+            else:
+                results[i] = self.index.match_bits(question)
+
+        for start in range(0, len(regular), self.chunk_size):
+            chunk = regular[start : start + self.chunk_size]
+            matches = self._evaluate([questions[i] for i in chunk])
+            for column, i in enumerate(chunk):
+                plan = self.index.compile(questions[i])
+                results[i] = plan.execute(
+                    array_to_bits(matches[:, column]), min_cost=LICENCE_COST
+                )
+
+        return results
+
+    def match(self, questions: List[Dict]) -> List[List[int]]:
+        """Returns the positions of the recipes matching each question, in corpus order."""
+        return [list(iter_bits(bits)) for bits in self.match_bits(questions)]
+
+    def _evaluate(self, questions: List[Dict]) -> np.ndarray:
+        """Boolean recipes x questions matrix of the bitset filters."""
+        matches = np.repeat(self.base[:, None], len(questions), axis=1)
+
+        for q_key, r_key in CLAUSE_KEYS:
+            clauses = [question.get(q_key) or {} for question in questions]
+            matches &= self._clause(r_key, clauses)
+
+        for q_key, r_key in [
+            ("group", "recipe_group"),
+            ("restaurants", "recipe_restaurant"),
+        ]:
+            values = [
+                [question.get(q_key)] if question.get(q_key) else None
+                for question in questions
+            ]
+            matches &= self._allowed_codes(r_key, values)
+
+        matches &= self._planets(questions)
+
+        groups = [
+            question.get("sirius_techniques_groups") if question.get("sirius_flag") else None
+            for question in questions
+        ]
+        holds, active = self._holds_all("recipe_technique_groups", groups)
+        matches &= holds | ~self.truthy_groups[:, None] | ~active[None, :]
+
+        return matches
+
+    def _planets(self, questions: List[Dict]) -> np.ndarray:
+        """Recipes x questions matrix of the planet filter, by id where both sides have one."""
+        planets = [list(question.get("planet") or []) or None for question in questions]
+        allowed = self._allowed_codes("restaurant_planet", planets)
+
+        planet_ids = [
+            list(question["planet_ids"])
+            if question.get("planet") and "planet_ids" in question
+            else None
+            for question in questions
+        ]
+        if all(ids is None for ids in planet_ids):
+            return allowed
+
+        by_id = np.array([ids is not None for ids in planet_ids])
+        with_id = self.codes["restaurant_planet_id"][0] > 0
+        without_planet = self.codes["restaurant_planet"][0] == 0
+        allowed_ids = self._allowed_codes("restaurant_planet_id", planet_ids)
+        return np.where(
+            with_id[:, None] & by_id[None, :],
+            allowed_ids | without_planet[:, None],
+            allowed,
+        )
+
+    def _clause(self, r_key: str, clauses: List[Dict]) -> np.ndarray:
+        n_questions = len(clauses)
+        vocab = self.vocab[r_key]
+        incidence = self.incidence[r_key]
+
+        needs_field = np.array(
+            [bool(c.get("and") or c.get("or") or c.get("not")) for c in clauses]
+        )
+        matches = self.present[r_key][:, None] | ~needs_field[None, :]
+
+        holds, _ = self._holds_all(r_key, [c.get("and") for c in clauses])
+        matches &= holds
+
+        # "or" terms keep their multiplicity, as in check_or_conditions
+        requirements = np.zeros((n_questions, len(vocab)), dtype=np.float32)
+        or_lengths = np.zeros(n_questions, dtype=np.float32)
+        for q, clause in enumerate(clauses):
+            or_length = clause.get("or_length", 1)
+            if clause.get("or") and or_length is not None:
+                or_lengths[q] = or_length
+                for term in clause["or"]:
+                    if term in vocab:
+                        requirements[q, vocab[term]] += 1
+        matches &= incidence @ requirements.T >= or_lengths[None, :]
+
+        requirements = np.zeros((n_questions, len(vocab)), dtype=np.float32)
+        for q, clause in enumerate(clauses):
+            for term in clause.get("not") or []:
+                if term in vocab:
+                    requirements[q, vocab[term]] = 1
+        matches &= incidence @ requirements.T == 0
+
+        return matches
+
+    def _holds_all(self, r_key: str, term_lists: List[Iterable]) -> tuple:
+        """Recipes x questions matrix of the recipes holding every term, and the active questions."""
+        vocab = self.vocab[r_key]
+        requirements = np.zeros((len(term_lists), len(vocab)), dtype=np.float32)
+        active = np.zeros(len(term_lists), dtype=bool)
+        unknown = np.zeros(len(term_lists), dtype=bool)
+        for q, terms in enumerate(term_lists):
+            for term in terms or []:
+                active[q] = True
+                if term in vocab:
+                    requirements[q, vocab[term]] = 1
+                else:
+                    unknown[q] = True
+
+        counts = requirements.sum(axis=1)
+        holds = self.incidence[r_key] @ requirements.T == counts[None, :]
+        return holds & ~unknown[None, :], active
+
+    def _allowed_codes(self, r_key: str, value_lists: List[List]) -> np.ndarray:
+        """Recipes x questions matrix of the recipes whose value is allowed, or unset."""
+        codes, values = self.codes[r_key]
+        allowed = np.ones((len(value_lists), len(values) + 1), dtype=bool)
+        for q, question_values in enumerate(value_lists):
+            if question_values is not None:
+                allowed[q, 1:] = False
+                for value in question_values:
+                    if value in values:
+                        allowed[q, values[value]] = True
+        return allowed[:, codes].T
+
+
+def bits_to_array(bits: int, size: int) -> np.ndarray:
+    """Converts a bitset into a boolean array of length `size`."""
+    data = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(data, bitorder="little")[:size].astype(bool)
+
+
+def array_to_bits(array: np.ndarray) -> int:
+    """Converts a boolean array into a bitset."""
+    return int.from_bytes(np.packbits(array, bitorder="little").tobytes(), "little")
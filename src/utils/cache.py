@@ -0,0 +1,169 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+from src.config import Config
+
+
+class LLMCache:
+    """Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Entries are keyed by a hash of provider, model and rendered messages. The database
+    runs in WAL mode with a busy timeout, so several pipeline processes can share the
+    same cache file. Every call opens its own short-lived connection, which makes the
+    cache safe to use from worker threads as well.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_entries: int | None = None,
+        max_age_seconds: float | None = None,
+        evict_every: int = 100,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_accessed_at ON responses (accessed_at)"
+            )
+        self.evict()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(
+        provider: str, model: str, sys_message: str, message: str, json_output: bool
+    ) -> str:
+        """Hashes the request parameters into a cache key."""
+        payload = json.dumps(
+            [provider, model, sys_message, message, json_output], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response for a key, or None on a miss."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._is_expired(row[1], now):
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return row[0] if row is not None else None
+
+    def set(self, key: str, response: str) -> None:
+        """Stores a response, evicting old entries every `evict_every` writes."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drops entries older than `max_age_seconds`, then the least recently used
+        entries above `max_entries`."""
+        with self._connect() as conn:
+            if self.max_age_seconds is not None:
+                conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (time.time() - self.max_age_seconds,),
+                )
+            if self.max_entries is not None:
+                conn.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses
+                        ORDER BY accessed_at DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                )
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return (
+            self.max_age_seconds is not None
+            and now - created_at > self.max_age_seconds
+        )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache | None:
+    """Returns the shared response cache, or None if caching is disabled in Config."""
+    global _cache
+
+    if not Config.use_cache:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                path=Config.cache_path,
+                max_entries=Config.cache_max_entries,
+                max_age_seconds=Config.cache_max_age_days * 24 * 60 * 60,
+            )
+    return _cache
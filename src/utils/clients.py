@@ -0,0 +1,79 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+import aisuite as ai
+
+from src.config import Config
+from src.utils.mock_llm import MockClient
+
+_clients: Dict[Tuple, ai.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def resolve_provider_config(provider: str) -> Dict:
+    """Builds the aisuite configuration of a provider from Config.provider_configs.
+
+    Keys ending in `_env` are read from the environment, e.g. `api_key_env: GROQ_API_KEY`
+    becomes `api_key: os.getenv("GROQ_API_KEY")`.
+
+    Args:
+        provider (str): Name of the provider.
+
+    Returns:
+        dict: Configuration passed to the aisuite provider.
+    """
+    config = {}
+    for key, value in Config.provider_configs.get(provider, {}).items():
+        if key.endswith("_env"):
+            config[key.removesuffix("_env")] = os.getenv(value)
+        else:
+            config[key] = value
+    return config
+
+
+def get_client(provider: str) -> ai.Client:
+    """Returns a long-lived client for a provider, creating it on first use.
+
+    Clients are shared across threads and keyed by the resolved provider configuration,
+    so HTTP connections are reused between requests and retries. The provider is
+    initialised under a lock because aisuite creates providers lazily without one.
+
+    Args:
+        provider (str): Name of the provider.
+
+    Returns:
+        ai.Client: The pooled client.
+    """
+    if provider == "mock":
+        return get_mock_client()
+
+    config = resolve_provider_config(provider)
+    key = (provider, tuple(sorted(config.items())))
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        if key not in _clients:
+            client = ai.Client(provider_configs={provider: config})
+            client._initialize_providers()
+            _clients[key] = client
+    return _clients[key]
+
+
+def get_mock_client() -> MockClient:
+    """Returns the offline client configured by Config.mock_*."""
+    key = ("mock", Config.mock_mode, str(Config.mock_recordings_path))
+
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = MockClient()
+    return _clients[key]
+
+
+def close_clients() -> None:
+    """Drops every pooled client."""
+    with _clients_lock:
+        _clients.clear()
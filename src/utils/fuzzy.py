@@ -0,0 +1,71 @@
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set
+
+
+def trigrams(value: str) -> Set[str]:
+    """Character trigrams of a string, padded so that short strings and word edges count."""
+    padded = f"  {value} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Fuzzy matcher retrieving candidates through a character-trigram inverted index.
+
+    The entries sharing the most trigrams with a value are scored with difflib's
+    SequenceMatcher ratio, the same score `get_close_matches` uses, and the best one is
+    returned. Only `limit` candidates are scored instead of the whole list, so the result can
+    differ from difflib's when the best entry shares few trigrams with the value.
+
+    Args:
+        entries (iterable): Strings to match against.
+        limit (int): Number of candidates scored per value.
+    """
+
+    def __init__(self, entries: Iterable[str], limit: int = 10):
+        self.entries = list(entries)
+        self.limit = limit
+        self.postings: Dict[str, List[int]] = {}
+        for i, entry in enumerate(self.entries):
+            for gram in trigrams(entry):
+                self.postings.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def candidates(self, value: str) -> List[str]:
+        """Entries sharing the most trigrams with the value, every entry if none shares one."""
+        shared = Counter()
+        for gram in trigrams(value):
+            shared.update(self.postings.get(gram, ()))
+        if not shared:
+            return self.entries
+        return [self.entries[i] for i, _ in shared.most_common(self.limit)]
+
+    def best(self, value: str, cutoff: float = 0.0) -> str | None:
+        """
+        Returns the entry closest to a value.
+        Args:
+            value (str): String to match.
+            cutoff (float): Minimum similarity ratio, in [0, 1].
+        Returns:
+            str: The best entry, None if there are no entries or none reaches the cutoff.
+        """
+        matcher = SequenceMatcher()
+        matcher.set_seq2(value)
+        best_score, best_entry = -1.0, None
+        for entry in self.candidates(value):
+            matcher.set_seq1(entry)
+            score = matcher.ratio()
+            # ties go to the greatest string, as in get_close_matches
+            if (score, entry) > (best_score, best_entry or ""):
+                best_score, best_entry = score, entry
+        if best_entry is None or best_score < cutoff:
+            return None
+        return best_entry
+
+    def best_many(self, values: Iterable[str], cutoff: float = 0.0) -> List[str | None]:
+        """Returns the best entry of every value, scoring each distinct value once."""
+        values = list(values)
+        results = {value: self.best(value, cutoff) for value in set(values)}
+        return [results[value] for value in values]
@@ -1,6 +1,8 @@
+import hashlib
+import json
 import re
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
 
 
 def normalize_line(line):
@@ -188,12 +190,15 @@ def process_file(filepath):
     return recipes, restaurant
 
 
-def ingest_md_to_json(input_path: Path | str) -> List[Dict]:
+def ingest_md_to_json(
+    input_path: Path | str, files: Iterable[str] | None = None
+) -> List[Dict]:
     """
     Processes the recipe data from markdown files in the input directory and saves the result to a JSON file.
+    Every recipe and restaurant is tagged with the name of its markdown file in `source_file`.
     Args:
         input_path (str): Path to the input directory containing markdown files.
-        output_path (str): Path to the output JSON file.
+        files (list, optional): Names of the markdown files to process. Defaults to every file in the directory.
     Returns:
         list: A list of dictionaries containing the processed recipe data.
     """
@@ -201,14 +206,71 @@ def ingest_md_to_json(input_path: Path | str) -> List[Dict]:
 
     all_recipes = []
     all_restaurants = []
-    md_files = list(input_dir.glob("*.md"))
+    if files is None:
+        md_files = list(input_dir.glob("*.md"))
+    else:
+        md_files = [input_dir / name for name in files]
 
     for md_file in md_files:
         file_recipes, file_restaurant = process_file(md_file)
 
+        for record in [*file_recipes, file_restaurant]:
+            record["source_file"] = md_file.name
+
         all_recipes.extend(file_recipes)
         all_restaurants.append(file_restaurant)
 
     output = {"recipes": all_recipes, "restaurants": all_restaurants}
 
     return output
+
+
+def hash_md_files(input_path: Path | str) -> Dict[str, str]:
+    """
+    Computes the content hash of every markdown file in the input directory.
+    Args:
+        input_path (str): Path to the input directory containing markdown files.
+    Returns:
+        dict: A dictionary mapping file names to their sha256 hash.
+    """
+    return {
+        md_file.name: hashlib.sha256(md_file.read_bytes()).hexdigest()
+        for md_file in sorted(Path(input_path).glob("*.md"))
+    }
+
+
+def diff_manifest(
+    manifest: Dict[str, str], hashes: Dict[str, str]
+) -> Tuple[List[str], List[str]]:
+    """
+    Compares a stored manifest of file hashes with the current one.
+    Args:
+        manifest (dict): File hashes of the previous run.
+        hashes (dict): Current file hashes.
+    Returns:
+        tuple: Names of the added or changed files and names of the deleted files.
+    """
+    changed = [name for name, digest in hashes.items() if manifest.get(name) != digest]
+    deleted = [name for name in manifest if name not in hashes]
+    return changed, deleted
+
+
+def manifest_path_for(output_path: Path | str) -> Path:
+    """Returns the manifest stored next to a pipeline output, e.g. `recipes.manifest.json`."""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.manifest.json")
+
+
+def load_manifest(manifest_path: Path | str) -> Dict[str, str] | None:
+    """Loads a manifest of file hashes, None if there is none."""
+    manifest_path = Path(manifest_path)
+    if not manifest_path.exists():
+        return None
+    with manifest_path.open("r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path: Path | str, hashes: Dict[str, str]) -> None:
+    """Saves a manifest of file hashes."""
+    with Path(manifest_path).open("w") as f:
+        json.dump(hashes, f, indent=4)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict
+
+
+class ExtractionJournal:
+    """Append-only record of the LLM extraction of a pipeline stage.
+
+    Every parsed answer is appended to a JSONL journal as soon as it arrives, keyed by
+    a hash of the item text and of the extraction settings (prompt, schema and model), so an
+    interrupted run resumes where it stopped and a changed extraction starts over. Items that
+    fail are appended with their error to a dead-letter JSONL file, which is compacted
+    at the end of a run to the items that are still failing.
+
+    Args:
+        journal_path (Path | str): Path of the journal file.
+        dead_letter_path (Path | str): Path of the dead-letter file.
+    """
+
+    def __init__(self, journal_path: Path | str, dead_letter_path: Path | str):
+        self.journal_path = Path(journal_path)
+        self.dead_letter_path = Path(dead_letter_path)
+        self._lock = threading.Lock()
+        self.completed = self._read(self.journal_path, "response")
+        self.dead_letters = {
+            key: record
+            for key, record in self._read(self.dead_letter_path).items()
+            if key not in self.completed
+        }
+
+    @classmethod
+    def for_output(cls, output_path: Path | str) -> "ExtractionJournal":
+        """Returns the journal stored next to a pipeline output, e.g. `recipes.journal.jsonl`
+        and `recipes.dead_letters.jsonl` for `recipes.json`."""
+        output_path = Path(output_path)
+        return cls(
+            output_path.with_name(f"{output_path.stem}.journal.jsonl"),
+            output_path.with_name(f"{output_path.stem}.dead_letters.jsonl"),
+        )
+
+    @staticmethod
+    def item_key(text: str, fingerprint: str = "") -> str:
+        """Hashes the text of an item and the extraction fingerprint into its journal key."""
+        payload = f"{fingerprint}\n{text}" if fingerprint else str(text)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Dict | None:
+        """Returns the journaled answer of an item, or None if it was not extracted yet."""
+        return self.completed.get(key)
+
+    def record(self, key: str, response: Dict) -> None:
+        """Appends the answer of an item to the journal."""
+        with self._lock:
+            self.completed[key] = response
+            self.dead_letters.pop(key, None)
+            self._append(self.journal_path, {"key": key, "response": response})
+
+    def record_failure(self, key: str, item: Dict, error: BaseException) -> None:
+        """Appends a failed item and its error to the dead-letter file."""
+        record = {"key": key, "item": item, "error": repr(error)}
+        with self._lock:
+            self.dead_letters[key] = record
+            self._append(self.dead_letter_path, record)
+
+    def has_dead_letters(self) -> bool:
+        return bool(self.dead_letters)
+
+    def compact_dead_letters(self) -> None:
+        """Rewrites the dead-letter file with the items that are still failing."""
+        with self._lock:
+            if not self.dead_letters:
+                self.dead_letter_path.unlink(missing_ok=True)
+                return
+            tmp_path = self.dead_letter_path.with_suffix(".tmp")
+            with tmp_path.open("w") as f:
+                for record in self.dead_letters.values():
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            tmp_path.replace(self.dead_letter_path)
+
+    @staticmethod
+    def _append(path: Path, record: Dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+
+    @staticmethod
+    def _read(path: Path, field: str | None = None) -> Dict:
+        records = {}
+        if not path.exists():
+            return records
+        with path.open("r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # last line of a run killed mid-write
+                    continue
+                records[record["key"]] = record[field] if field else record
+        return records
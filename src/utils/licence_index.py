@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+from .matching import check_license_conditions
+from .misc import roman_to_int
+
+
+class LevelColumn:
+    """Licence levels sorted with the bitset of every suffix, for range queries with bisect.
+
+    The bitsets of the entries must be disjoint, as the recipes of different licence groups are.
+    """
+
+    def __init__(self, entries: List[Tuple[float, int]]):
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.levels = [level for level, _ in entries]
+        self.suffix = [0] * (len(entries) + 1)
+        for i in range(len(entries) - 1, -1, -1):
+            self.suffix[i] = self.suffix[i + 1] | entries[i][1]
+
+    def at_least(self, level: int) -> int:
+        """Bitset of the entries with a level of at least `level`."""
+        return self.suffix[bisect_left(self.levels, level)]
+
+    def equal(self, level: int) -> int:
+        """Bitset of the entries with exactly `level`."""
+        lo = bisect_left(self.levels, level)
+        hi = bisect_right(self.levels, level)
+        return self.suffix[lo] & ~self.suffix[hi]
+
+
+class LicenceIndex:
+    """Chef licences of the recipe groups, with levels converted with `roman_to_int` once.
+
+    Answers `check_license_conditions` for every group at once:
+
+        licence X held:                  union of the groups holding X
+        licence X higher / equal than n: bisect in the sorted levels of X
+        all licences higher than n:      bisect in the minimum level of each group
+        any licence equal to n:          groups holding a licence of level n
+
+    Groups with levels that are neither strings nor integers (e.g. None, on which the
+    original check raises for some questions) are checked with `check_license_conditions`.
+
+    Args:
+        groups (list): (chef licences, bitset of the recipes) pairs, with disjoint bitsets.
+    """
+
+    def __init__(self, groups: List[Tuple[Dict, int]]):
+        self.groups = groups
+        self.unindexed = []
+        self.licensed = 0
+        self.holders = {}
+        self.any_level = {}
+        by_name = {}
+        min_levels = []
+
+        for licences, bits in groups:
+            if licences is None:
+                # never passes check_license_conditions
+                continue
+            if not all(isinstance(level, (str, int)) for level in licences.values()):
+                self.unindexed.append((licences, bits))
+                continue
+
+            self.licensed |= bits
+            levels = {name: roman_to_int(level) for name, level in licences.items()}
+            for name, level in levels.items():
+                self.holders[name] = self.holders.get(name, 0) | bits
+                by_name.setdefault(name, []).append((level, bits))
+                if licences[name]:
+                    self.any_level[level] = self.any_level.get(level, 0) | bits
+
+            # "all licences higher than n" fails on any empty level and holds without licences
+            if all(licences.values()):
+                min_levels.append((min(levels.values(), default=float("inf")), bits))
+
+        self.by_name = {name: LevelColumn(entries) for name, entries in by_name.items()}
+        self.min_levels = LevelColumn(min_levels)
+
+    def match(self, name, level, condition) -> int | None:
+        """
+        Returns the bitset of the indexed groups passing `check_license_conditions`.
+        Args:
+            name (str): Required licence name.
+            level (str|int): Required licence level.
+            condition (str): "higher" or "equal".
+        Returns:
+            int: Bitset of the matching recipes, None if the level can not be looked up.
+        """
+        result = self.licensed
+
+        if name and not level and not condition:
+            result &= self.holders.get(name, 0)
+
+        if level and condition:
+            if not isinstance(level, (str, int)):
+                return None
+            required = roman_to_int(level)
+
+            if not name:
+                if condition == "higher":
+                    result &= self.min_levels.at_least(required)
+                elif condition == "equal":
+                    result &= self.any_level.get(required, 0)
+            else:
+                column = self.by_name.get(name)
+                if column is None:
+                    return 0
+                if condition == "higher":
+                    result &= column.at_least(required)
+                elif condition == "equal":
+                    result &= column.equal(required)
+                else:
+                    result &= self.holders[name]
+
+        return result
+
+    def evaluate(self, name, level, condition, candidates: int) -> int:
+        """Bitset of the candidates passing `check_license_conditions`."""
+        result = self.match(name, level, condition)
+        if result is None:
+            result, groups = 0, self.groups
+        else:
+            result, groups = result & candidates, self.unindexed
+
+        for licences, bits in groups:
+            if bits & candidates and check_license_conditions(
+                name, level, condition, licences
+            ):
+                result |= bits
+        return result
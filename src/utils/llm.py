@@ -1,15 +1,30 @@
+import hashlib
 import importlib
 import inspect
 import json
-import os
-from typing import Dict, List
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Tuple
 
-import aisuite as ai
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_fixed
+from pydantic import BaseModel
+from tenacity import Retrying, stop_after_attempt
 from tqdm import tqdm
 
 from src.config import Config
+from src.utils.cache import get_cache
+from src.utils.clients import get_client
+from src.utils.journal import ExtractionJournal
+from src.utils.prompts import (
+    CompiledPrompt,
+    compact_schema,
+    compile_prompt,
+    dedent,
+    estimate_tokens,
+)
+from src.utils.rate_limit import get_rate_limiter, wait_provider_backoff
+from src.utils.validation import validate_response
 
 load_dotenv()
 
@@ -19,67 +34,416 @@ def process_data(
     key: str,
     system_message_template: str,
     message_template: str,
-    output_model_str: str,
+    output_model_str: str | None = None,
+    output_model: type[BaseModel] | None = None,
+    max_concurrency: int | None = None,
+    batch_token_budget: int | None = None,
+    group_key: str | None = None,
+    journal: ExtractionJournal | None = None,
 ) -> List[Dict[str, str]]:
     """Processes a list of dictionaries to extract relevant information using a language model.
 
+    Requests are sent concurrently from a thread pool, items are updated in place so
+    the output keeps the order of the input.
+
+    When `batch_token_budget` is set, items sharing the same `group_key` value are packed
+    into multi-item requests (see `make_batches`) and the answers are matched back by item
+    id. Items missing from a batch answer are retried with a single-item request.
+
+    With an `output_model`, every answer is validated and coerced in-loop (see
+    `validate_response`); fields that are still invalid are asked again with a short
+    follow-up prompt and set to null if they fail twice.
+
+    With a `journal`, items already journaled are filled from it without calling the
+    model, new answers are journaled as they arrive and failed items go to its
+    dead-letter file.
+
     Args:
         data (List[Dict[str, str]]): List of dictionaries containing the data.
         key (str): Key to process.
         system_message_template (str): Template for the system message.
         message_template (str): Template for the user message.
-        output_model_str (str): String representation of the output model.
+        output_model_str (str, optional): String representation of the output model.
+        output_model (BaseModel, optional): Output model, rendered as a compact schema and used to validate the answers. Takes precedence over output_model_str.
+        max_concurrency (int, optional): Maximum number of requests in flight. Defaults to Config.max_concurrency.
+        batch_token_budget (int, optional): Maximum estimated tokens of item text per request. Defaults to no batching.
+        group_key (str, optional): Key used to group items into batches, e.g. the restaurant of a recipe.
+        journal (ExtractionJournal, optional): Journal used to resume the extraction and record failures.
 
     Returns:
         List[Dict[str, str]]: List of dictionaries with original and parsed data.
     """
 
-    provider = Config.provider
-    model = Config.model
+    model = f"{Config.provider}:{Config.model}"
+    max_concurrency = max_concurrency or Config.max_concurrency
 
-    for item in tqdm(data):
-        system_message = system_message_template.format(
-            output_model_str=output_model_str
-        )
-        message = message_template.format(request=item[key])
+    prompt = compile_prompt(
+        system_message_template, message_template, output_model or output_model_str
+    )
+
+    fingerprint = extraction_fingerprint(
+        prompt, output_model or output_model_str, model
+    )
+
+    def journal_key(item: Dict[str, str]) -> str:
+        return journal.item_key(item[key], fingerprint)
+
+    validation_stats = Counter()
+    validation_lock = threading.Lock()
+
+    def complete_item(item: Dict[str, str], response: Dict) -> None:
+        if output_model is not None:
+            response, invalid = validate_response(response, output_model)
+            if invalid:
+                fixed, still_invalid = reask_invalid_fields(
+                    item[key], invalid, prompt, output_model, model
+                )
+                response.update(fixed)
+                with validation_lock:
+                    validation_stats["reasked"] += len(invalid)
+                    validation_stats["dropped"] += len(still_invalid)
+        item.update(response)
+        if journal is not None:
+            journal.record(journal_key(item), response)
+
+    def process_item(item: Dict[str, str]) -> None:
+        message = prompt.render(item[key])
+        try:
+            response = call_llm(
+                message=message,
+                sys_message=prompt.system_message,
+                model=model,
+                json_output=True,
+            )
+            complete_item(item, json.loads(response))
+        except Exception as e:
+            if journal is not None:
+                journal.record_failure(journal_key(item), item, e)
+            raise
 
+    batch_message_template = dedent(Config.message_template_batch)
+    batch_item_template = dedent(Config.batch_item_template)
+
+    def process_batch(batch: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Returns the items of the batch that did not get an answer."""
+        requests = "\n".join(
+            batch_item_template.format(item_id=item_id, request=item[key])
+            for item_id, item in enumerate(batch)
+        )
+        message = batch_message_template.format(requests=requests)
         try:
             response = call_llm(
                 message=message,
-                sys_message=system_message,
-                model=f"{provider}:{model}",
+                sys_message=prompt.system_message,
+                model=model,
                 json_output=True,
+                completion_tokens=len(batch) * Config.expected_completion_tokens,
             )
-            response = json.loads(response)
-            item.update(response)
+            answers = split_batch_response(json.loads(response))
         except Exception:
-            continue
+            return batch
+
+        missing = []
+        for item_id, item in enumerate(batch):
+            if item_id not in answers:
+                missing.append(item)
+                continue
+            # a malformed answer only sends its own item to the single-item retry
+            try:
+                complete_item(item, answers[item_id])
+            except Exception:
+                missing.append(item)
+        return missing
+
+    pending = data
+    if journal is not None:
+        pending = []
+        for item in data:
+            response = journal.get(journal_key(item))
+            if response is None:
+                pending.append(item)
+            else:
+                item.update(response)
+        if len(pending) < len(data):
+            print(
+                f"Resumed {len(data) - len(pending)} items from {journal.journal_path}"
+            )
+
+    single_items = pending
+    if batch_token_budget and pending:
+        batches = make_batches(pending, key, batch_token_budget, group_key)
+        print(f"Sending {len(pending)} items in {len(batches)} batched requests")
+        missing = run_concurrently(process_batch, batches, max_concurrency)
+        single_items = [item for items in missing if items for item in items]
+        if single_items:
+            print(f"Retrying {len(single_items)} items with single-item requests")
+
+    run_concurrently(process_item, single_items, max_concurrency)
+
+    if validation_stats:
+        print(
+            f"Validation: {validation_stats['reasked']} fields asked again, "
+            f"{validation_stats['dropped']} still invalid and set to null"
+        )
+
+    if journal is not None:
+        journal.compact_dead_letters()
+        if journal.has_dead_letters():
+            print(
+                f"{len(journal.dead_letters)} items failed, see {journal.dead_letter_path}"
+            )
+
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses")
 
     return data
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+def extraction_fingerprint(
+    prompt: CompiledPrompt, output_model: type[BaseModel] | str | None, model: str
+) -> str:
+    """Hashes what an answer depends on besides the item text.
+
+    Journal keys include it, like the cache keys include the prompt and the model, so
+    changing the prompt, the output schema or the model extracts the items again instead of
+    resuming answers of the previous settings.
+
+    Args:
+        prompt (CompiledPrompt): Prompt of the extraction.
+        output_model (BaseModel | str): Output model or its string representation.
+        model (str): The model to be used.
+
+    Returns:
+        str: The fingerprint.
+    """
+    if isinstance(output_model, type) and issubclass(output_model, BaseModel):
+        schema = output_model.model_json_schema()
+    else:
+        schema = output_model
+    payload = json.dumps(
+        [prompt.system_message, prompt.message_template, schema, model],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def reask_invalid_fields(
+    request: str,
+    invalid: Dict[str, str],
+    prompt: CompiledPrompt,
+    output_model: type[BaseModel],
+    model: str,
+) -> Tuple[Dict, Dict[str, str]]:
+    """Asks the model again for the invalid fields of an answer only.
+
+    Args:
+        request (str): Text of the item.
+        invalid (dict): Invalid fields with their validation error.
+        prompt (CompiledPrompt): Prompt of the extraction.
+        output_model (BaseModel): The pydantic output model.
+        model (str): The model to be used.
+
+    Returns:
+        tuple: New values of the invalid fields, null where still invalid, and the fields that are still invalid.
+    """
+    errors = "\n".join(f"- {name}: {error}" for name, error in invalid.items())
+    message = dedent(Config.message_template_reask).format(
+        errors=errors,
+        fields=compact_schema(output_model, fields=list(invalid)),
+        request=request,
+    )
+    try:
+        answer = json.loads(
+            call_llm(
+                message=message,
+                sys_message=prompt.system_message,
+                model=model,
+                json_output=True,
+            )
+        )
+        answer = {name: answer.get(name) for name in invalid}
+    except Exception:
+        return {name: None for name in invalid}, invalid
+
+    answer, still_invalid = validate_response(answer, output_model)
+    for name in still_invalid:
+        answer[name] = None
+    return answer, still_invalid
+
+
+def run_concurrently(
+    func: Callable[[Any], Any], tasks: List[Any], max_concurrency: int
+) -> List[Any]:
+    """Runs `func` on every task from a thread pool with a progress bar.
+
+    Args:
+        func (callable): Function applied to each task.
+        tasks (list): Tasks to process.
+        max_concurrency (int): Maximum number of tasks running at once.
+
+    Returns:
+        list: Results in the order of the tasks, None for tasks that raised.
+    """
+    if not tasks:
+        return []
+
+    results = [None] * len(tasks)
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {executor.submit(func, task): i for i, task in enumerate(tasks)}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                failures += 1
+                tqdm.write(f"Request failed: {e!r}")
+                continue
+
+    if failures:
+        print(f"{failures} of {len(tasks)} requests failed")
+
+    return results
+
+
+def make_batches(
+    data: List[Dict[str, str]],
+    key: str,
+    token_budget: int,
+    group_key: str | None = None,
+) -> List[List[Dict[str, str]]]:
+    """Packs items into batches whose estimated text tokens fit the budget.
+
+    Items are grouped by `group_key` first, so dishes of the same menu travel together,
+    and each batch holds at most Config.batch_max_items items.
+
+    Args:
+        data (list): List of dictionaries containing the data.
+        key (str): Key holding the text of each item.
+        token_budget (int): Maximum estimated tokens of item text per batch.
+        group_key (str, optional): Key used to group items.
+
+    Returns:
+        list: List of batches.
+    """
+    groups = {}
+    for item in data:
+        groups.setdefault(item.get(group_key) if group_key else None, []).append(item)
+
+    batches = []
+    for items in groups.values():
+        batch, batch_tokens = [], 0
+        for item in items:
+            tokens = estimate_tokens(item[key])
+            if batch and (
+                batch_tokens + tokens > token_budget
+                or len(batch) >= Config.batch_max_items
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(item)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+
+    return batches
+
+
+def split_batch_response(response: Dict) -> Dict[int, Dict]:
+    """Maps the answers of a batched request to their item ids.
+
+    Args:
+        response (dict): Parsed batch answer, `{"items": [{"item_id": 0, ...}, ...]}`.
+
+    Returns:
+        dict: Answers keyed by item id, without the `item_id` key.
+    """
+    answers = {}
+    for answer in response.get("items") or []:
+        if not isinstance(answer, dict):
+            continue
+        answer = dict(answer)
+        try:
+            item_id = int(answer.pop("item_id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        answers[item_id] = answer
+    return answers
+
+
 def call_llm(
     message,
     sys_message="You are a helpful agent.",
     model=f"{Config.provider}:{Config.model}",
     json_output=False,
+    use_cache=True,
+    completion_tokens=None,
 ):
     """Call the llm model with the given message and system message
 
+    Responses are looked up in the persistent cache first. JSON responses are only
+    stored once they parse, so a malformed answer is requested again on the next run.
+
     Args:
         message (str): the message to be sent to the model
         sys_message (str): the system message to be sent to the model
         model (str): the model to be used
         json_output (bool): whether to return the output in json format
+        use_cache (bool): whether to read from and write to the response cache
+        completion_tokens (int): expected tokens of the answer, taken from the rate limiter
+            with the prompt; defaults to Config.expected_completion_tokens
 
     Returns:
         str: the response from the model
     """
 
-    client = ai.Client(
-        provider_configs={"groq": {"api_key": os.getenv("GROQ_API_KEY")}}
+    cache = get_cache() if use_cache else None
+    if cache is not None:
+        provider, _, model_name = model.partition(":")
+        cache_key = cache.make_key(
+            provider, model_name, sys_message, message, json_output
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    response = _complete(message, sys_message, model, json_output, completion_tokens)
+
+    if cache is not None and _is_cacheable(response, json_output):
+        cache.set(cache_key, response)
+
+    return response
+
+
+def _complete(message, sys_message, model, json_output, completion_tokens=None):
+    """Sends a chat completion request to the provider and returns the message content.
+
+    Every attempt first takes its estimated tokens from the provider's rate limiter, the
+    prompt plus `completion_tokens` (Config.expected_completion_tokens by default). The
+    retry settings are read from Config at every call.
+    """
+
+    if completion_tokens is None:
+        completion_tokens = Config.expected_completion_tokens
+    provider = model.partition(":")[0]
+    retrying = Retrying(
+        stop=stop_after_attempt(Config.llm_max_attempts),
+        wait=wait_provider_backoff(provider),
     )
+    return retrying(
+        _request, message, sys_message, model, json_output, completion_tokens
+    )
+
+
+def _request(message, sys_message, model, json_output, completion_tokens):
+    provider = model.partition(":")[0]
+    get_rate_limiter(provider).acquire(
+        estimate_tokens(sys_message) + estimate_tokens(message) + completion_tokens
+    )
+    client = get_client(provider)
 
     messages = [
         {"role": "system", "content": sys_message},
@@ -97,6 +461,18 @@ def call_llm(
     return response.choices[0].message.content
 
 
+def _is_cacheable(response: str | None, json_output: bool) -> bool:
+    if response is None:
+        return False
+    if not json_output:
+        return True
+    try:
+        json.loads(response)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
 def get_model_source(module_name, class_name):
     """Get the source code of a class in a module
 
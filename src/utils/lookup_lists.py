@@ -1,3 +1,101 @@
+from difflib import get_close_matches
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+from src.config import Config
+
+from .fuzzy import TrigramIndex
+from .text import normalise_string
+
+
+class Vocabulary:
+    """A lookup list with its entries normalised once, snapping strings to the closest entry.
+
+    Values equal to an entry are found in a dict, the other ones are matched once and memoized.
+    With the "difflib" method the match is the same as `get_close_matches(..., n=1)` on the
+    normalised value against the normalised entries; the "trigram" method only scores the entries
+    sharing the most trigrams with the value (see TrigramIndex), for large lists.
+
+    Args:
+        names (iterable): Entries of the lookup list.
+        method (str): "difflib" or "trigram".
+        cutoff (float): Minimum similarity ratio of a match, in [0, 1].
+        memo_size (int): Maximum number of fuzzy results kept.
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        method: str = "difflib",
+        cutoff: float = 0.0,
+        memo_size: int = 4096,
+    ):
+        if method not in ("difflib", "trigram"):
+            raise ValueError(f"Unknown fuzzy matching method: {method}")
+        self.names = list(names)
+        self.method = method
+        self.cutoff = cutoff
+        self.normalised = [normalise_string(name) for name in self.names]
+        self.exact = {name: normalise_string(name) for name in self.normalised}
+        self.trigram_index = (
+            TrigramIndex(self.normalised) if method == "trigram" else None
+        )
+        self._closest = lru_cache(maxsize=memo_size)(self._find_closest)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def closest(self, value: str) -> str | None:
+        """Returns the normalised entry closest to a value, None if none reaches the cutoff."""
+        normalised = normalise_string(value)
+        hit = self.exact.get(normalised)
+        if hit is not None:
+            return hit
+        return self._closest(normalised)
+
+    def snap(self, value: str) -> str:
+        """Returns the normalised entry closest to a value, or the normalised value without match."""
+        closest = self.closest(value)
+        return normalise_string(value) if closest is None else closest
+
+    def snap_many(self, values: Iterable[str]) -> List[str]:
+        """Snaps a column of values, matching each distinct value once.
+
+        With the "trigram" method the values without an exact hit are matched together
+        with `TrigramIndex.best_many`.
+        """
+        normalised = [normalise_string(value) for value in values]
+        unknown = [
+            value for value in dict.fromkeys(normalised) if value not in self.exact
+        ]
+        if self.trigram_index is not None:
+            matches = self.trigram_index.best_many(unknown, self.cutoff)
+            closest = {
+                value: None if match is None else normalise_string(match)
+                for value, match in zip(unknown, matches)
+            }
+        else:
+            closest = {value: self._closest(value) for value in unknown}
+
+        snapped = []
+        for value in normalised:
+            hit = self.exact.get(value)
+            if hit is None:
+                hit = closest[value] or value
+            snapped.append(hit)
+        return snapped
+
+    def _find_closest(self, normalised: str) -> str | None:
+        if self.trigram_index is not None:
+            match = self.trigram_index.best(normalised, self.cutoff)
+        else:
+            matches = get_close_matches(
+                normalised, self.normalised, n=1, cutoff=self.cutoff
+            )
+            match = matches[0] if matches else None
+        return None if match is None else normalise_string(match)
+
+
 technique_names = [
     "marinatura a infusione gravitazionale",
     "marinatura temporale sincronizzata",
@@ -83,6 +181,9 @@ technique_groups_names = [
     "cottura al salto",
 ]
 
+# number of techniques of each group, technique_names lists them group after group
+technique_group_sizes = [5, 5, 5, 5, 5, 4, 5, 5, 5, 5, 5, 2, 5, 4]
+
 restaurant_names = [
     "anima cosmica",
     "armonia universale",
@@ -139,3 +240,64 @@ planets_names = [
     "montressosr",
     "klyntar",
 ]
+
+
+def build_technique_group_table(
+    techniques: List[str], groups: List[str], sizes: List[int]
+) -> Dict[str, str]:
+    """
+    Maps every technique to its group, from a technique list ordered group after group.
+    Args:
+        techniques (list): Techniques, in group order.
+        groups (list): Group names.
+        sizes (list): Number of techniques of each group.
+    Returns:
+        dict: Normalised group by normalised technique.
+    """
+    if len(sizes) != len(groups):
+        raise ValueError(f"{len(sizes)} group sizes for {len(groups)} technique groups")
+    if sum(sizes) != len(techniques):
+        raise ValueError(
+            f"Technique group sizes add up to {sum(sizes)}, not {len(techniques)} techniques"
+        )
+
+    table = {}
+    start = 0
+    for group, size in zip(groups, sizes):
+        for technique in techniques[start : start + size]:
+            table[normalise_string(technique)] = normalise_string(group)
+        start += size
+    return table
+
+
+technique_group_table = build_technique_group_table(
+    technique_names, technique_groups_names, technique_group_sizes
+)
+
+LOOKUP_LISTS = {
+    "techniques": technique_names,
+    "technique_groups": technique_groups_names,
+    "restaurants": restaurant_names,
+    "licences": license_names,
+    "planets": planets_names,
+}
+
+
+def get_vocabulary(name: str) -> Vocabulary:
+    """Returns the vocabulary of a lookup list for the current fuzzy settings.
+
+    It is built on first use with Config.fuzzy_method and Config.fuzzy_cutoff, and again
+    when they change.
+
+    Args:
+        name (str): Key of the lookup list in LOOKUP_LISTS, e.g. "techniques".
+
+    Returns:
+        Vocabulary: The vocabulary, built once per list and setting.
+    """
+    return _build_vocabulary(name, Config.fuzzy_method, Config.fuzzy_cutoff)
+
+
+@lru_cache(maxsize=None)
+def _build_vocabulary(name: str, method: str, cutoff: float) -> Vocabulary:
+    return Vocabulary(LOOKUP_LISTS[name], method=method, cutoff=cutoff)
@@ -0,0 +1,200 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from src.config import Config
+
+from .matching import CLAUSE_KEYS
+from .recipe_index import RecipeIndex
+from .recipe_store import RecipeRecord
+
+
+def canonical_question_key(question: Dict) -> Tuple | None:
+    """
+    Builds a hashable key of the filters of a parsed question.
+    Term lists become sorted sets, except "or" terms which keep their multiplicity since
+    `or_length` counts them; empty clauses and unset filters are dropped. Questions with the
+    same key match the same recipes.
+    Args:
+        question (dict): The parsed question.
+    Returns:
+        tuple: The key, None for questions with unexpected shapes.
+    """
+    if not RecipeIndex.is_regular_question(question):
+        return None
+
+    try:
+        parts = []
+        for q_key, _ in CLAUSE_KEYS:
+            clause = question.get(q_key)
+            if not clause:
+                continue
+            ops = []
+            if clause.get("and"):
+                ops.append(("and", _as_set(clause["and"])))
+            if clause.get("or"):
+                or_length = clause.get("or_length", 1)
+                if or_length is not None:
+                    or_length = max(int(or_length), 0)
+                ops.append(("or", _as_bag(clause["or"]), or_length))
+            if clause.get("not"):
+                ops.append(("not", _as_set(clause["not"])))
+            if ops:
+                parts.append((q_key, tuple(ops)))
+
+        for key in ["group", "restaurants"]:
+            if question.get(key):
+                parts.append((key, question[key]))
+        if question.get("planet"):
+            parts.append(("planet", _as_set(question["planet"])))
+            if "planet_ids" in question:
+                parts.append(("planet_ids", _as_set(question["planet_ids"])))
+        if question.get("sirius_flag") and question.get("sirius_techniques_groups"):
+            parts.append(("sirius", _as_set(question["sirius_techniques_groups"])))
+
+        licence = tuple(
+            question.get(key)
+            for key in ["licence_name", "licence_level", "licence_condition"]
+        )
+        if any(licence):
+            parts.append(("licence", *licence))
+
+        galactic_code = question.get("galactic_code")
+        if galactic_code and "quantita legali" in galactic_code:
+            parts.append(("galactic_code",))
+
+        key = tuple(parts)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _as_set(values: Iterable[Hashable]) -> Tuple:
+    return tuple(sorted(set(values), key=repr))
+
+
+def _as_bag(values: Iterable[Hashable]) -> Tuple:
+    return tuple(sorted(values, key=repr))
+
+
+def corpus_version(recipes: List[Dict]) -> str:
+    """Hash of the recipe corpus, used to invalidate cached matches.
+
+    The records of a whole RecipeStore are hashed by the store, which computes the hash once
+    and again only after a change, without decoding the records.
+    """
+    if recipes and isinstance(recipes[0], RecipeRecord):
+        store = recipes[0].store
+        if len(recipes) == len(store.records) and all(
+            recipe is record for recipe, record in zip(recipes, store.records)
+        ):
+            return store.version()
+
+    try:
+        dump = json.dumps(recipes, sort_keys=True, default=str)
+    except TypeError:
+        dump = repr(recipes)
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+class MatchCache:
+    """LRU cache of the matching recipes by canonical question key.
+
+    The cache belongs to one version of the recipe corpus and is emptied when used with another.
+
+    Args:
+        max_entries (int): Maximum number of cached questions.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def use_version(self, version: str) -> None:
+        """Empties the cache if it holds matches of another corpus version."""
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Tuple) -> List[int] | None:
+        """Returns the cached matches of a key, counting hits and misses."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(self._entries[key])
+        self.misses += 1
+        return None
+
+    def set(self, key: Tuple, matches: List[int]) -> None:
+        """Stores the matches of a key, evicting the least recently used entries."""
+        self._entries[key] = tuple(matches)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def match(
+        self,
+        questions: List[Dict],
+        evaluate: Callable[[List[Dict]], List[List[int]]],
+    ) -> List[List[int]]:
+        """
+        Matches the questions, evaluating only those whose key is neither cached nor repeated.
+        Args:
+            questions (list): List of questions.
+            evaluate (callable): Matches a list of questions, in order.
+        Returns:
+            list: Positions of the matching recipes of each question.
+        """
+        keys = [canonical_question_key(question) for question in questions]
+        results = [None] * len(questions)
+        first = {}
+        pending = []
+        for i, key in enumerate(keys):
+            if key is None:
+                pending.append(i)
+            elif key in first:
+                # repeated in this batch, answered by its first occurrence
+                self.hits += 1
+            else:
+                first[key] = i
+                results[i] = self.get(key)
+                if results[i] is None:
+                    pending.append(i)
+
+        for i, matches in zip(pending, evaluate([questions[i] for i in pending])):
+            results[i] = matches
+            if keys[i] is not None:
+                self.set(keys[i], matches)
+
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = list(results[first[key]])
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the hit/miss counters and the hit rate."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_match_cache = None
+
+
+def get_match_cache() -> MatchCache:
+    """Returns the match cache shared by the runs of this process."""
+    global _match_cache
+    if _match_cache is None:
+        _match_cache = MatchCache(max_entries=Config.match_cache_max_entries)
+    return _match_cache
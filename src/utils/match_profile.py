@@ -0,0 +1,76 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+# stages in the order of the original checks, then the fallback to them
+STAGE_ORDER = [
+    "and",
+    "or",
+    "not",
+    "group",
+    "restaurant",
+    "planet",
+    "sirius",
+    "licence",
+    "galactic_code",
+    "scan",
+]
+
+
+def summarise_profiles(reports: List[Dict]) -> pd.DataFrame:
+    """
+    Aggregates the stage records of `RecipeIndex.explain` reports, one row per stage.
+    Args:
+        reports (list): Reports of the questions.
+    Returns:
+        pd.DataFrame: Runs, candidates, eliminations and time of every stage.
+    """
+    rows = {}
+    for report in reports:
+        for record in report["stages"]:
+            row = rows.setdefault(
+                record["stage"],
+                {"runs": 0, "candidates": 0, "eliminated": 0, "seconds": 0.0},
+            )
+            row["runs"] += 1
+            row["candidates"] += record["candidates"]
+            row["eliminated"] += record["eliminated"]
+            row["seconds"] += record["seconds"]
+
+    df = pd.DataFrame(
+        [
+            {"stage": stage, **rows[stage]}
+            for stage in sorted(rows, key=_stage_position)
+        ],
+        columns=["stage", "runs", "candidates", "eliminated", "seconds"],
+    )
+    df["eliminated_share"] = (df["eliminated"] / df["candidates"]).fillna(0.0)
+    df["ms_per_run"] = (1000 * df["seconds"] / df["runs"]).fillna(0.0)
+    return df
+
+
+def _stage_position(stage: str) -> int:
+    # stages missing from STAGE_ORDER come last
+    return STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER)
+
+
+def save_profiles(reports: List[Dict], output_path: Path | str) -> pd.DataFrame:
+    """
+    Saves the reports of the questions with their summary to a JSON file.
+    Args:
+        reports (list): Reports of the questions.
+        output_path (str): Path to the output JSON file.
+    Returns:
+        pd.DataFrame: The summary.
+    """
+    summary = summarise_profiles(reports)
+    with Path(output_path).open("w") as f:
+        json.dump(
+            {"summary": summary.to_dict(orient="records"), "questions": reports},
+            f,
+            indent=4,
+            default=str,
+        )
+    return summary
@@ -1,10 +1,18 @@
 import csv
+import re
+from typing import Dict, List
 
 import pandas as pd
 
 from src.config import Config
 
-from .misc import roman_to_int
+from .misc import normalise_string, roman_to_int
+
+# (question key, recipe key) pairs of the and/or/not clauses
+CLAUSE_KEYS = [
+    ("ingredients", "recipe_ingredients"),
+    ("techniques", "recipe_techniques"),
+]
 
 
 def load_illegal_ingredients(filepath):
@@ -67,23 +75,31 @@ def check_not_conditions(question, recipe, conditions):
     return True
 
 
-def check_additional_filters(question, recipe):
+def check_additional_filters(question, recipe, profile=None):
+    """
+    Checks the group, restaurant, planet, sirius, licence and galactic code filters.
+    If a `profile` dict is given, the filter rejecting the recipe gets its count incremented.
+    """
     # Filters based on groups, restaurant - single match 1 to 1
-    for q_key, r_key in [
-        ("group", "recipe_group"),  # TODO: fix groups
-        ("restaurants", "recipe_restaurant"),
+    for stage, q_key, r_key in [
+        ("group", "group", "recipe_group"),  # TODO: fix groups
+        ("restaurant", "restaurants", "recipe_restaurant"),
     ]:
         if question.get(q_key) and recipe.get(r_key):
             if question.get(q_key) != recipe.get(r_key):
-                return False
+                return _eliminated(profile, stage)
 
     # Filters based on planet - multiple many to 1
     for q_key, r_key in [
         ("planet", "restaurant_planet"),
     ]:
         if question.get(q_key) and recipe.get(r_key):
-            if not any(item == recipe.get(r_key) for item in question.get(q_key)):
-                return False
+            # planet ids are only set when every name resolved, see src.utils.planets
+            if "planet_ids" in question and "restaurant_planet_id" in recipe:
+                if recipe["restaurant_planet_id"] not in question["planet_ids"]:
+                    return _eliminated(profile, "planet")
+            elif not any(item == recipe.get(r_key) for item in question.get(q_key)):
+                return _eliminated(profile, "planet")
 
     # Filters on technique groups based on Sirius flag - multiple many to many
     if question.get("sirius_flag"):
@@ -94,7 +110,7 @@ def check_additional_filters(question, recipe):
                 if not all(
                     item in recipe.get(r_key, ["error"]) for item in question.get(q_key)
                 ):
-                    return False
+                    return _eliminated(profile, "sirius")
 
     # Filter based on licenses
     required_license_name = question.get("licence_name")
@@ -108,32 +124,110 @@ def check_additional_filters(question, recipe):
         required_license_condition,
         chef_licenses,
     ):
-        return False
+        return _eliminated(profile, "licence")
 
     # Filter based on galactic code
     if question.get("galactic_code") and "quantita legali" in question.get(
         "galactic_code"
     ):
-        illegal_ingredients_df = pd.read_csv(Config.illegal_ingredients_path)
-        illegal_ingredients = dict(
-            zip(
-                illegal_ingredients_df["substance"],
-                illegal_ingredients_df["volume_limit_perc"],
-            )
+        if not within_legal_limits(recipe):
+            return _eliminated(profile, "galactic_code")
+
+    return True
+
+
+def _eliminated(profile, stage):
+    if profile is not None:
+        profile[stage] = profile.get(stage, 0) + 1
+    return False
+
+
+def load_legal_limits(filepath=None):
+    """Loads the volume limit of every regulated substance from the galactic code CSV, by normalised name."""
+    illegal_ingredients_df = pd.read_csv(filepath or Config.illegal_ingredients_path)
+    return {
+        normalise_string(substance): float(limit)
+        for substance, limit in zip(
+            illegal_ingredients_df["substance"],
+            illegal_ingredients_df["volume_limit_perc"],
         )
-        recipe_name = recipe.get("recipe_name")
-        for restricted in recipe.get("restricted_ingredients", []):
-            if restricted.get("recipe") == recipe_name:
-                ingredient = restricted.get("ingredient")
-                quantity = restricted.get("quantity")
-                if ingredient in illegal_ingredients:
-                    quantity_int = int("".join(filter(str.isdigit, quantity)))
-                    if quantity_int > illegal_ingredients[ingredient]:
-                        return False
+    }
 
+
+def parse_quantity(quantity) -> float | None:
+    """Parses the first number of a quantity such as "12%", "5.5 %" or 3, None if there is none."""
+    match = re.search(r"\d+(?:[.,]\d+)?", str(quantity))
+    if match is None:
+        return None
+    return float(match.group().replace(",", "."))
+
+
+def parse_restricted_quantities(recipe) -> Dict[str, float]:
+    """Returns the parsed quantity of each restricted ingredient of a recipe, by normalised name."""
+    recipe_name = recipe.get("recipe_name")
+    quantities = {}
+    for restricted in recipe.get("restricted_ingredients") or []:
+        if restricted.get("recipe") == recipe_name and restricted.get("ingredient"):
+            quantity = parse_quantity(restricted.get("quantity"))
+            if quantity is not None:
+                ingredient = normalise_string(restricted["ingredient"])
+                quantities[ingredient] = max(
+                    quantity, quantities.get(ingredient, quantity)
+                )
+    return quantities
+
+
+def check_legal_quantities(recipe, illegal_ingredients):
+    for ingredient, quantity in parse_restricted_quantities(recipe).items():
+        if (
+            ingredient in illegal_ingredients
+            and quantity > illegal_ingredients[ingredient]
+        ):
+            return False
     return True
 
 
+def within_legal_limits(recipe, illegal_ingredients=None):
+    """
+    Checks the galactic code limits of a recipe, reading the flag precomputed by
+    `add_legal_compliance` when the recipe has one.
+    Args:
+        recipe (dict): The recipe.
+        illegal_ingredients (dict): Limits by substance, loaded from the CSV when needed and not given.
+    Returns:
+        bool: Whether no restricted ingredient exceeds its limit.
+    """
+    if recipe.get("within_legal_limits") is not None:
+        return recipe["within_legal_limits"]
+    if illegal_ingredients is None:
+        illegal_ingredients = load_legal_limits()
+    return check_legal_quantities(recipe, illegal_ingredients)
+
+
+def add_legal_compliance(recipes: List[Dict], illegal_ingredients: Dict) -> Dict:
+    """
+    Stores `within_legal_limits` on every recipe and builds the compliance table.
+    Args:
+        recipes (list): List of recipes.
+        illegal_ingredients (dict): Limits by substance, see `load_legal_limits`.
+    Returns:
+        dict: The limits and, for every recipe, its parsed restricted quantities and flag.
+    """
+    table = []
+    for recipe in recipes:
+        recipe["within_legal_limits"] = check_legal_quantities(
+            recipe, illegal_ingredients
+        )
+        table.append(
+            {
+                "recipe_name": recipe.get("recipe_name"),
+                "quantities": parse_restricted_quantities(recipe),
+                "within_legal_limits": recipe["within_legal_limits"],
+            }
+        )
+    return {"limits": illegal_ingredients, "recipes": table}
+
+
 def check_license_conditions(
     required_license_name,
     required_license_level,
@@ -1,35 +1,39 @@
-import re
-from difflib import get_close_matches
 from typing import Dict, List
 
 import pandas as pd
 
-from .lookup_lists import technique_groups_names
+from .lookup_lists import Vocabulary, get_vocabulary, technique_group_table
+from .text import normalise_string  # noqa: F401, re-exported
 
 
-def clean_data(data_list: List[Dict], key: str, mapping_list: List[str]) -> List[Dict]:
+def clean_data(
+    data_list: List[Dict], key: str, mapping_list: Vocabulary | List[str]
+) -> List[Dict]:
     """
     Cleans the data list by updating values with the most similar string from the mapping list.
     Args:
         data_list (list): List of dictionaries containing the data.
         key (str): Key to process.
-        mapping_list (list): List of strings to map to.
+        mapping_list (Vocabulary|list): Vocabulary, or list of strings, to map to.
     Returns:
         list: Cleaned data list.
     """
+    if not isinstance(mapping_list, Vocabulary):
+        mapping_list = Vocabulary(mapping_list)
 
-    def get_most_similar(value: str, mapping_list: List[str]) -> str:
-        normalized_value = normalise_string(value)
-        normalized_mapping_list = [normalise_string(item) for item in mapping_list]
-        matches = get_close_matches(
-            normalized_value, normalized_mapping_list, n=1, cutoff=0
-        )
-        out = matches[0]
-        return normalise_string(out)
+    # the distinct strings of the column are snapped together, see Vocabulary.snap_many
+    strings = {}
+    for item in data_list:
+        value = item.get(key)
+        # only the licence names of chef_licences are snapped, the levels are parsed
+        if key == "chef_licences" and isinstance(value, dict):
+            value = list(value)
+        _collect_strings(value, strings)
+    snapped = dict(zip(strings, mapping_list.snap_many(list(strings))))
 
     def clean_value(value):
         if isinstance(value, str):
-            return get_most_similar(value, mapping_list)
+            return snapped[value]
         elif isinstance(value, dict):
             return {k: clean_value(v) for k, v in value.items()}
         elif isinstance(value, list):
@@ -54,18 +58,29 @@ def clean_data(data_list: List[Dict], key: str, mapping_list: List[str]) -> List
     return cleaned_data_list
 
 
+def _collect_strings(value, strings: Dict[str, None]):
+    if isinstance(value, str):
+        strings[value] = None
+    elif isinstance(value, dict):
+        for v in value.values():
+            _collect_strings(v, strings)
+    elif isinstance(value, list):
+        for v in value:
+            _collect_strings(v, strings)
+
+
+def format_result_ids(ids: List[int]) -> str:
+    """Formats the dish ids of a question for the result column, "0" when there is none."""
+    return ",".join(map(str, ids)) if ids else "0"
+
+
 def get_output_df(data: List[Dict]) -> pd.DataFrame:
     """Creates a DataFrame from a list of dictionaries."""
     df = pd.DataFrame(
         {
             "row_id": range(1, len(data) + 1),
             "result": [
-                str(item["matching_recipes_ids"][0])
-                if len(item["matching_recipes_ids"]) == 1
-                else ",".join(map(str, item["matching_recipes_ids"]))
-                if item["matching_recipes_ids"]
-                else "0"
-                for item in data
+                format_result_ids(item["matching_recipes_ids"]) for item in data
             ],
         }
     )
@@ -97,40 +112,35 @@ def normalise_keys(data: dict) -> dict:
     return {normalise_string(key): value for key, value in data.items()}
 
 
-def normalise_string(s: str) -> str:
-    s = s.lower()
-    s = re.sub(r"\W+", " ", s)
-    s = re.sub(r"\s+", "_", s)
-    return s
-
-
-def extract_technique_groups(techniques: List[str] | None) -> List[str]:
+def extract_technique_groups(
+    techniques: List[str] | None,
+    table: Dict[str, str] = None,
+    vocabulary: Vocabulary = None,
+) -> List[str]:
     """
     Extracts macro categories from techniques.
+    Techniques snapped to technique_names are looked up in the technique group table, the other
+    ones are matched against the group names.
     Args:
         techniques (list): List of techniques.
+        table (dict): Group by normalised technique, defaults to technique_group_table.
+        vocabulary (Vocabulary): Technique groups, defaults to the
+            "technique_groups" vocabulary.
     Returns:
         list: List of technique groups.
     """
     if techniques is None:
         return []
 
-    result = []
+    table = technique_group_table if table is None else table
+    vocabulary = vocabulary or get_vocabulary("technique_groups")
+    groups = []
     for technique in techniques:
-        normalized_techique = normalise_string(technique)
-        normalized_technique_groups = [
-            normalise_string(technique_group)
-            for technique_group in technique_groups_names
-        ]
-        matches = get_close_matches(
-            normalized_techique, normalized_technique_groups, n=1, cutoff=0
-        )
-        if matches:
-            result.append(matches[0])
-        else:
-            result.append("not matched")
-
-    return result
+        group = table.get(normalise_string(technique))
+        if group is None:
+            group = vocabulary.closest(technique) or "not matched"
+        groups.append(group)
+    return groups
 
 
 def roman_to_int(roman: str | int) -> int:
@@ -156,3 +166,12 @@ def roman_to_int(roman: str | int) -> int:
             result += value
         prev_value = value
     return result if result >= 0 else 0
+
+
+def is_hashable(value) -> bool:
+    """Returns whether a value can be a dict key or a set member."""
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
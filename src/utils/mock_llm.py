@@ -0,0 +1,220 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import typing
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+from typing_extensions import is_typeddict
+
+from src.config import Config
+from src.datamodels import RecipeModel, RequestModel, RestaurantModel
+
+MOCK_MODELS = {
+    model.__name__: model for model in [RecipeModel, RestaurantModel, RequestModel]
+}
+
+
+class MockLLMError(Exception):
+    """Injected provider failure."""
+
+
+class MockRateLimitError(MockLLMError):
+    """Injected rate-limit failure, carries the suggested wait like a 429 response."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class MockClient:
+    """Offline stand-in for an aisuite client, selected with provider "mock".
+
+    Modes:
+        - "record": forwards requests to Config.mock_record_provider and appends every
+          answer to the recordings file.
+        - "replay": answers from the recordings file, keyed by model and messages, and
+          fails on requests that were never recorded.
+        - "synthetic": answers with random but schema-valid JSON for the datamodel named
+          in the system message, seeded by the request so runs are reproducible.
+
+    Latency, errors and rate limits are injected in every mode following Config.mock_*.
+    """
+
+    def __init__(
+        self,
+        mode: str | None = None,
+        recordings_path: Path | str | None = None,
+        latency_mean: float | None = None,
+        latency_std: float | None = None,
+        error_rate: float | None = None,
+        rate_limit_rate: float | None = None,
+        seed: int | None = None,
+    ):
+        self.mode = mode or Config.mock_mode
+        self.recordings_path = Path(recordings_path or Config.mock_recordings_path)
+        self.latency_mean = _default(latency_mean, Config.mock_latency_mean)
+        self.latency_std = _default(latency_std, Config.mock_latency_std)
+        self.error_rate = _default(error_rate, Config.mock_error_rate)
+        self.rate_limit_rate = _default(rate_limit_rate, Config.mock_rate_limit_rate)
+        self.seed = _default(seed, Config.mock_seed)
+
+        if self.mode not in ("record", "replay", "synthetic"):
+            raise ValueError(f"Unknown mock mode '{self.mode}'")
+
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._recordings = self._load_recordings() if self.mode == "replay" else {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict], **kwargs) -> SimpleNamespace:
+        """Answers a chat completion request, mirroring `client.chat.completions.create`."""
+        model_name = model.partition(":")[2] or model
+        sys_message, message = _split_messages(messages)
+        json_output = kwargs.get("response_format") is not None
+        key = _recording_key(model_name, sys_message, message, json_output)
+
+        self._inject_failures()
+
+        if self.mode == "record":
+            from src.utils.clients import get_client
+
+            client = get_client(Config.mock_record_provider)
+            response = client.chat.completions.create(
+                model=f"{Config.mock_record_provider}:{model_name}",
+                messages=messages,
+                **kwargs,
+            )
+            content = response.choices[0].message.content
+            self._record(key, content)
+        elif self.mode == "replay":
+            if key not in self._recordings:
+                raise MockLLMError(f"No recording for request {key}")
+            content = self._recordings[key]
+        else:
+            content = synthetic_response(sys_message, message, key, self.seed)
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    def _inject_failures(self) -> None:
+        with self._lock:
+            latency = max(0.0, self._random.gauss(self.latency_mean, self.latency_std))
+            draw = self._random.random()
+
+        time.sleep(latency)
+
+        if draw < self.rate_limit_rate:
+            raise MockRateLimitError(retry_after=self.latency_mean + 1)
+        if draw < self.rate_limit_rate + self.error_rate:
+            raise MockLLMError("Injected provider error")
+
+    def _record(self, key: str, content: str) -> None:
+        with self._lock:
+            self.recordings_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.recordings_path.open("a") as f:
+                f.write(json.dumps({"key": key, "content": content}) + "\n")
+
+    def _load_recordings(self) -> Dict[str, str]:
+        recordings = {}
+        if self.recordings_path.exists():
+            with self.recordings_path.open("r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        recordings[record["key"]] = record["content"]
+        return recordings
+
+
+def synthetic_response(sys_message: str, message: str, key: str, seed: int) -> str:
+    """Builds a schema-valid JSON answer for the datamodel mentioned in the system message.
+
+    Batched requests (see `process_data`) get one answer per `item_id` found in the message.
+
+    Args:
+        sys_message (str): The system message of the request.
+        message (str): The user message of the request.
+        key (str): Key of the request, used to seed the random generator.
+        seed (int): Global seed.
+
+    Returns:
+        str: JSON answer.
+    """
+    model = next(
+        (model for name, model in MOCK_MODELS.items() if name in sys_message), None
+    )
+    if model is None:
+        raise MockLLMError("No known datamodel in the system message")
+
+    rng = random.Random(f"{seed}:{key}")
+    item_ids = re.findall(r"item_id: (\d+)", message)
+    if item_ids:
+        items = [
+            {"item_id": int(item_id), **random_instance(model, rng)}
+            for item_id in item_ids
+        ]
+        return json.dumps({"items": items}, ensure_ascii=False)
+
+    return json.dumps(random_instance(model, rng), ensure_ascii=False)
+
+
+def random_instance(model: type[BaseModel], rng: random.Random) -> Dict[str, Any]:
+    """Draws a random instance of a pydantic model as a dictionary."""
+    return {
+        name: random_value(field.annotation, rng)
+        for name, field in model.model_fields.items()
+    }
+
+
+def random_value(annotation: Any, rng: random.Random) -> Any:
+    """Draws a random value matching a type annotation."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Annotated:
+        return random_value(args[0], rng)
+    if origin is typing.Literal:
+        return rng.choice(args)
+    if origin is typing.Union:
+        return random_value(next(arg for arg in args if arg is not type(None)), rng)
+    if origin is list:
+        return [random_value(args[0], rng) for _ in range(rng.randint(1, 3))]
+    if is_typeddict(annotation):
+        hints = typing.get_type_hints(annotation)
+        keys = rng.sample(list(hints), rng.randint(1, len(hints)))
+        return {key: random_value(hints[key], rng) for key in keys}
+    if origin is dict:
+        key_type, value_type = args
+        if typing.get_origin(key_type) is typing.Literal:
+            keys = rng.sample(key_type.__args__, rng.randint(1, len(key_type.__args__)))
+        else:
+            keys = [random_value(key_type, rng) for _ in range(rng.randint(1, 3))]
+        return {key: random_value(value_type, rng) for key in keys}
+    if annotation is bool:
+        return rng.random() < 0.5
+    if annotation is int:
+        return rng.randint(1, 10)
+    if annotation is float:
+        return rng.random()
+    return f"mock {rng.randint(0, 999)}"
+
+
+def _recording_key(model: str, sys_message: str, message: str, json_output: bool):
+    payload = json.dumps([model, sys_message, message, json_output], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _split_messages(messages: List[Dict]) -> tuple[str, str]:
+    sys_message = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    message = "\n".join(m["content"] for m in messages if m["role"] == "user")
+    return sys_message, message
+
+
+def _default(value, default):
+    return default if value is None else value
@@ -0,0 +1,98 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from .recipe_index import RecipeIndex
+
+# index of the worker processes, inherited from the parent when processes are forked
+_index: RecipeIndex = None
+
+
+def _init_worker(index: RecipeIndex):
+    global _index
+    _index = index
+
+
+def _match_chunk(questions: List[Dict]) -> List[List[int]]:
+    return [_index.match(question) for question in questions]
+
+
+class ParallelMatcher:
+    """Pool of processes matching questions on an index, reused across calls.
+
+    The pool is started by the first call that needs more than one chunk and kept until
+    `close` (or the end of the `with` block), so matching a stream window by window forks
+    the workers once. With the "fork" start method the workers inherit the index from the
+    parent instead of unpickling it; the questions travel in chunks and the results come
+    back in question order.
+
+    Args:
+        index (RecipeIndex): Index of the recipes.
+        workers (int): Number of processes, 1 matches in the current process.
+        chunk_size (int): Number of questions sent to a worker at once.
+    """
+
+    def __init__(self, index: RecipeIndex, workers: int = 1, chunk_size: int = 256):
+        self.index = index
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pool = None
+
+    def __enter__(self) -> "ParallelMatcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def match(self, questions: List[Dict]) -> List[List[int]]:
+        """Returns the positions of the recipes matching each question, in corpus order."""
+        if self.workers <= 1 or len(questions) <= self.chunk_size:
+            return [self.index.match(question) for question in questions]
+
+        chunks = [
+            questions[start : start + self.chunk_size]
+            for start in range(0, len(questions), self.chunk_size)
+        ]
+        results = self._get_pool(questions).map(_match_chunk, chunks)
+        return [matches for chunk in results for matches in chunk]
+
+    def close(self):
+        """Shuts the pool down."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _get_pool(self, questions: List[Dict]) -> ProcessPoolExecutor:
+        if self.pool is None:
+            # computed once before forking rather than once per worker, when needed
+            # a missing or malformed limits CSV is raised here, once
+            if any(question.get("galactic_code") for question in questions):
+                self.index.legal()
+
+            start_method = (
+                "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            )
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_worker,
+                initargs=(self.index,),
+            )
+        return self.pool
+
+
+def match_in_parallel(
+    index: RecipeIndex, questions: List[Dict], workers: int = 1, chunk_size: int = 256
+) -> List[List[int]]:
+    """
+    Matches the questions on a pool of processes, in chunks, see ParallelMatcher.
+    Args:
+        index (RecipeIndex): Index of the recipes.
+        questions (list): List of questions.
+        workers (int): Number of processes, 1 matches in the current process.
+        chunk_size (int): Number of questions sent to a worker at once.
+    Returns:
+        list: Positions of the matching recipes of each question.
+    """
+    with ParallelMatcher(index, workers, chunk_size) as matcher:
+        return matcher.match(questions)
@@ -0,0 +1,137 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from src.config import Config
+
+from .misc import normalise_string
+
+
+class PlanetDistanceIndex:
+    """Dense matrix of the distances between planets, with planets interned as integer ids.
+
+    Ids follow the order of the rows of the distances CSV. Names are looked up normalised, the
+    way questions and recipes store them.
+
+    Args:
+        names (list): Planet names, lowercased, in id order.
+        distances (np.ndarray): Square matrix of distances, indexed by planet id.
+    """
+
+    def __init__(self, names: List[str], distances: np.ndarray):
+        self.names = list(names)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.ids = {normalise_string(name): i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_csv(cls, distances_path: Path | str) -> "PlanetDistanceIndex":
+        """Reads the distances CSV, with the planets in the "/" column and in the header."""
+        distances = pd.read_csv(distances_path)
+        distances.index = distances["/"].str.lower()
+        distances = distances.drop(columns="/")
+        distances.columns = distances.columns.str.lower()
+        # columns in the order of the rows, so that the matrix is symmetric in its ids
+        distances = distances[distances.index]
+        return cls(distances.index.tolist(), distances.to_numpy())
+
+    @classmethod
+    def load(
+        cls, distances_path: Path | str, cache_path: Path | str = None
+    ) -> "PlanetDistanceIndex":
+        """
+        Loads the index of a distances CSV, from the on-disk cache when the CSV did not change.
+        Args:
+            distances_path (str): Path to the CSV file containing distances.
+            cache_path (str): Path to the .npz cache, defaults to Config.planet_index_cache_path.
+        Returns:
+            PlanetDistanceIndex: The index.
+        """
+        distances_path = Path(distances_path)
+        cache_path = Path(cache_path or Config.planet_index_cache_path)
+        source_hash = hashlib.sha256(distances_path.read_bytes()).hexdigest()
+
+        if cache_path.exists():
+            with np.load(cache_path) as cached:
+                if str(cached["source_hash"]) == source_hash:
+                    return cls(cached["names"].tolist(), cached["distances"])
+
+        index = cls.from_csv(distances_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with cache_path.open("wb") as f:
+            np.savez(
+                f,
+                names=np.array(index.names),
+                distances=index.distances,
+                source_hash=np.array(source_hash),
+            )
+        return index
+
+    def planet_id(self, name: str) -> int | None:
+        """Id of a planet, None if it is unknown."""
+        if not isinstance(name, str):
+            return None
+        return self.ids.get(normalise_string(name))
+
+    def planet_ids(self, names: Iterable[str]) -> List[int] | None:
+        """Ids of the planets, None unless every name is known."""
+        ids = [self.planet_id(name) for name in names]
+        if not ids or any(i is None for i in ids):
+            return None
+        return ids
+
+    def within(self, origins: Iterable[int], radius: float) -> np.ndarray:
+        """Sorted ids of the planets closer than `radius` to any of the origins."""
+        origins = list(origins)
+        if not origins:
+            return np.array([], dtype=np.int64)
+        return np.flatnonzero((self.distances[origins] < radius).any(axis=0))
+
+
+@lru_cache(maxsize=None)
+def get_planet_index(distances_path: Path | str) -> PlanetDistanceIndex:
+    """Planet distance index of a CSV, loaded once per process."""
+    return PlanetDistanceIndex.load(distances_path)
+
+
+def add_question_planet_ids(
+    questions: List[Dict], index: PlanetDistanceIndex
+) -> List[Dict]:
+    """
+    Adds `planet_ids` to the questions whose planets are all known to the index.
+    Args:
+        questions (list): List of questions.
+        index (PlanetDistanceIndex): Planet index.
+    Returns:
+        list: List of questions.
+    """
+    for question in questions:
+        question.pop("planet_ids", None)
+        planets = question.get("planet")
+        if planets and isinstance(planets, list):
+            ids = index.planet_ids(planets)
+            if ids is not None:
+                question["planet_ids"] = ids
+    return questions
+
+
+def add_recipe_planet_ids(
+    recipes: List[Dict], index: PlanetDistanceIndex
+) -> List[Dict]:
+    """
+    Adds `restaurant_planet_id` to the recipes whose planet is known to the index.
+    Args:
+        recipes (list): List of recipes, or of restaurants which the recipes read it from.
+        index (PlanetDistanceIndex): Planet index.
+    Returns:
+        list: List of recipes.
+    """
+    for recipe in recipes:
+        recipe.pop("restaurant_planet_id", None)
+        planet_id = index.planet_id(recipe.get("restaurant_planet"))
+        if planet_id is not None:
+            recipe["restaurant_planet_id"] = planet_id
+    return recipes
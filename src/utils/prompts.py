@@ -0,0 +1,126 @@
+import re
+import typing
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+from typing_extensions import is_typeddict
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Prompt templates rendered once per run.
+
+    The system message holds the instructions and the schema and is identical for every
+    item. The user message template keeps its static instructions before the request, so
+    the whole prompt up to the item text is a shared prefix for provider-side caching.
+    """
+
+    system_message: str
+    message_template: str
+    tokens: Dict[str, int] = field(default_factory=dict)
+
+    def render(self, request: str) -> str:
+        """Renders the user message of one item."""
+        return self.message_template.format(request=request)
+
+
+@lru_cache(maxsize=None)
+def compile_prompt(
+    system_message_template: str,
+    message_template: str,
+    output_model: type[BaseModel] | str,
+) -> CompiledPrompt:
+    """Renders the system message with the compact schema of the output model.
+
+    Templates are dedented by the indentation of the Config class body, which alone drops
+    a few hundred whitespace tokens from the multi-line strings. The result is cached, so every pipeline renders its prompt once.
+
+    Args:
+        system_message_template (str): Template for the system message, with an `{output_model_str}` field.
+        message_template (str): Template for the user message, with a `{request}` field.
+        output_model (BaseModel | str): Pydantic output model, or an already rendered schema.
+
+    Returns:
+        CompiledPrompt: The compiled prompt.
+    """
+    schema = (
+        output_model if isinstance(output_model, str) else compact_schema(output_model)
+    )
+    system_message = dedent(system_message_template).format(output_model_str=schema)
+    message_template = dedent(message_template)
+
+    tokens = {
+        "system": estimate_tokens(system_message),
+        "message": estimate_tokens(message_template.format(request="")),
+    }
+    name = output_model if isinstance(output_model, str) else output_model.__name__
+    print(
+        f"Compiled prompt for {name[:40]}: ~{tokens['system']} system tokens, "
+        f"~{tokens['message']} message tokens per item"
+    )
+
+    return CompiledPrompt(system_message, message_template, tokens)
+
+
+def compact_schema(model: type[BaseModel], fields: List[str] | None = None) -> str:
+    """Renders a pydantic model as a short field list instead of its Python source.
+
+    Example:
+        RecipeModel, a JSON object with fields:
+        - recipe_ingredients (list[str]): List of ingredients that compose a recipe
+
+    Args:
+        model (BaseModel): The pydantic model.
+        fields (list, optional): Only render these fields.
+
+    Returns:
+        str: The compact schema.
+    """
+    lines = [f"{model.__name__}, a JSON object with fields (null when unknown):"]
+    for name, field_info in model.model_fields.items():
+        if fields is not None and name not in fields:
+            continue
+        line = f"- {name} ({render_type(field_info.annotation)})"
+        if field_info.description:
+            line += f": {field_info.description}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_type(annotation: Any) -> str:
+    """Renders a type annotation in a compact, language-neutral form."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is typing.Annotated:
+        return render_type(args[0])
+    if origin is typing.Literal:
+        return "one of " + "|".join(f'"{arg}"' for arg in args)
+    if origin is typing.Union:
+        return " | ".join(
+            "null" if arg is type(None) else render_type(arg) for arg in args
+        )
+    if origin is list:
+        return f"list[{render_type(args[0])}]"
+    if origin is dict:
+        return f"dict[{render_type(args[0])}, {render_type(args[1])}]"
+    if is_typeddict(annotation):
+        hints = typing.get_type_hints(annotation)
+        return (
+            "{"
+            + ", ".join(f'"{key}": {render_type(hint)}' for key, hint in hints.items())
+            + "}"
+        )
+    return getattr(annotation, "__name__", str(annotation))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def dedent(template: str) -> str:
+    """Removes the class body indentation (up to four spaces) from every line of a template."""
+    return re.sub(r"^ {1,4}", "", template, flags=re.MULTILINE).strip()
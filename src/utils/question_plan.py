@@ -0,0 +1,352 @@
+from dataclasses import dataclass
+from functools import reduce
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from .matching import CLAUSE_KEYS
+
+if TYPE_CHECKING:
+    from .recipe_index import RecipeIndex
+
+# stages calling the per-recipe checks run after the bitset ones, in the original order
+BITSET_COST = 0
+LICENCE_COST = 1
+GALACTIC_CODE_COST = 2
+
+
+@dataclass(frozen=True)
+class PlanStage:
+    """A filter of a compiled question.
+
+    Attributes:
+        name (str): Kind of filter: "and", "or", "not", "group", "restaurant", "planet",
+            "sirius", "licence" or "galactic_code".
+        field (str): Recipe field the filter reads.
+        args (dict): Constants taken from the question, for inspection.
+        estimate (int): Estimated number of recipes passing the filter.
+        cost (int): Stages are ordered by cost first, then by estimate.
+        apply (callable): Restricts a bitset of candidate recipes.
+    """
+
+    name: str
+    field: str
+    args: Dict
+    estimate: int
+    cost: int
+    apply: Callable[[int], int]
+
+
+@dataclass(frozen=True)
+class QuestionPlan:
+    """A question compiled against a RecipeIndex, with the filters ordered by selectivity.
+
+    Attributes:
+        index (RecipeIndex): Index the plan runs on.
+        question (dict): The parsed question.
+        stages (list): Filters in execution order.
+        regular (bool): False when the question has an unexpected shape and every recipe
+            goes through the per-recipe checks.
+    """
+
+    index: "RecipeIndex"
+    question: Dict
+    stages: List[PlanStage]
+    regular: bool = True
+
+    def execute(
+        self,
+        candidates: int = None,
+        min_cost: int = BITSET_COST,
+        profile: List[Dict] = None,
+    ) -> int:
+        """
+        Returns the bitset of the recipes matching the question.
+        Args:
+            candidates (int): Bitset of the indexed recipes already known to pass the stages
+                cheaper than `min_cost`. Defaults to every indexed recipe.
+            min_cost (int): Stages with a lower cost are skipped.
+            profile (list): If given, a record with the candidates, eliminations and time of
+                every stage run is appended to it.
+        Returns:
+            int: Bitset of the matching recipes, indexed or not.
+        """
+        if not self.regular:
+            return self._scan(self.index.all, profile)
+
+        mask = self.index.all & ~self.index.bits["irregular"]
+        if candidates is not None:
+            mask &= candidates
+        for stage in self.stages:
+            if not mask:
+                break
+            if stage.cost < min_cost:
+                continue
+            try:
+                if profile is None:
+                    mask = stage.apply(mask)
+                else:
+                    mask = self._profile_stage(stage, mask, profile)
+            except Exception:
+                # let the per-recipe checks decide (or raise) on what is left
+                return self._scan(mask, profile) | self._scan(
+                    self.index.bits["irregular"], profile
+                )
+        return mask | self._scan(self.index.bits["irregular"], profile)
+
+    def _profile_stage(self, stage: PlanStage, mask: int, profile: List[Dict]) -> int:
+        start = perf_counter()
+        result = stage.apply(mask)
+        profile.append(
+            {
+                "stage": stage.name,
+                "field": stage.field,
+                "candidates": mask.bit_count(),
+                "eliminated": mask.bit_count() - result.bit_count(),
+                "seconds": perf_counter() - start,
+            }
+        )
+        return result
+
+    def _scan(self, candidates: int, profile: List[Dict] = None) -> int:
+        if profile is None or not candidates:
+            return self.index.scan(self.question, candidates)
+
+        start = perf_counter()
+        eliminated_by = {}
+        result = self.index.scan(self.question, candidates, eliminated_by)
+        profile.append(
+            {
+                "stage": "scan",
+                "field": None,
+                "candidates": candidates.bit_count(),
+                "eliminated": candidates.bit_count() - result.bit_count(),
+                "seconds": perf_counter() - start,
+                "eliminated_by": eliminated_by,
+            }
+        )
+        return result
+
+    def describe(self) -> List[Dict]:
+        """Returns the stages of the plan in execution order."""
+        if not self.regular:
+            return [
+                {
+                    "stage": "scan",
+                    "field": None,
+                    "args": {},
+                    "estimate": self.index.size,
+                }
+            ]
+        return [
+            {
+                "stage": stage.name,
+                "field": stage.field,
+                "args": stage.args,
+                "estimate": stage.estimate,
+            }
+            for stage in self.stages
+        ]
+
+
+def compile_question(index: "RecipeIndex", question: Dict) -> QuestionPlan:
+    """
+    Compiles a parsed question into a plan of bitset filters.
+    Term bitsets and question constants are looked up once, empty clauses are dropped and the
+    filters are ordered so that the most selective ones run first; the plan stops as soon as no
+    candidate is left.
+    Args:
+        index (RecipeIndex): Index of the recipes.
+        question (dict): The parsed question.
+    Returns:
+        QuestionPlan: The compiled plan.
+    """
+    if not index.is_regular_question(question):
+        return QuestionPlan(index, question, [], regular=False)
+
+    stages = [
+        *_clause_stages(index, question),
+        *_value_stages(index, question),
+        _licence_stage(index, question),
+    ]
+
+    galactic_code = question.get("galactic_code")
+    if galactic_code and "quantita legali" in galactic_code:
+        stages.append(
+            PlanStage(
+                name="galactic_code",
+                field="restricted_ingredients",
+                args={"galactic_code": galactic_code},
+                estimate=index.legal_estimate(),
+                cost=GALACTIC_CODE_COST,
+                apply=lambda mask: mask & index.legal(),
+            )
+        )
+
+    stages.sort(key=lambda stage: (stage.cost, stage.estimate))
+    return QuestionPlan(index, question, stages)
+
+
+def _clause_stages(index: "RecipeIndex", question: Dict) -> List[PlanStage]:
+    stages = []
+    for q_key, r_key in CLAUSE_KEYS:
+        clause = question.get(q_key)
+        if not clause:
+            continue
+        present = index.bits[f"present:{r_key}"]
+
+        and_terms = list(dict.fromkeys(clause.get("and") or []))
+        if and_terms:
+            # most selective term first, so the mask empties early
+            bits = sorted(
+                (index.term(r_key, term) for term in and_terms), key=int.bit_count
+            )
+            stages.append(
+                PlanStage(
+                    name="and",
+                    field=r_key,
+                    args={"terms": and_terms},
+                    estimate=min(present.bit_count(), bits[0].bit_count()),
+                    cost=BITSET_COST,
+                    apply=lambda mask, present=present, bits=bits: _intersect(
+                        mask & present, bits
+                    ),
+                )
+            )
+
+        or_terms = list(clause.get("or") or [])
+        if or_terms:
+            or_length = clause.get("or_length", 1)
+            if or_length is None or or_length <= 0:
+                # only the presence of the field is checked
+                estimate = present.bit_count()
+                apply = lambda mask, present=present: mask & present
+            else:
+                # a recipe needs or_length hits, so at most sum(df) / or_length recipes pass
+                total = sum(index.term(r_key, term).bit_count() for term in or_terms)
+                estimate = min(present.bit_count(), total // or_length)
+
+                def apply(
+                    mask, present=present, r_key=r_key, terms=or_terms, k=or_length
+                ):
+                    return index.at_least(r_key, terms, k, mask & present)
+
+            stages.append(
+                PlanStage(
+                    name="or",
+                    field=r_key,
+                    args={"terms": or_terms, "or_length": or_length},
+                    estimate=estimate,
+                    cost=BITSET_COST,
+                    apply=apply,
+                )
+            )
+
+        not_terms = list(dict.fromkeys(clause.get("not") or []))
+        if not_terms:
+            excluded = reduce(
+                int.__or__, (index.term(r_key, term) for term in not_terms), 0
+            )
+            allowed = present & ~excluded
+            stages.append(
+                PlanStage(
+                    name="not",
+                    field=r_key,
+                    args={"terms": not_terms},
+                    estimate=allowed.bit_count(),
+                    cost=BITSET_COST,
+                    apply=lambda mask, allowed=allowed: mask & allowed,
+                )
+            )
+
+    return stages
+
+
+def _value_stages(index: "RecipeIndex", question: Dict) -> List[PlanStage]:
+    stages = []
+
+    for name, q_key, r_key in [
+        ("group", "group", "recipe_group"),
+        ("restaurant", "restaurants", "recipe_restaurant"),
+    ]:
+        value = question.get(q_key)
+        if value:
+            # recipes without the field are not filtered
+            allowed = index.term(r_key, value) | index.bits[f"falsy:{r_key}"]
+            stages.append(_mask_stage(name, r_key, {q_key: value}, allowed))
+
+    planets = question.get("planet")
+    if planets:
+        allowed = 0
+        for planet in planets:
+            allowed |= index.term("restaurant_planet", planet)
+        args = {"planet": planets}
+        if "planet_ids" in question:
+            # recipes with a planet id are compared by id, as in check_additional_filters
+            with_id = index.bits["present:restaurant_planet_id"]
+            by_id = 0
+            for planet_id in question["planet_ids"]:
+                by_id |= index.term("restaurant_planet_id", planet_id)
+            allowed = (by_id & with_id) | (allowed & ~with_id)
+            args["planet_ids"] = question["planet_ids"]
+        allowed |= index.bits["falsy:restaurant_planet"]
+        stages.append(_mask_stage("planet", "restaurant_planet", args, allowed))
+
+    groups = question.get("sirius_techniques_groups")
+    if question.get("sirius_flag") and groups:
+        truthy = index.bits["truthy:recipe_technique_groups"]
+        allowed = _intersect(
+            truthy, [index.term("recipe_technique_groups", group) for group in groups]
+        )
+        stages.append(
+            _mask_stage(
+                "sirius",
+                "recipe_technique_groups",
+                {"sirius_techniques_groups": groups},
+                (allowed | ~truthy) & index.all,
+            )
+        )
+
+    return stages
+
+
+def _licence_stage(index: "RecipeIndex", question: Dict) -> PlanStage:
+    name = question.get("licence_name")
+    level = question.get("licence_level")
+    condition = question.get("licence_condition")
+    args = {
+        "licence_name": name,
+        "licence_level": level,
+        "licence_condition": condition,
+    }
+
+    if not (name or (level and condition)):
+        # check_license_conditions only rejects the recipes without chef licences
+        return _mask_stage("licence", "chef_licences", args, index.bits["licensed"])
+
+    return PlanStage(
+        name="licence",
+        field="chef_licences",
+        args=args,
+        estimate=index.bits["licensed"].bit_count(),
+        cost=LICENCE_COST,
+        apply=lambda mask: mask & index.licences(name, level, condition, mask),
+    )
+
+
+def _mask_stage(name: str, field: str, args: Dict, allowed: int) -> PlanStage:
+    return PlanStage(
+        name=name,
+        field=field,
+        args=args,
+        estimate=allowed.bit_count(),
+        cost=BITSET_COST,
+        apply=lambda mask: mask & allowed,
+    )
+
+
+def _intersect(mask: int, bits: List[int]) -> int:
+    for b in bits:
+        if not mask:
+            break
+        mask &= b
+    return mask
@@ -1,30 +1,31 @@
 from pathlib import Path
 from typing import Dict, List
 
-import pandas as pd
+from .planets import get_planet_index
 
 
 def update_planet_keys(questions: List[Dict], distances_path: Path | str) -> List[Dict]:
     """
     Updates the planet keys in the question list based on the distance logic.
+    Questions with a `planet_distance` get every planet closer than that distance to any of their planets.
     Args:
         questions (list): List of questions.
         distances_path (str): Path to the CSV file containing distances.
     Returns:
         list: List of questions with updated planet keys.
     """
-    distances = pd.read_csv(distances_path)
-    distances.index = distances["/"]
-    distances = distances.drop(columns="/")
-    distances.columns = distances.columns.str.lower()
-    distances.index = distances.index.str.lower()
+    index = get_planet_index(distances_path)
 
     for question in questions:
         if question.get("planet_distance") and question.get("planet"):
-            planet_ok = question.get("planet")[0]
-            if planet_ok:
-                question["planet"] = distances[
-                    distances[f"{planet_ok.lower()}"] < question["planet_distance"]
-                ].index.tolist()
+            origins = [
+                index.planet_id(planet) for planet in question.get("planet") if planet
+            ]
+            origins = [origin for origin in origins if origin is not None]
+            if origins:
+                question["planet"] = [
+                    index.names[i]
+                    for i in index.within(origins, question["planet_distance"])
+                ]
 
     return questions
@@ -0,0 +1,180 @@
+import random
+import re
+import threading
+import time
+from typing import Dict
+
+from tenacity import RetryCallState, wait_random_exponential
+
+from src.config import Config
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously up to its capacity.
+
+    Args:
+        capacity (float): Maximum number of tokens in the bucket.
+        refill_per_second (float): Tokens added every second.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """Takes `amount` tokens, blocking until they are available.
+
+        Requests larger than the capacity are capped to it, so they wait for a full
+        bucket instead of forever.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self) -> None:
+        """Empties the bucket, e.g. after the provider reported the budget is used up."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = 0
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget of a provider.
+
+    Callers acquire one request and their estimated tokens before every call. When the
+    provider asks to back off, `pause` holds every caller until the deadline.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Blocks until one request with `tokens` tokens fits the budget.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        waited += self.requests.acquire(1)
+        waited += self.tokens.acquire(tokens)
+        return waited
+
+    def pause(self, seconds: float) -> None:
+        """Holds every caller for `seconds` and empties the buckets."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.requests.drain()
+        self.tokens.drain()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """Returns the shared rate limiter of a provider, built from Config.rate_limits."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = Config.rate_limits.get(provider, Config.rate_limits["default"])
+            _limiters[provider] = RateLimiter(
+                requests_per_minute=limits["rpm"], tokens_per_minute=limits["tpm"]
+            )
+    return _limiters[provider]
+
+
+def retry_after_seconds(exception: BaseException | None) -> float | None:
+    """Extracts the wait suggested by the provider from a failed request.
+
+    Looks for a `retry_after` attribute, a `retry-after` header on the HTTP response and
+    finally for the "try again in 1m2.5s" hint Groq puts in its error message, which is
+    all that survives aisuite wrapping provider errors in `LLMError`. Chained exceptions
+    are inspected as well.
+
+    Args:
+        exception (Exception): The exception raised by the request.
+
+    Returns:
+        float: Seconds to wait, or None if the provider gave no hint.
+    """
+    seen = set()
+    while exception is not None and id(exception) not in seen:
+        seen.add(id(exception))
+
+        retry_after = getattr(exception, "retry_after", None)
+        if retry_after is not None:
+            return float(retry_after)
+
+        headers = getattr(getattr(exception, "response", None), "headers", None) or {}
+        if headers.get("retry-after"):
+            try:
+                return float(headers["retry-after"])
+            except ValueError:
+                pass
+
+        match = re.search(r"try again in (?:(\d+)m)?(\d+(?:\.\d+)?)s", str(exception))
+        if match:
+            return int(match.group(1) or 0) * 60 + float(match.group(2))
+
+        exception = exception.__cause__ or exception.__context__
+
+    return None
+
+
+class wait_provider_backoff:
+    """Tenacity wait strategy honouring provider hints.
+
+    If the failed attempt carries a retry-after hint the provider's limiter is paused
+    for that long and the call waits the same time plus a small jitter. Otherwise it
+    falls back to jittered exponential backoff.
+    """
+
+    def __init__(self, provider: str | None = None):
+        self.provider = provider
+        self.exponential = wait_random_exponential(
+            multiplier=Config.backoff_multiplier, max=Config.backoff_max
+        )
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        exception = retry_state.outcome.exception() if retry_state.outcome else None
+        retry_after = retry_after_seconds(exception)
+        if retry_after is None:
+            return self.exponential(retry_state)
+
+        provider = self.provider or _provider_from_call(retry_state)
+        if provider:
+            get_rate_limiter(provider).pause(retry_after)
+        return retry_after + random.uniform(0, Config.backoff_multiplier)
+
+
+def _provider_from_call(retry_state: RetryCallState) -> str | None:
+    model = retry_state.kwargs.get("model")
+    if model is None and len(retry_state.args) > 2:
+        model = retry_state.args[2]
+    return model.partition(":")[0] if isinstance(model, str) else None
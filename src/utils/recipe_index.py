@@ -0,0 +1,309 @@
+import json
+from time import perf_counter
+from typing import Dict, Hashable, Iterable, Iterator, List, Tuple
+
+from .matching import (
+    CLAUSE_KEYS,
+    check_additional_filters,
+    check_and_conditions,
+    check_not_conditions,
+    check_or_conditions,
+    load_legal_limits,
+    within_legal_limits,
+)
+from .licence_index import LicenceIndex
+from .misc import is_hashable
+from .question_plan import QuestionPlan, compile_question
+from .recipe_store import RecipeRecord
+
+# recipe keys holding lists of terms
+LIST_KEYS = ["recipe_ingredients", "recipe_techniques", "recipe_technique_groups"]
+# recipe keys holding a single value
+SCALAR_KEYS = ["recipe_group", "recipe_restaurant", "restaurant_planet"]
+
+
+class RecipeIndex:
+    """Inverted index of the recipes, answering questions with bitset operations.
+
+    Every term of the list fields (ingredients, techniques, technique groups) and every
+    value of the scalar fields (group, restaurant, planet and planet id) maps to a bitset
+    of recipe positions, stored as a Python int. An "and" clause is an intersection, a "not" clause
+    a difference and an "or" clause with `or_length` k keeps the recipes where at least k
+    of the terms are set. Chef licences are grouped by distinct set of licences, i.e. by
+    restaurant, and looked up in a LicenceIndex.
+
+    Results are the same as running `check_and_conditions`, `check_or_conditions`,
+    `check_not_conditions` and `check_additional_filters` on every recipe. Recipes and
+    questions with unexpected shapes (e.g. a string where a list is expected, where the
+    checks do substring tests) are handed to those checks directly.
+
+    Args:
+        recipes (list): List of recipes.
+    """
+
+    def __init__(self, recipes: List[Dict]):
+        self.recipes = recipes
+        self.size = len(recipes)
+        self.all = (1 << self.size) - 1
+
+        positions = {
+            "irregular": [],
+            "licensed": [],
+            **{f"present:{key}": [] for key in LIST_KEYS},
+            **{f"truthy:{key}": [] for key in LIST_KEYS},
+            **{f"falsy:{key}": [] for key in SCALAR_KEYS},
+            "present:restaurant_planet_id": [],
+        }
+        terms = {key: {} for key in LIST_KEYS + SCALAR_KEYS + ["restaurant_planet_id"]}
+        licence_groups = {}
+
+        for i, recipe in enumerate(recipes):
+            if not self._is_regular_recipe(recipe):
+                positions["irregular"].append(i)
+                continue
+
+            for key in LIST_KEYS:
+                values = _distinct_terms(recipe, key)
+                if values is not None:
+                    positions[f"present:{key}"].append(i)
+                    if values:
+                        positions[f"truthy:{key}"].append(i)
+                    for term in values:
+                        terms[key].setdefault(term, []).append(i)
+
+            for key in SCALAR_KEYS:
+                value = recipe.get(key)
+                if value:
+                    terms[key].setdefault(value, []).append(i)
+                else:
+                    positions[f"falsy:{key}"].append(i)
+
+            # ids are compared whenever the recipe has one, 0 included
+            if "restaurant_planet_id" in recipe:
+                positions["present:restaurant_planet_id"].append(i)
+                planet_id = recipe["restaurant_planet_id"]
+                terms["restaurant_planet_id"].setdefault(planet_id, []).append(i)
+
+            licences = recipe.get("chef_licences", {})
+            if licences is not None:
+                positions["licensed"].append(i)
+            try:
+                licence_key = json.dumps(licences, sort_keys=True, default=str)
+            except TypeError:
+                licence_key = f"recipe:{i}"
+            licence_groups.setdefault(licence_key, (licences, []))[1].append(i)
+
+        self.bits = {name: to_bits(ids, self.size) for name, ids in positions.items()}
+        self.terms = {
+            key: {term: to_bits(ids, self.size) for term, ids in key_terms.items()}
+            for key, key_terms in terms.items()
+        }
+        self.licence_groups = [
+            (licences, to_bits(ids, self.size))
+            for licences, ids in licence_groups.values()
+        ]
+        self.licence_index = LicenceIndex(self.licence_groups)
+        self._legal = None
+
+    @staticmethod
+    def _is_regular_recipe(recipe: Dict) -> bool:
+        for key in LIST_KEYS:
+            # the term lists encoded by a RecipeStore are lists of strings
+            if isinstance(recipe, RecipeRecord) and recipe.term_ids(key) is not None:
+                continue
+            values = recipe.get(key)
+            if values is not None and not (
+                isinstance(values, list) and all(is_hashable(v) for v in values)
+            ):
+                return False
+        for key in SCALAR_KEYS + ["restaurant_planet_id"]:
+            if not is_hashable(recipe.get(key)):
+                return False
+        return isinstance(recipe.get("chef_licences", {}), (dict, type(None)))
+
+    @staticmethod
+    def is_regular_question(question: Dict) -> bool:
+        for q_key, _ in CLAUSE_KEYS:
+            clause = question.get(q_key)
+            if not clause:
+                continue
+            if not isinstance(clause, dict):
+                return False
+            for op in ["and", "or", "not"]:
+                terms = clause.get(op)
+                if terms and not (
+                    isinstance(terms, (list, tuple))
+                    and all(is_hashable(t) for t in terms)
+                ):
+                    return False
+            or_length = clause.get("or_length", 1)
+            if clause.get("or") and not (
+                or_length is None or isinstance(or_length, int)
+            ):
+                return False
+        for key in ["group", "restaurants"]:
+            if not is_hashable(question.get(key)):
+                return False
+        galactic_code = question.get("galactic_code")
+        if galactic_code and not isinstance(galactic_code, (list, tuple, str)):
+            return False
+        planet_ids = question.get("planet_ids", [])
+        if not (
+            isinstance(planet_ids, (list, tuple))
+            and all(is_hashable(i) for i in planet_ids)
+        ):
+            return False
+        for key in ["planet", "sirius_techniques_groups"]:
+            values = question.get(key)
+            if values and not (
+                isinstance(values, (list, tuple, str))
+                and all(is_hashable(v) for v in values)
+            ):
+                return False
+        return True
+
+    def term(self, key: str, term: Hashable) -> int:
+        """Bitset of the recipes holding a term (or value) in a field."""
+        return self.terms[key].get(term, 0)
+
+    def at_least(
+        self, key: str, terms: Iterable[Hashable], k: int, candidates: int = None
+    ) -> int:
+        """Bitset of the candidates holding at least `k` of the terms, duplicates included."""
+        candidates = self.all if candidates is None else candidates
+        if k <= 0:
+            return candidates
+        # counts[j] is the bitset of candidates holding at least j of the terms seen so far
+        counts = [candidates] + [0] * k
+        for term in terms:
+            bits = self.term(key, term)
+            for j in range(k, 0, -1):
+                counts[j] |= counts[j - 1] & bits
+        return counts[k]
+
+    def licences(self, name, level, condition, candidates: int) -> int:
+        """Bitset of the candidates whose chef holds the required licence."""
+        return self.licence_index.evaluate(name, level, condition, candidates)
+
+    def legal(self) -> int:
+        """Bitset of the recipes within the galactic code quantity limits."""
+        if self._legal is None:
+            # the CSV is only needed for recipes without a precomputed flag
+            limits = None
+            if any(r.get("within_legal_limits") is None for r in self.recipes):
+                limits = load_legal_limits()
+            self._legal = to_bits(
+                (
+                    i
+                    for i, recipe in enumerate(self.recipes)
+                    if within_legal_limits(recipe, limits)
+                ),
+                self.size,
+            )
+        return self._legal
+
+    def legal_estimate(self) -> int:
+        """Number of recipes within the quantity limits, or all of them until computed."""
+        return self.size if self._legal is None else self._legal.bit_count()
+
+    def compile(self, question: Dict) -> QuestionPlan:
+        """Compiles a question into a plan of filters ordered by selectivity."""
+        return compile_question(self, question)
+
+    def match_bits(self, question: Dict) -> int:
+        """Returns the bitset of the recipes matching a question."""
+        return self.compile(question).execute()
+
+    def match(self, question: Dict) -> List[int]:
+        """Returns the positions of the recipes matching a question, in corpus order."""
+        return list(iter_bits(self.match_bits(question)))
+
+    def scan_irregular(self, question: Dict) -> int:
+        """Runs the per-recipe checks on the recipes left out of the index."""
+        return self.scan(question, self.bits["irregular"])
+
+    def scan(self, question: Dict, candidates: int, profile: Dict = None) -> int:
+        """
+        Runs the original per-recipe checks on the candidates.
+        Args:
+            question (dict): The parsed question.
+            candidates (int): Bitset of the recipes to check.
+            profile (dict): If given, counts the recipes eliminated by each filter.
+        Returns:
+            int: Bitset of the candidates passing every check.
+        """
+        result = 0
+        for i in iter_bits(candidates):
+            recipe = self.recipes[i]
+            if profile is None:
+                passes = (
+                    check_and_conditions(question, recipe, CLAUSE_KEYS)
+                    and check_or_conditions(question, recipe, CLAUSE_KEYS)
+                    and check_not_conditions(question, recipe, CLAUSE_KEYS)
+                    and check_additional_filters(question, recipe)
+                )
+            else:
+                passes = _check_profiled(question, recipe, profile)
+            if passes:
+                result |= 1 << i
+        return result
+
+    def explain(self, question: Dict) -> Tuple[List[int], Dict]:
+        """
+        Matches a question, recording what every stage of its plan did.
+        Args:
+            question (dict): The parsed question.
+        Returns:
+            tuple: Positions of the matching recipes and the report, with the plan, the
+                candidates, eliminations and time of every stage and the total time.
+        """
+        start = perf_counter()
+        plan = self.compile(question)
+        compile_seconds = perf_counter() - start
+        stages = []
+        bits = plan.execute(profile=stages)
+        return list(iter_bits(bits)), {
+            "plan": plan.describe(),
+            "stages": stages,
+            "matches": bits.bit_count(),
+            "compile_seconds": compile_seconds,
+            "seconds": perf_counter() - start,
+        }
+
+
+def _check_profiled(question: Dict, recipe: Dict, profile: Dict) -> bool:
+    for stage, check in [
+        ("and", check_and_conditions),
+        ("or", check_or_conditions),
+        ("not", check_not_conditions),
+    ]:
+        if not check(question, recipe, CLAUSE_KEYS):
+            profile[stage] = profile.get(stage, 0) + 1
+            return False
+    return check_additional_filters(question, recipe, profile)
+
+
+def to_bits(positions: Iterable[int], size: int) -> int:
+    """Builds a bitset from recipe positions."""
+    bitmap = bytearray((size + 7) // 8)
+    for i in positions:
+        bitmap[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _distinct_terms(recipe: Dict, key: str) -> set | None:
+    # a RecipeRecord decodes each distinct id of the list once instead of the whole list
+    if isinstance(recipe, RecipeRecord):
+        ids = recipe.term_ids(key)
+        if ids is not None:
+            return {recipe.store.dictionary.terms[term_id] for term_id in set(ids)}
+    values = recipe.get(key)
+    return None if values is None else set(values)
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Yields the positions set in a bitset, in increasing order."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
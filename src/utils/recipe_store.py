@@ -0,0 +1,299 @@
+import hashlib
+import json
+from array import array
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .lookup_lists import Vocabulary
+from .misc import clean_data
+from .terms import TERM_KEYS, TermDictionary
+
+# restaurant fields shared by its recipes; the other fields, e.g. source_file, are the
+# recipe's own
+RESTAURANT_KEYS = [
+    "chef_licences",
+    "restaurant_planet",
+    "restaurant_planet_id",
+    "restricted_ingredients",
+]
+
+_MISSING = object()
+# a field read from the restaurant, kept in the recipe fields only to keep the key order
+_RESTAURANT = object()
+# a restaurant field removed from one recipe
+_DELETED = object()
+
+
+class RecipeRecord(MutableMapping):
+    """One recipe of a RecipeStore, read and written like the recipe dict.
+
+    Term lists of TERM_KEYS are held as id arrays of the store's TermDictionary and decoded
+    when read, so a list returned by `get` is a copy and changes are saved by assigning it
+    back. The RESTAURANT_KEYS fields of the recipe's restaurant are not copied: they are
+    read from the restaurant the record references, unless the record sets its own value.
+
+    Args:
+        store (RecipeStore): Store holding the term dictionary and the restaurants.
+        fields (dict): Fields of the recipe, term lists already encoded.
+        restaurant_id (int): Position of the restaurant in the store, None without one.
+    """
+
+    __slots__ = ("store", "fields", "restaurant_id")
+
+    def __init__(self, store: "RecipeStore", fields: Dict, restaurant_id: int = None):
+        self.store = store
+        self.fields = fields
+        self.restaurant_id = restaurant_id
+
+    def _restaurant(self) -> Dict:
+        if self.restaurant_id is None:
+            return {}
+        return self.store.restaurants[self.restaurant_id]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.fields.get(key, _MISSING)
+        if value is _RESTAURANT or (value is _MISSING and key in RESTAURANT_KEYS):
+            value = self._restaurant().get(key, _MISSING)
+        if value is _MISSING or value is _DELETED:
+            return default
+        if isinstance(value, array):
+            return self.store.dictionary.decode(value)
+        return value
+
+    def term_ids(self, key: str) -> array | None:
+        """Returns the id array of a term list, not decoded, None for other fields."""
+        value = self.fields.get(key)
+        return value if isinstance(value, array) else None
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self.fields[key] = self.store.encode(key, value)
+        self.store._version = None
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self.store._version = None
+        from_restaurant = self.fields.get(key, _RESTAURANT) is _RESTAURANT
+        if from_restaurant and key in RESTAURANT_KEYS:
+            self.fields[key] = _DELETED
+        else:
+            del self.fields[key]
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        for key, value in self.fields.items():
+            if value is not _DELETED:
+                yield key
+        for key in self._restaurant():
+            if key in RESTAURANT_KEYS and key not in self.fields:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        """Returns the recipe in the JSON shape, with the fields of its restaurant."""
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"RecipeRecord({self.to_dict()!r})"
+
+
+class RecipeStore:
+    """Recipes of the corpus with shared term ids and restaurants referenced by id.
+
+    The JSON shape of the pipeline is one dict per recipe holding the RESTAURANT_KEYS
+    fields of its restaurant, joined on `recipe_restaurant` == `restaurant_name`, with
+    repeated term strings. The store keeps each restaurant once and each term once, and exports the same
+    shape with `to_json` and `save`.
+
+    Args:
+        dictionary (TermDictionary): Term dictionary, a new one by default.
+    """
+
+    def __init__(self, dictionary: TermDictionary = None):
+        self.dictionary = TermDictionary() if dictionary is None else dictionary
+        self.records: List[RecipeRecord] = []
+        self.restaurants: List[Dict] = []
+        self.restaurant_ids: Dict[str, int] = {}
+        self._version = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[RecipeRecord]:
+        return iter(self.records)
+
+    def __getitem__(self, i: int) -> RecipeRecord:
+        return self.records[i]
+
+    @classmethod
+    def from_json(
+        cls, recipes: Iterable[Dict], restaurants: Iterable[Dict] = ()
+    ) -> "RecipeStore":
+        """
+        Builds a store from recipes and restaurants in the JSON shape.
+        Args:
+            recipes (iterable): Recipes, with or without the fields of their restaurant.
+            restaurants (iterable): Restaurants, joined to the recipes on their name.
+        Returns:
+            RecipeStore: The store.
+        """
+        store = cls()
+        for restaurant in restaurants:
+            store.add_restaurant(restaurant)
+        for recipe in recipes:
+            store.add(recipe)
+        return store
+
+    @classmethod
+    def load(
+        cls, recipes_path: Path | str, restaurants_path: Path | str = None
+    ) -> "RecipeStore":
+        """Loads a store from the recipes JSON file and optionally the restaurants one."""
+        with Path(recipes_path).open("r") as f:
+            recipes = json.load(f)
+        restaurants = []
+        if restaurants_path is not None:
+            with Path(restaurants_path).open("r") as f:
+                restaurants = json.load(f)
+        return cls.from_json(recipes, restaurants)
+
+    def add_restaurant(self, restaurant: Dict) -> int:
+        """Adds a restaurant, the last one added wins for a name; returns its id."""
+        restaurant_id = len(self.restaurants)
+        self.restaurants.append(restaurant)
+        self._version = None
+        if restaurant.get("restaurant_name"):
+            self.restaurant_ids[restaurant["restaurant_name"]] = restaurant_id
+        return restaurant_id
+
+    def add(self, recipe: Dict) -> RecipeRecord:
+        """
+        Adds a recipe, dropping the values of the RESTAURANT_KEYS fields its restaurant
+        provides.
+        Args:
+            recipe (dict): Recipe in the JSON shape.
+        Returns:
+            RecipeRecord: The record of the recipe.
+        """
+        restaurant_id = self.restaurant_ids.get(recipe.get("recipe_restaurant"))
+        restaurant = {} if restaurant_id is None else self.restaurants[restaurant_id]
+        fields = {
+            key: self.encode(key, value)
+            if key not in RESTAURANT_KEYS or key not in restaurant
+            else _RESTAURANT
+            for key, value in recipe.items()
+        }
+        record = RecipeRecord(self, fields, restaurant_id)
+        self.records.append(record)
+        self._version = None
+        return record
+
+    def encode(self, key: str, value: Any) -> Any:
+        """
+        Encodes the term lists of TERM_KEYS as id arrays, other values are kept as is.
+        The ids keep the order and repetitions of the list, unlike the default of
+        `TermDictionary.encode`, so that the records give back the recipes unchanged.
+        Args:
+            key (str): Recipe field.
+            value (Any): Value of the field.
+        Returns:
+            Any: The stored value.
+        """
+        if (
+            key in TERM_KEYS
+            and isinstance(value, list)
+            and all(isinstance(term, str) for term in value)
+        ):
+            return self.dictionary.encode(value, keep_order=True)
+        return value
+
+    def clean(self, key: str, vocabulary: Vocabulary) -> "RecipeStore":
+        """
+        Snaps a field of every recipe to a vocabulary, as `clean_data` does, in place.
+        The distinct terms of the term lists are snapped together with
+        `Vocabulary.snap_many` and the lists remapped by id; other values go through a
+        single `clean_data` call. Fields read from the restaurants are not changed, the
+        restaurants are cleaned on their own.
+        Args:
+            key (str): Recipe field to clean.
+            vocabulary (Vocabulary): Vocabulary to snap to.
+        Returns:
+            RecipeStore: The store.
+        """
+        self._version = None
+        term_lists, others = [], []
+        for record in self.records:
+            value = record.fields.get(key, _MISSING)
+            if value is _MISSING or value is _DELETED or value is _RESTAURANT:
+                continue
+            (term_lists if isinstance(value, array) else others).append(record)
+
+        term_ids = list(
+            dict.fromkeys(term_id for r in term_lists for term_id in r.fields[key])
+        )
+        snapped = vocabulary.snap_many(self.dictionary.decode(term_ids))
+        remap = dict(zip(term_ids, map(self.dictionary.add, snapped)))
+        for record in term_lists:
+            record.fields[key] = array("I", map(remap.__getitem__, record.fields[key]))
+
+        cleaned = clean_data([{key: r.fields[key]} for r in others], key, vocabulary)
+        for record, item in zip(others, cleaned):
+            record.fields[key] = item[key]
+        return self
+
+    def version(self) -> str:
+        """
+        Hash of the terms, restaurants and encoded records of the store.
+        It is kept until a record or the store changes; restaurants are not expected to be
+        changed once added.
+        Returns:
+            str: The hash.
+        """
+        if self._version is None:
+            digest = hashlib.sha256()
+            digest.update(_dump([self.dictionary.terms, self.restaurants]))
+            for record in self.records:
+                fields = {
+                    key: _encoded_value(value) for key, value in record.fields.items()
+                }
+                digest.update(_dump([record.restaurant_id, fields]))
+            self._version = digest.hexdigest()
+        return self._version
+
+    def to_json(self) -> Iterator[Dict]:
+        """Yields the recipes in the JSON shape, one dict at a time."""
+        return (record.to_dict() for record in self.records)
+
+    def save(self, output_path: Path | str):
+        """Writes the recipes to a JSON file, formatted like `json.dump(..., indent=4)`."""
+        with Path(output_path).open("w") as f:
+            f.write("[")
+            for i, recipe in enumerate(self.to_json()):
+                f.write(",\n    " if i else "\n    ")
+                f.write(json.dumps(recipe, indent=4).replace("\n", "\n    "))
+            f.write("\n]" if self.records else "]")
+
+
+def _encoded_value(value: Any) -> Any:
+    if isinstance(value, array):
+        return {"ids": value.tolist()}
+    if value is _RESTAURANT:
+        return {"from": "restaurant"}
+    if value is _DELETED:
+        return {"from": "deleted"}
+    return value
+
+
+def _dump(value: Any) -> bytes:
+    return (json.dumps(value, sort_keys=True, default=str) + "\n").encode("utf-8")
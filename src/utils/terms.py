@@ -0,0 +1,168 @@
+from array import array
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from .lookup_lists import Vocabulary
+from .matching import CLAUSE_KEYS
+from .misc import is_hashable
+
+# recipe keys holding lists of terms
+TERM_KEYS = ["recipe_ingredients", "recipe_techniques", "recipe_technique_groups"]
+
+
+class TermDictionary:
+    """Corpus-wide dictionary of the recipe terms, giving every distinct term an integer id.
+
+    Ids are given in order of first appearance. A list of terms is encoded as the sorted
+    `array("I")` of its distinct ids, so that recipes repeat 4-byte ids instead of the term
+    strings. With `keep_order` the ids follow the order and repetitions of the list
+    instead, so that `decode` gives the list back; RecipeStore stores its recipes this
+    way. Matching keys its bitsets by term, not by id.
+
+    Args:
+        terms (iterable): Initial terms.
+    """
+
+    def __init__(self, terms: Iterable[Hashable] = ()):
+        self.terms: List[Hashable] = []
+        self.ids: Dict[Hashable, int] = {}
+        for term in terms:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: Hashable) -> bool:
+        return term in self.ids
+
+    @classmethod
+    def from_recipes(
+        cls, recipes: Iterable[Dict], keys: List[str] = TERM_KEYS
+    ) -> "TermDictionary":
+        """Builds the dictionary of the terms of the recipes, skipping values that are not lists."""
+        dictionary = cls()
+        for recipe in recipes:
+            for key in keys:
+                values = recipe.get(key)
+                if isinstance(values, list):
+                    for term in values:
+                        dictionary.add(term)
+        return dictionary
+
+    def add(self, term: Hashable) -> int:
+        """Returns the id of a term, adding it if it is new."""
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = self.ids[term] = len(self.terms)
+            self.terms.append(term)
+        return term_id
+
+    def encode(self, values: Iterable[Hashable], keep_order: bool = False) -> array:
+        """
+        Encodes a list of terms as an id array, adding new terms.
+        Args:
+            values (iterable): Terms.
+            keep_order (bool): Keep the order and repetitions of the terms, rather
+                than the sorted distinct ids.
+        Returns:
+            array: The ids.
+        """
+        if keep_order:
+            return array("I", map(self.add, values))
+        return array("I", sorted({self.add(value) for value in values}))
+
+    def decode(self, ids: Iterable[int]) -> List[Hashable]:
+        """Returns the terms of a list of ids."""
+        return [self.terms[term_id] for term_id in ids]
+
+
+def term_dictionaries(
+    recipes: Iterable[Dict], keys: List[str] = TERM_KEYS
+) -> Dict[str, TermDictionary]:
+    """
+    Builds one dictionary per recipe key, so that an ingredient and a technique never
+    share an id nor match each other.
+    Args:
+        recipes (iterable): Recipes.
+        keys (list): Recipe keys holding lists of terms.
+    Returns:
+        dict: The term dictionary of each key.
+    """
+    recipes = list(recipes)
+    return {key: TermDictionary.from_recipes(recipes, [key]) for key in keys}
+
+
+def find_unknown_terms(
+    questions: List[Dict], dictionaries: Dict[str, TermDictionary]
+) -> Dict[Tuple[str, Hashable], List[int]]:
+    """
+    Finds the clause terms of the questions that no recipe holds in the clause's field.
+    An unknown "and" term means the question matches nothing, which usually comes from a
+    spelling of the extraction rather than from the question.
+    Args:
+        questions (list): List of parsed questions.
+        dictionaries (dict): Dictionary of the terms of each recipe key.
+    Returns:
+        dict: Positions of the questions using each unknown (clause key, term).
+    """
+    unknown = {}
+    for i, question in enumerate(questions):
+        for q_key, r_key, term in _clause_terms(question):
+            if term not in dictionaries.get(r_key, ()):
+                positions = unknown.setdefault((q_key, term), [])
+                if not positions or positions[-1] != i:
+                    positions.append(i)
+    return unknown
+
+
+def snap_question_terms(
+    questions: List[Dict],
+    dictionaries: Dict[str, TermDictionary],
+    method: str = "difflib",
+    cutoff: float = 0.8,
+) -> List[Dict]:
+    """
+    Replaces the unknown clause terms of the questions with the closest term of the
+    recipe field the clause is matched against. Terms without one above the cutoff are
+    kept as they are.
+    Args:
+        questions (list): List of parsed questions, updated in place.
+        dictionaries (dict): Dictionary of the terms of each recipe key.
+        method (str): Fuzzy matching method of the Vocabulary, "difflib" or "trigram".
+        cutoff (float): Minimum similarity ratio of a replacement, in [0, 1].
+    Returns:
+        list: The questions.
+    """
+    vocabularies = {}
+
+    def snap(r_key, term):
+        dictionary = dictionaries.get(r_key)
+        if dictionary is None or term in dictionary or not isinstance(term, str):
+            return term
+        if r_key not in vocabularies:
+            terms = [term for term in dictionary.terms if isinstance(term, str)]
+            vocabularies[r_key] = Vocabulary(terms, method=method, cutoff=cutoff)
+        closest = vocabularies[r_key].closest(term)
+        return term if closest is None or closest not in dictionary else closest
+
+    for question in questions:
+        for q_key, r_key in CLAUSE_KEYS:
+            clause = question.get(q_key)
+            if not isinstance(clause, dict):
+                continue
+            for op in ["and", "or", "not"]:
+                if isinstance(clause.get(op), list):
+                    clause[op] = [snap(r_key, term) for term in clause[op]]
+    return questions
+
+
+def _clause_terms(question: Dict) -> Iterable[Tuple[str, str, Hashable]]:
+    for q_key, r_key in CLAUSE_KEYS:
+        clause = question.get(q_key)
+        if not isinstance(clause, dict):
+            continue
+        for op in ["and", "or", "not"]:
+            terms = clause.get(op)
+            if isinstance(terms, (list, tuple)):
+                for term in terms:
+                    if is_hashable(term):
+                        yield q_key, r_key, term
@@ -0,0 +1,8 @@
+import re
+
+
+def normalise_string(s: str) -> str:
+    s = s.lower()
+    s = re.sub(r"\W+", " ", s)
+    s = re.sub(r"\s+", "_", s)
+    return s
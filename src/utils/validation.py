@@ -0,0 +1,200 @@
+import copy
+import typing
+from difflib import get_close_matches
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing_extensions import is_typeddict
+
+from src.config import Config
+
+
+def validate_response(
+    response: Dict, model: type[BaseModel]
+) -> Tuple[Dict, Dict[str, str]]:
+    """Validates an LLM answer against a pydantic model, coercing what can be coerced.
+
+    Fields are validated one by one, so a single bad field does not discard the others.
+    Nulls are accepted everywhere and extra keys are kept untouched. Out-of-vocabulary
+    literals are snapped to the closest allowed value, numbers given as strings (and the
+    other way around) are converted and scalars are wrapped in a list where a list is
+    expected.
+
+    Args:
+        response (dict): Parsed answer of the model.
+        model (BaseModel): The pydantic output model.
+
+    Returns:
+        tuple: The coerced answer and the fields that are still invalid, with their error.
+    """
+    response = copy.deepcopy(response)
+    invalid = {}
+
+    for name, value in response.items():
+        if name not in model.model_fields or value is None:
+            continue
+
+        # errors are located relative to the field, the holder makes the field itself
+        # addressable so scalar values can be replaced too
+        holder = {name: value}
+        errors = []
+        for _ in range(Config.coercion_rounds):
+            holder[name], errors = _validate_field(model, name, holder[name])
+            if not errors or not any(
+                [_coerce(holder, model, name, error) for error in errors]
+            ):
+                break
+
+        if errors:
+            invalid[name] = errors[0]["msg"]
+        response[name] = holder[name]
+
+    return response, invalid
+
+
+def _validate_field(model: type[BaseModel], name: str, value: Any) -> Tuple[Any, List]:
+    """Returns the validated value (nested nulls kept) and the validation errors."""
+    try:
+        validated = _adapter(model, name).validate_python(_drop_nulls(value))
+    except ValidationError as e:
+        return value, e.errors()
+    return _restore_nulls(value, validated), []
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: type[BaseModel], name: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[name].annotation)
+
+
+def _drop_nulls(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    return value
+
+
+def _restore_nulls(original: Any, validated: Any) -> Any:
+    if isinstance(original, dict) and isinstance(validated, dict):
+        nulls = {k: None for k, v in original.items() if v is None}
+        return {
+            **nulls,
+            **{k: _restore_nulls(original.get(k), v) for k, v in validated.items()},
+        }
+    return validated
+
+
+def _coerce(holder: Dict, model: type[BaseModel], name: str, error: Dict) -> bool:
+    """Fixes the value pointed by one validation error in place, returns whether it did."""
+    annotation, path, is_key = _resolve(
+        model.model_fields[name].annotation, (name, *error["loc"])
+    )
+    if annotation is None:
+        return False
+    container = _container_at(holder, path[:-1])
+    if container is None:
+        return False
+    # an unknown key of a TypedDict is reported with its value as input
+    wrong = path[-1] if error["type"] == "extra_forbidden" else error["input"]
+
+    if is_key:
+        new_key = _snap_literal(wrong, annotation)
+        if new_key is None or new_key in container:
+            return False
+        container[new_key] = container.pop(wrong)
+        return True
+
+    if error["type"] == "literal_error":
+        new_value = _snap_literal(wrong, annotation)
+    elif error["type"] == "string_type" and isinstance(wrong, (int, float)):
+        new_value = str(wrong)
+    elif error["type"] in ("int_type", "int_parsing") and str(wrong).strip().isdigit():
+        new_value = int(str(wrong).strip())
+    elif error["type"] == "list_type" and isinstance(wrong, (str, int, float)):
+        new_value = [wrong]
+    else:
+        new_value = None
+
+    if new_value is None:
+        return False
+    container[path[-1]] = new_value
+    return True
+
+
+def _snap_literal(value: Any, annotation: Any) -> Any:
+    if typing.get_origin(annotation) is not typing.Literal:
+        return None
+    choices = {str(choice).lower(): choice for choice in typing.get_args(annotation)}
+    matches = get_close_matches(
+        str(value).lower(), list(choices), n=1, cutoff=Config.coercion_cutoff
+    )
+    return choices[matches[0]] if matches else None
+
+
+def _resolve(annotation: Any, loc: Tuple) -> Tuple[Any, List, bool]:
+    """Follows a validation error location through a field annotation.
+
+    Returns:
+        tuple: The annotation at the location (None if it can't be followed), the path of
+        the value inside the field, and whether the error is about a dictionary key.
+    """
+    path = [loc[0]]
+    parts = list(loc[1:])
+    annotation = _unwrap(annotation)
+    while parts:
+        part = parts.pop(0)
+        origin = typing.get_origin(annotation)
+        args = typing.get_args(annotation)
+        if origin is typing.Union:
+            member = next((arg for arg in args if _union_tag(arg) == part), None)
+            if member is None:
+                return None, path, False
+            annotation = _unwrap(member)
+        elif origin is list and isinstance(part, int):
+            path.append(part)
+            annotation = _unwrap(args[0])
+        elif origin is dict:
+            path.append(part)
+            if parts and parts[0] == "[key]":
+                return _unwrap(args[0]), path, True
+            annotation = _unwrap(args[1])
+        elif is_typeddict(annotation):
+            hints = typing.get_type_hints(annotation)
+            path.append(part)
+            if part not in hints:
+                return typing.Literal[tuple(hints)], path, True
+            annotation = _unwrap(hints[part])
+        else:
+            return None, path, False
+    return annotation, path, False
+
+
+def _union_tag(annotation: Any) -> str:
+    """Name pydantic gives to a union member in error locations, e.g. `list[str]`."""
+    origin = typing.get_origin(annotation)
+    if origin is None:
+        return getattr(annotation, "__name__", str(annotation))
+    args = ",".join(_union_tag(arg) for arg in typing.get_args(annotation))
+    return f"{origin.__name__}[{args}]"
+
+
+def _unwrap(annotation: Any) -> Any:
+    """Strips `Annotated` and `Optional`, which pydantic leaves out of error locations."""
+    while True:
+        origin = typing.get_origin(annotation)
+        args = typing.get_args(annotation)
+        if origin is typing.Annotated:
+            annotation = args[0]
+        elif origin is typing.Union and len(args) == 2 and type(None) in args:
+            annotation = next(arg for arg in args if arg is not type(None))
+        else:
+            return annotation
+
+
+def _container_at(fields: Dict, path: List) -> Any:
+    container = fields
+    for part in path:
+        try:
+            container = container[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return container if isinstance(container, (dict, list)) else None
@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from src.config import Config
+
+
+@pytest.fixture
+def legal_limits(monkeypatch):
+    """Galactic code limits of the matching tests, instead of the CSV."""
+
+    def mock_read_csv(filepath):
+        return pd.DataFrame({"substance": ["Erba Pipa"], "volume_limit_perc": [10]})
+
+    monkeypatch.setattr(pd, "read_csv", mock_read_csv)
+
+
+@pytest.fixture(autouse=True)
+def planet_index_cache(tmp_path, monkeypatch):
+    """Keeps the planet distance caches written by the tests out of the data directory."""
+    monkeypatch.setattr(Config, "planet_index_cache_path", tmp_path / "planets.npz")
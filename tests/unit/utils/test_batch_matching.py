@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.utils.batch_matching import BatchMatcher, array_to_bits, bits_to_array
+from src.utils.recipe_index import RecipeIndex
+
+from .test_recipe_index import brute_force, random_question, random_recipe
+
+pytestmark = pytest.mark.usefixtures("legal_limits")
+
+
+def test_bits_array_roundtrip():
+    array = np.array([True, False, False, True] + [False] * 60 + [True])
+    assert bits_to_array(array_to_bits(array), len(array)).tolist() == array.tolist()
+    assert array_to_bits(np.zeros(0, dtype=bool)) == 0
+
+
+def test_batch_matcher_matches_checks():
+    rng = random.Random(1)
+    recipes = [random_recipe(rng, i) for i in range(200)]
+    questions = [random_question(rng) for _ in range(300)]
+    questions.append({"ingredients": {"not": "tomato"}})
+
+    matcher = BatchMatcher(RecipeIndex(recipes), chunk_size=64)
+
+    assert matcher.match(questions) == [brute_force(recipes, q) for q in questions]
+
+
+def test_batch_matcher_or_length():
+    recipes = [
+        {"recipe_ingredients": ["a", "b"], "recipe_restaurant": "r1"},
+        {"recipe_ingredients": ["a"], "recipe_restaurant": "r2"},
+        {"recipe_ingredients": None},
+    ]
+    matcher = BatchMatcher(RecipeIndex(recipes))
+
+    assert matcher.match(
+        [
+            {"ingredients": {"or": ["a", "b", "c"], "or_length": 2}},
+            {"ingredients": {"or": ["a", "a"], "or_length": 2}},
+            {"ingredients": {"or": ["c"], "or_length": None}},
+            {"restaurants": "r2"},
+            {"ingredients": {"and": ["a", "unknown"]}},
+        ]
+    ) == [[0], [0, 1], [0, 1], [1, 2], []]
+
+
+def test_batch_matcher_compares_planet_ids():
+    recipes = [
+        {"recipe_name": "a", "restaurant_planet": "Pandora", "restaurant_planet_id": 0},
+        {"recipe_name": "b", "restaurant_planet": "pandora"},
+        {"recipe_name": "c", "restaurant_planet": "ego", "restaurant_planet_id": 1},
+        {"recipe_name": "d", "restaurant_planet": None},
+    ]
+    questions = [
+        {"planet": ["pandora"], "planet_ids": [0]},
+        {"planet": ["pandora"]},
+        {"planet": ["ego"], "planet_ids": []},
+    ]
+    matcher = BatchMatcher(RecipeIndex(recipes))
+
+    assert matcher.match(questions) == [brute_force(recipes, q) for q in questions]
+    assert matcher.match(questions)[0] == [0, 1, 3]
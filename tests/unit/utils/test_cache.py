@@ -0,0 +1,45 @@
+import time
+
+from src.utils.cache import LLMCache
+
+
+def test_cache_get_set(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite")
+    key = LLMCache.make_key("groq", "model", "system", "message", True)
+
+    assert cache.get(key) is None
+    cache.set(key, '{"a": 1}')
+    assert cache.get(key) == '{"a": 1}'
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_cache_key_depends_on_messages():
+    key = LLMCache.make_key("groq", "model", "system", "message", True)
+    assert key == LLMCache.make_key("groq", "model", "system", "message", True)
+    assert key != LLMCache.make_key("groq", "model", "system", "other", True)
+    assert key != LLMCache.make_key("openai", "model", "system", "message", True)
+
+
+def test_cache_is_shared_between_instances(tmp_path):
+    LLMCache(tmp_path / "cache.sqlite").set("key", "value")
+    assert LLMCache(tmp_path / "cache.sqlite").get("key") == "value"
+
+
+def test_cache_eviction_by_size(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_entries=2)
+    for i in range(4):
+        cache.set(f"key{i}", "value")
+        time.sleep(0.01)
+    cache.evict()
+
+    assert len(cache) == 2
+    assert cache.get("key0") is None
+    assert cache.get("key3") == "value"
+
+
+def test_cache_eviction_by_age(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite", max_age_seconds=0.05)
+    cache.set("key", "value")
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.config import Config
+from src.utils import clients
+from src.utils.clients import close_clients, get_client, resolve_provider_config
+
+
+class MockClient:
+    instances = 0
+
+    def __init__(self, provider_configs):
+        MockClient.instances += 1
+        self.provider_configs = provider_configs
+
+    def _initialize_providers(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def mock_client(monkeypatch):
+    MockClient.instances = 0
+    monkeypatch.setattr(clients.ai, "Client", MockClient)
+    monkeypatch.setattr(
+        Config,
+        "provider_configs",
+        {"groq": {"api_key_env": "TEST_GROQ_API_KEY", "timeout": 10}},
+    )
+    monkeypatch.setenv("TEST_GROQ_API_KEY", "secret")
+    close_clients()
+    yield
+    close_clients()
+
+
+def test_resolve_provider_config():
+    assert resolve_provider_config("groq") == {"api_key": "secret", "timeout": 10}
+    assert resolve_provider_config("unknown") == {}
+
+
+def test_get_client_is_reused_across_threads():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        result = list(executor.map(lambda _: get_client("groq"), range(32)))
+
+    assert MockClient.instances == 1
+    assert all(client is result[0] for client in result)
+    assert result[0].provider_configs == {
+        "groq": {"api_key": "secret", "timeout": 10}
+    }
+
+
+def test_get_client_changes_with_config(monkeypatch):
+    first = get_client("groq")
+    monkeypatch.setenv("TEST_GROQ_API_KEY", "other")
+
+    assert get_client("groq") is not first
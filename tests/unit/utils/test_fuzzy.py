@@ -0,0 +1,68 @@
+from difflib import get_close_matches
+
+from src.utils.fuzzy import TrigramIndex, trigrams
+from src.utils.lookup_lists import Vocabulary, technique_groups_names, technique_names
+from src.utils.misc import extract_technique_groups
+
+
+def test_trigrams_pad_word_edges():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+    assert trigrams("") == {"   "}
+
+
+def test_trigram_index_agrees_with_difflib_on_typos():
+    index = TrigramIndex(technique_names)
+    values = [
+        "marinatura psionca",
+        "affumicatura temporale risonante",
+        "cottura sottovuoto antimateia",
+        "grigliatura tachionica refratraria",
+        "saltare padella big bang",
+    ]
+    for value in values:
+        expected = get_close_matches(value, technique_names, n=1, cutoff=0)[0]
+        assert index.best(value) == expected, value
+
+
+def test_trigram_index_cutoff():
+    index = TrigramIndex(["marinatura", "bollitura"])
+
+    assert index.best("marinatur") == "marinatura"
+    assert index.best("zzz") is not None
+    assert index.best("zzz", cutoff=0.6) is None
+    assert TrigramIndex([]).best("marinatura") is None
+
+
+def test_trigram_index_best_many():
+    index = TrigramIndex(["marinatura", "bollitura"])
+
+    values = ["bolitura", "marinatra", "bolitura", "xyz"]
+    assert index.best_many(values, cutoff=0.6) == [
+        "bollitura",
+        "marinatura",
+        "bollitura",
+        None,
+    ]
+
+
+def test_vocabulary_trigram_method():
+    vocabulary = Vocabulary(technique_groups_names, method="trigram", cutoff=0.6)
+
+    assert vocabulary.snap("Tecniche di Taglio") == "tecniche_di_taglio"
+    assert vocabulary.snap("bolitura") == "bollitura"
+    assert vocabulary.closest("qualcosa di diverso") is None
+    assert vocabulary.snap("qualcosa di diverso") == "qualcosa_di_diverso"
+    assert vocabulary.snap_many(["grigliatura", "cottura sottovuto"]) == [
+        "grigliatura",
+        "cottura_sottovuoto",
+    ]
+
+
+def test_extract_technique_groups_with_cutoff():
+    vocabulary = Vocabulary(technique_groups_names, cutoff=0.6)
+
+    assert extract_technique_groups(["Bollitura", "zzz"], vocabulary=vocabulary) == [
+        "bollitura",
+        "not matched",
+    ]
+    assert extract_technique_groups(None) == []
@@ -0,0 +1,36 @@
+from src.utils.ingestion import diff_manifest, hash_md_files, ingest_md_to_json
+
+MENU = """## Ristorante "Anima Cosmica"
+## Chef Mario
+Descrizione del ristorante.
+## Menu
+## Pizza Cosmica
+Ingredienti: Polvere di Stelle.
+"""
+
+
+def test_ingest_md_to_json_tags_source_file(tmp_path):
+    (tmp_path / "a.md").write_text(MENU)
+    (tmp_path / "b.md").write_text(MENU)
+
+    result = ingest_md_to_json(tmp_path, files=["b.md"])
+    assert [r["source_file"] for r in result["recipes"]] == ["b.md"]
+    assert [r["source_file"] for r in result["restaurants"]] == ["b.md"]
+    assert result["recipes"][0]["recipe_name"] == "Pizza Cosmica"
+
+    result = ingest_md_to_json(tmp_path)
+    assert sorted(r["source_file"] for r in result["recipes"]) == ["a.md", "b.md"]
+
+
+def test_diff_manifest(tmp_path):
+    (tmp_path / "a.md").write_text(MENU)
+    (tmp_path / "b.md").write_text(MENU)
+    manifest = hash_md_files(tmp_path)
+
+    (tmp_path / "b.md").write_text(MENU + "## Nuovo Piatto\n")
+    (tmp_path / "c.md").write_text(MENU)
+    (tmp_path / "a.md").unlink()
+
+    changed, deleted = diff_manifest(manifest, hash_md_files(tmp_path))
+    assert changed == ["b.md", "c.md"]
+    assert deleted == ["a.md"]
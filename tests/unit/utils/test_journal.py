@@ -0,0 +1,35 @@
+from src.utils.journal import ExtractionJournal
+
+
+def test_journal_roundtrip(tmp_path):
+    journal = ExtractionJournal.for_output(tmp_path / "recipes.json")
+    assert journal.journal_path == tmp_path / "recipes.journal.jsonl"
+    assert journal.dead_letter_path == tmp_path / "recipes.dead_letters.jsonl"
+
+    key = journal.item_key("text")
+    journal.record(key, {"a": 1})
+    journal.record_failure(journal.item_key("other"), {"text": "other"}, ValueError())
+
+    journal = ExtractionJournal.for_output(tmp_path / "recipes.json")
+    assert journal.get(key) == {"a": 1}
+    assert journal.get(journal.item_key("other")) is None
+    assert journal.has_dead_letters()
+
+
+def test_journal_ignores_truncated_lines(tmp_path):
+    journal = ExtractionJournal(tmp_path / "journal.jsonl", tmp_path / "dead.jsonl")
+    journal.record("key", {"a": 1})
+    with (tmp_path / "journal.jsonl").open("a") as f:
+        f.write('{"key": "other", "resp')
+
+    journal = ExtractionJournal(tmp_path / "journal.jsonl", tmp_path / "dead.jsonl")
+    assert journal.completed == {"key": {"a": 1}}
+
+
+def test_journal_compacts_recovered_dead_letters(tmp_path):
+    journal = ExtractionJournal(tmp_path / "journal.jsonl", tmp_path / "dead.jsonl")
+    journal.record_failure("key", {"text": "text"}, ValueError())
+    journal.record("key", {"a": 1})
+    journal.compact_dead_letters()
+
+    assert not (tmp_path / "dead.jsonl").exists()
@@ -0,0 +1,65 @@
+import random
+
+from src.utils.licence_index import LevelColumn, LicenceIndex
+from src.utils.matching import check_license_conditions
+
+NAMES = ["licenza psionica (P)", "licenza quantica (Q)", "licenza luce (C)"]
+LEVELS = ["I", "II", "III", "VI+", "0", "", 0, 1, 3, None]
+
+
+def expected(groups, name, level, condition):
+    result = 0
+    for licences, bits in groups:
+        try:
+            if check_license_conditions(name, level, condition, licences):
+                result |= bits
+        except TypeError:
+            return "error"
+    return result
+
+
+def evaluate(index, name, level, condition):
+    try:
+        return index.evaluate(name, level, condition, (1 << len(index.groups)) - 1)
+    except TypeError:
+        return "error"
+
+
+def test_level_column():
+    column = LevelColumn([(3, 0b001), (1, 0b010), (3, 0b100)])
+    assert column.at_least(2) == 0b101
+    assert column.at_least(0) == 0b111
+    assert column.equal(3) == 0b101
+    assert column.equal(2) == 0
+
+
+def test_licence_index_matches_check_license_conditions():
+    rng = random.Random(0)
+    groups = [({}, 1), (None, 2)]
+    for i in range(2, 40):
+        licences = {
+            name: rng.choice(LEVELS)
+            for name in rng.sample(NAMES, rng.randint(1, len(NAMES)))
+        }
+        groups.append((licences, 1 << i))
+    index = LicenceIndex(groups)
+
+    for name in [None, *NAMES, "licenza temporale (t)"]:
+        for level in [None, "I", "II", "III", "VI", 2, 0]:
+            for condition in [None, "higher", "equal", "lower"]:
+                assert evaluate(index, name, level, condition) == expected(
+                    groups, name, level, condition
+                ), (name, level, condition)
+
+
+def test_licence_index_candidates():
+    groups = [
+        ({"licenza psionica (P)": "II"}, 0b01),
+        ({"licenza psionica (P)": 3}, 0b10),
+    ]
+    index = LicenceIndex(groups)
+
+    assert index.evaluate("licenza psionica (P)", "II", "higher", 0b11) == 0b11
+    assert index.evaluate("licenza psionica (P)", "III", "equal", 0b11) == 0b10
+    assert index.evaluate("licenza psionica (P)", "III", "equal", 0b01) == 0
+    assert index.evaluate(None, "III", "higher", 0b11) == 0b10
@@ -0,0 +1,262 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from tenacity import RetryError
+
+from src.utils import llm
+from src.config import Config
+from src.datamodels import RecipeModel
+from src.utils.journal import ExtractionJournal
+from src.utils.llm import make_batches, process_data
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(Config, "use_cache", False)
+
+
+def test_process_data_keeps_order(monkeypatch):
+    def mock_call_llm(message, sys_message, model, json_output):
+        request = message.split("|")[1]
+        # later items answer first
+        time.sleep(0.01 * (5 - int(request)))
+        return json.dumps({"parsed": int(request)})
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+
+    data = [{"text": str(i)} for i in range(5)]
+    result = process_data(
+        data=data,
+        key="text",
+        system_message_template="{output_model_str}",
+        message_template="|{request}|",
+        output_model_str="model",
+        max_concurrency=4,
+    )
+    assert [item["parsed"] for item in result] == [0, 1, 2, 3, 4]
+    assert [item["text"] for item in result] == ["0", "1", "2", "3", "4"]
+
+
+def test_process_data_skips_failed_items(monkeypatch):
+    def mock_call_llm(message, sys_message, model, json_output):
+        if "1" in message:
+            raise ValueError("boom")
+        return json.dumps({"parsed": True})
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+
+    data = [{"text": str(i)} for i in range(3)]
+    result = process_data(
+        data=data,
+        key="text",
+        system_message_template="{output_model_str}",
+        message_template="{request}",
+        output_model_str="model",
+    )
+    assert result == [
+        {"text": "0", "parsed": True},
+        {"text": "1"},
+        {"text": "2", "parsed": True},
+    ]
+
+
+def test_call_llm_uses_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "use_cache", True)
+    monkeypatch.setattr(Config, "cache_path", tmp_path / "cache.sqlite")
+    monkeypatch.setattr("src.utils.cache._cache", None)
+
+    calls = []
+
+    def mock_complete(message, sys_message, model, json_output, completion_tokens):
+        calls.append(message)
+        return json.dumps({"parsed": message})
+
+    monkeypatch.setattr(llm, "_complete", mock_complete)
+
+    first = llm.call_llm("a", "system", "groq:model", json_output=True)
+    second = llm.call_llm("a", "system", "groq:model", json_output=True)
+    llm.call_llm("b", "system", "groq:model", json_output=True)
+
+    assert first == second
+    assert calls == ["a", "b"]
+
+
+def test_make_batches(monkeypatch):
+    monkeypatch.setattr(Config, "batch_max_items", 3)
+    data = [
+        {"text": "a" * 40, "restaurant": "r1"},
+        {"text": "a" * 40, "restaurant": "r2"},
+        {"text": "a" * 40, "restaurant": "r1"},
+        {"text": "a" * 40, "restaurant": "r1"},
+        {"text": "a" * 400, "restaurant": "r1"},
+    ]
+    batches = make_batches(data, "text", token_budget=40, group_key="restaurant")
+    assert batches == [[data[0], data[2], data[3]], [data[4]], [data[1]]]
+
+    batches = make_batches(data, "text", token_budget=25)
+    assert batches == [[data[0], data[1]], [data[2], data[3]], [data[4]]]
+
+
+def test_process_data_batched_with_fallback(monkeypatch):
+    calls = []
+    completion_tokens = []
+
+    def mock_call_llm(message, sys_message, model, json_output, **kwargs):
+        calls.append(message)
+        completion_tokens.append(kwargs.get("completion_tokens"))
+        if "item_id" in message:
+            # the answer for the second item is missing
+            return json.dumps(
+                {
+                    "items": [
+                        {"item_id": 0, "parsed": "batch"},
+                        {"item_id": 2, "parsed": "batch"},
+                    ]
+                }
+            )
+        return json.dumps({"parsed": "single"})
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+
+    data = [{"text": str(i)} for i in range(3)]
+    result = process_data(
+        data=data,
+        key="text",
+        system_message_template="{output_model_str}",
+        message_template="{request}",
+        output_model_str="model",
+        batch_token_budget=100,
+    )
+    assert [item["parsed"] for item in result] == ["batch", "single", "batch"]
+    assert len(calls) == 2
+    # the batch answer is budgeted for every item it holds
+    assert completion_tokens == [3 * Config.expected_completion_tokens, None]
+
+
+def test_process_data_batched_retries_malformed_answers(monkeypatch):
+    calls = []
+
+    def mock_call_llm(message, sys_message, model, json_output, **kwargs):
+        calls.append(message)
+        if "item_id" in message:
+            return json.dumps(
+                {
+                    "items": [
+                        {"item_id": 0, "parsed": "malformed"},
+                        {"item_id": 1, "parsed": "batch"},
+                        {"item_id": 2, "parsed": "batch"},
+                    ]
+                }
+            )
+        return json.dumps({"parsed": "single"})
+
+    def mock_validate_response(response, output_model):
+        if response["parsed"] == "malformed":
+            raise ValueError("malformed answer")
+        return response, {}
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+    monkeypatch.setattr(llm, "validate_response", mock_validate_response)
+
+    result = process_data(
+        data=[{"text": str(i)} for i in range(3)],
+        key="text",
+        system_message_template="{output_model_str}",
+        message_template="{request}",
+        output_model=RecipeModel,
+        batch_token_budget=100,
+    )
+    assert [item["parsed"] for item in result] == ["single", "batch", "batch"]
+    assert len(calls) == 2
+
+
+def test_process_data_resumes_from_journal(tmp_path, monkeypatch):
+    calls = []
+    fail = {"2"}
+
+    def mock_call_llm(message, sys_message, model, json_output):
+        calls.append(message)
+        if message in fail:
+            raise ValueError("boom")
+        return json.dumps({"parsed": message})
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+
+    def run():
+        return process_data(
+            data=[{"text": str(i)} for i in range(3)],
+            key="text",
+            system_message_template="{output_model_str}",
+            message_template="{request}",
+            output_model_str="model",
+            journal=ExtractionJournal.for_output(tmp_path / "out.json"),
+        )
+
+    result = run()
+    assert "parsed" not in result[2]
+    assert ExtractionJournal.for_output(tmp_path / "out.json").has_dead_letters()
+
+    calls.clear()
+    fail.clear()
+    result = run()
+    assert calls == ["2"]
+    assert [item["parsed"] for item in result] == ["0", "1", "2"]
+    assert not ExtractionJournal.for_output(tmp_path / "out.json").has_dead_letters()
+
+    # answers of another model are not resumed
+    calls.clear()
+    monkeypatch.setattr(Config, "model", "another-model")
+    run()
+    assert calls == ["0", "1", "2"]
+
+
+def test_process_data_reasks_invalid_fields(monkeypatch):
+    calls = []
+
+    def mock_call_llm(message, sys_message, model, json_output):
+        calls.append(message)
+        if "previous answer" in message:
+            return json.dumps({"recipe_group": "Ordine dei Naturalisti"})
+        return json.dumps(
+            {"recipe_ingredients": ["a"], "recipe_group": "something else entirely"}
+        )
+
+    monkeypatch.setattr(llm, "call_llm", mock_call_llm)
+
+    result = process_data(
+        data=[{"text": "0"}],
+        key="text",
+        system_message_template="{output_model_str}",
+        message_template="{request}",
+        output_model=RecipeModel,
+    )
+    assert result == [
+        {
+            "text": "0",
+            "recipe_ingredients": ["a"],
+            "recipe_group": "Ordine dei Naturalisti",
+        }
+    ]
+    assert len(calls) == 2
+    assert "recipe_ingredients" not in calls[1]
+
+
+def test_complete_reads_the_attempt_limit_at_call_time(monkeypatch):
+    attempts = []
+
+    def create(**kwargs):
+        attempts.append(kwargs["model"])
+        raise ValueError("provider down")
+
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    monkeypatch.setattr(llm, "get_client", lambda provider: client)
+    monkeypatch.setattr(Config, "backoff_multiplier", 0)
+    monkeypatch.setattr(Config, "llm_max_attempts", 2)
+
+    with pytest.raises(RetryError):
+        llm._complete("message", "system", "mock:model", False)
+    assert len(attempts) == 2
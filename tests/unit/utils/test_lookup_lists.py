@@ -0,0 +1,143 @@
+import random
+from difflib import get_close_matches
+
+import pytest
+
+from src.config import Config
+
+from src.utils.lookup_lists import (
+    Vocabulary,
+    build_technique_group_table,
+    get_vocabulary,
+    license_names,
+    technique_group_sizes,
+    technique_groups_names,
+    technique_names,
+)
+from src.utils.misc import clean_data, extract_technique_groups, normalise_string
+
+
+def closest(value, names):
+    normalised = [normalise_string(name) for name in names]
+    return normalise_string(
+        get_close_matches(normalise_string(value), normalised, n=1, cutoff=0)[0]
+    )
+
+
+def test_vocabulary_matches_difflib():
+    rng = random.Random(0)
+    vocabulary = Vocabulary(technique_names)
+    values = list(technique_names) + ["Marinatura Psionica", "cottura", "xyz", ""]
+    for name in rng.sample(technique_names, 20):
+        chars = list(name)
+        for _ in range(3):
+            chars[rng.randrange(len(chars))] = rng.choice("abcdefghij ")
+        values.append("".join(chars))
+
+    for value in values:
+        assert vocabulary.snap(value) == closest(value, technique_names), value
+
+
+def test_vocabulary_memo_is_bounded():
+    vocabulary = Vocabulary(license_names, memo_size=2)
+    for value in ["psionica", "temporale", "quantica", "psionica"]:
+        assert vocabulary.snap(value) == closest(value, license_names)
+
+    assert vocabulary._closest.cache_info().currsize == 2
+    assert vocabulary.snap("licenza luce (C)") == "licenza_luce_c_"
+    assert vocabulary._closest.cache_info().currsize == 2
+
+
+def test_clean_data_with_vocabulary():
+    data_list = [{"licence": {"a": "Licenza Psionica"}}, {"licence": ["luce"]}]
+
+    assert clean_data(data_list, "licence", Vocabulary(license_names)) == clean_data(
+        data_list, "licence", license_names
+    )
+
+
+def test_clean_data_snaps_distinct_values_together(monkeypatch):
+    vocabulary = Vocabulary(license_names)
+    data_list = [
+        {"licence": ["luce", "psionica"]},
+        {"licence": {"luce": "psionica"}},
+        {"chef_licences": {"Licenza Psionica": "II"}},
+    ]
+    expected = [
+        {"licence": [vocabulary.snap("luce"), vocabulary.snap("psionica")]},
+        {"licence": {"luce": vocabulary.snap("psionica")}},
+        {"chef_licences": {"Licenza Psionica": "II"}},
+    ]
+    calls = []
+    snap_many = vocabulary.snap_many
+
+    def record_snap_many(values):
+        calls.append(list(values))
+        return snap_many(values)
+
+    monkeypatch.setattr(vocabulary, "snap_many", record_snap_many)
+
+    assert clean_data(data_list, "licence", vocabulary) == expected
+    assert calls == [["luce", "psionica"]]
+
+
+def test_technique_group_table():
+    table = build_technique_group_table(
+        technique_names, technique_groups_names, technique_group_sizes
+    )
+
+    assert len(table) == len(technique_names)
+    assert set(table.values()) == {normalise_string(g) for g in technique_groups_names}
+    assert table["taglico_sinaptico_biomimetico"] == "tecniche_di_taglio"
+    assert table["cottura_idrodinamica_autoregolante"] == "cottura_al_vapore"
+    assert table["saltare_in_padella_sinergia_psionica"] == "cottura_al_salto"
+
+    with pytest.raises(ValueError):
+        build_technique_group_table(technique_names, technique_groups_names, [5, 5])
+    with pytest.raises(ValueError):
+        build_technique_group_table(
+            technique_names, technique_groups_names, technique_group_sizes[:-1] + [3]
+        )
+
+
+def test_extract_technique_groups_uses_the_table():
+    techniques = [
+        get_vocabulary("techniques").snap("Cottura Olografica Quantum Fluttuante"),
+        "cottura sottovuoto",
+    ]
+
+    assert extract_technique_groups(techniques) == [
+        "cottura_al_forno",
+        "cottura_sottovuoto",
+    ]
+
+
+def test_get_vocabulary_follows_the_config(monkeypatch):
+    monkeypatch.setattr(Config, "fuzzy_method", "difflib")
+    monkeypatch.setattr(Config, "fuzzy_cutoff", 0.0)
+    vocabulary = get_vocabulary("licences")
+    assert get_vocabulary("licences") is vocabulary
+    assert vocabulary.method == "difflib"
+
+    monkeypatch.setattr(Config, "fuzzy_method", "trigram")
+    trigram_vocabulary = get_vocabulary("licences")
+    assert trigram_vocabulary is not vocabulary
+    assert trigram_vocabulary.method == "trigram"
+    assert trigram_vocabulary.names == license_names
+
+
+def test_snap_many_batches_trigram_matching(monkeypatch):
+    vocabulary = Vocabulary(technique_names, method="trigram", cutoff=0.3)
+    values = ["Marinatura Psionica", "marinatura psionca", "xyz", "marinatura psionca"]
+    expected = [vocabulary.snap(value) for value in values]
+    calls = []
+    best_many = vocabulary.trigram_index.best_many
+
+    def record_best_many(unknown, cutoff):
+        calls.append(list(unknown))
+        return best_many(unknown, cutoff)
+
+    monkeypatch.setattr(vocabulary.trigram_index, "best_many", record_best_many)
+
+    assert vocabulary.snap_many(values) == expected
+    assert calls == [["marinatura_psionca", "xyz"]]
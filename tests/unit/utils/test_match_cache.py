@@ -0,0 +1,66 @@
+from src.utils.match_cache import MatchCache, canonical_question_key, corpus_version
+
+
+def test_canonical_question_key():
+    question = {
+        "ingredients": {"and": ["tomato", "cheese", "tomato"], "not": ["meat"]},
+        "techniques": {"and": [], "or": None},
+        "planet": ["mars", "earth"],
+        "licence_name": None,
+    }
+    reordered = {
+        "ingredients": {"not": ["meat"], "and": ["cheese", "tomato"]},
+        "planet": ["earth", "mars"],
+        "group": None,
+    }
+
+    assert canonical_question_key(question) == canonical_question_key(reordered)
+    assert canonical_question_key({"ingredients": {"and": []}}) == ()
+
+
+def test_canonical_question_key_keeps_or_multiplicity():
+    once = {"ingredients": {"or": ["a", "b"], "or_length": 2}}
+    twice = {"ingredients": {"or": ["a", "a", "b"], "or_length": 2}}
+
+    assert canonical_question_key(once) != canonical_question_key(twice)
+
+
+def test_canonical_question_key_of_irregular_question():
+    assert canonical_question_key({"ingredients": {"and": "tomato"}}) is None
+
+
+def test_match_cache_lru_and_version():
+    cache = MatchCache(max_entries=2)
+    cache.use_version("v1")
+    cache.set(("a",), [1])
+    cache.set(("b",), [2])
+    assert cache.get(("a",)) == [1]
+    cache.set(("c",), [3])
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == [1]
+
+    cache.use_version("v2")
+    assert len(cache) == 0
+
+
+def test_match_cache_evaluates_each_key_once():
+    questions = [
+        {"ingredients": {"and": ["a", "b"]}},
+        {"ingredients": {"and": ["b", "a"]}},
+        {"ingredients": {"and": "ab"}},
+        {"ingredients": {"and": ["c"]}},
+    ]
+    evaluated = []
+
+    def evaluate(batch):
+        evaluated.extend(batch)
+        return [[len(evaluated) - len(batch) + i] for i in range(len(batch))]
+
+    cache = MatchCache()
+    cache.use_version(corpus_version([{"recipe_name": "r"}]))
+
+    assert cache.match(questions, evaluate) == [[0], [0], [1], [2]]
+    assert evaluated == [questions[0], questions[2], questions[3]]
+    assert cache.match(questions[:2], evaluate) == [[0], [0]]
+    assert cache.stats() == {"hits": 3, "misses": 2, "hit_rate": 0.6}
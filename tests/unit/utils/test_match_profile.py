@@ -0,0 +1,89 @@
+import json
+
+from src.pipeline.matching import match_recipes
+from src.utils.match_profile import summarise_profiles
+from src.utils.matching import check_additional_filters
+from src.utils.recipe_index import RecipeIndex
+
+RECIPES = [
+    {
+        "recipe_name": "pizza",
+        "recipe_ingredients": ["tomato", "cheese"],
+        "recipe_restaurant": "r1",
+    },
+    {
+        "recipe_name": "salad",
+        "recipe_ingredients": ["tomato"],
+        "recipe_restaurant": "r2",
+    },
+    {"recipe_name": "stew", "recipe_ingredients": ["meat"], "recipe_restaurant": "r1"},
+    {"recipe_name": "odd", "recipe_ingredients": "meat", "recipe_restaurant": "r1"},
+]
+QUESTION = {"ingredients": {"and": ["tomato"]}, "restaurants": "r1"}
+
+
+def test_check_additional_filters_profile():
+    profile = {}
+    question = {"restaurants": "r2", "licence_name": "licenza psionica (P)"}
+
+    assert not check_additional_filters(question, RECIPES[0], profile)
+    assert not check_additional_filters(question, RECIPES[1], profile)
+    assert profile == {"restaurant": 1, "licence": 1}
+
+
+def test_explain_counts_eliminations_per_stage():
+    recipe_ids, report = RecipeIndex(RECIPES).explain(QUESTION)
+
+    assert recipe_ids == [0]
+    assert report["matches"] == 1
+    stages = {record["stage"]: record for record in report["stages"]}
+    assert stages["and"]["eliminated"] == 1
+    assert stages["restaurant"]["candidates"] == 2
+    assert stages["restaurant"]["eliminated"] == 1
+    # the malformed recipe goes through the per-recipe checks
+    assert stages["scan"]["eliminated_by"] == {"and": 1}
+
+
+def test_match_recipes_with_profile(tmp_path):
+    profile_path = tmp_path / "profile.json"
+
+    result = match_recipes(RECIPES, [dict(QUESTION)], profile_path=profile_path)
+
+    assert result[0]["matching_recipes"] == ["pizza"]
+    profile = json.loads(profile_path.read_text())
+    assert profile["questions"][0]["question_index"] == 0
+    assert [row["stage"] for row in profile["summary"]] == [
+        "and",
+        "restaurant",
+        "licence",
+        "scan",
+    ]
+
+
+def test_summarise_profiles():
+    reports = [
+        {
+            "stages": [
+                {"stage": "and", "candidates": 4, "eliminated": 3, "seconds": 0.5}
+            ]
+        },
+        {
+            "stages": [
+                {"stage": "and", "candidates": 4, "eliminated": 1, "seconds": 0.5}
+            ]
+        },
+    ]
+
+    summary = summarise_profiles(reports)
+
+    assert summary.to_dict(orient="records") == [
+        {
+            "stage": "and",
+            "runs": 2,
+            "candidates": 8,
+            "eliminated": 4,
+            "seconds": 1.0,
+            "eliminated_share": 0.5,
+            "ms_per_run": 500.0,
+        }
+    ]
@@ -2,11 +2,13 @@ import pandas as pd
 import pytest
 
 from src.utils.matching import (
+    add_legal_compliance,
     check_additional_filters,
     check_and_conditions,
     check_license_conditions,
     check_not_conditions,
     check_or_conditions,
+    parse_quantity,
 )
 
 
@@ -166,3 +168,39 @@ def test_check_license_conditions():
     assert not check_license_conditions(
         "licenza psionica (P)", "III", "higher", chef_licenses
     )
+
+
+def test_parse_quantity():
+    assert parse_quantity("12%") == 12
+    assert parse_quantity("5,5 %") == 5.5
+    assert parse_quantity(3) == 3
+    assert parse_quantity("qb") is None
+
+
+def test_add_legal_compliance(sample_data, monkeypatch):
+    question_and, question_or, recipe = sample_data
+    question_and["galactic_code"] = ["quantita legali"]
+    recipe["restricted_ingredients"] = [
+        {"recipe": "recipe1", "ingredient": "erba_pipa", "quantity": "12%"},
+        {"recipe": "other", "ingredient": "erba_pipa", "quantity": "50%"},
+    ]
+
+    table = add_legal_compliance([recipe], {"erba_pipa": 10.0})
+
+    assert table["recipes"] == [
+        {
+            "recipe_name": "recipe1",
+            "quantities": {"erba_pipa": 12.0},
+            "within_legal_limits": False,
+        }
+    ]
+    assert recipe["within_legal_limits"] is False
+
+    # the precomputed flag is used, the limits are not read again
+    def fail_read_csv(filepath):
+        raise AssertionError("limits read at matching time")
+
+    monkeypatch.setattr(pd, "read_csv", fail_read_csv)
+    assert not check_additional_filters(question_and, recipe)
+    recipe["within_legal_limits"] = True
+    assert check_additional_filters(question_and, recipe)
@@ -0,0 +1,66 @@
+import json
+
+from src.config import Config
+from src.pipeline.matching import match_recipes_pipeline, stream_matches
+from src.utils.misc import get_output_df
+
+RECIPES = [
+    {"recipe_name": "pizza", "recipe_ingredients": ["tomato", "cheese"]},
+    {"recipe_name": "salad", "recipe_ingredients": ["tomato"]},
+    {"recipe_name": "stew", "recipe_ingredients": ["meat"]},
+]
+QUESTIONS = [
+    {"ingredients": {"and": ["tomato"]}},
+    {"ingredients": {"and": ["meat"]}},
+    {"ingredients": {"and": ["fish"]}},
+    {"ingredients": {"or": ["cheese", "meat"]}},
+]
+MAPPING = {"pizza": 1, "salad": 2}
+
+
+def test_stream_matches(monkeypatch):
+    monkeypatch.setattr(Config, "matching_stream_window", 3)
+
+    result = list(stream_matches(RECIPES, iter(QUESTIONS), MAPPING))
+
+    assert result == [
+        (0, ["pizza", "salad"], [1, 2]),
+        (1, ["stew"], []),
+        (2, [], []),
+        (3, ["pizza", "stew"], [1]),
+    ]
+
+
+def test_match_recipes_pipeline_writes_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "matching_stream_window", 2)
+    output_path = tmp_path / "result.jsonl"
+    csv_path = tmp_path / "result.csv"
+
+    count = match_recipes_pipeline(output_path, csv_path, RECIPES, QUESTIONS, MAPPING)
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert count == 4
+    assert [r["matching_recipes_ids"] for r in records] == [[1, 2], [], [], [1]]
+    assert records[0]["ingredients"] == {"and": ["tomato"]}
+    assert csv_path.read_text() == get_output_df(records).to_csv(index=False)
+    assert not (tmp_path / "result.jsonl.partial").exists()
+
+
+def test_match_recipes_pipeline_resumes_partial_outputs(tmp_path):
+    output_path = tmp_path / "result.jsonl"
+    done = {
+        "row_id": 1,
+        "matching_recipes": ["previous"],
+        "matching_recipes_ids": [9],
+    }
+    (tmp_path / "result.jsonl.partial").write_text(
+        json.dumps(done) + "\n" + '{"row_id": 2, "matc'
+    )
+
+    match_recipes_pipeline(
+        output_path, tmp_path / "result.csv", RECIPES, QUESTIONS, MAPPING
+    )
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [r["matching_recipes_ids"] for r in records] == [[9], [], [], [1]]
+    assert (tmp_path / "result.csv").read_text().splitlines()[1] == "1,9"
@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import Config
+from src.datamodels import RecipeModel, RequestModel, RestaurantModel
+from src.utils import clients
+from src.utils.llm import get_model_source, process_data
+from src.utils.mock_llm import MockClient, MockLLMError, MockRateLimitError
+
+
+def _messages(model_name, message="text"):
+    return [
+        {"role": "system", "content": get_model_source("src.datamodels", model_name)},
+        {"role": "user", "content": message},
+    ]
+
+
+def _content(response):
+    return response.choices[0].message.content
+
+
+@pytest.mark.parametrize("model", [RecipeModel, RestaurantModel, RequestModel])
+def test_synthetic_mode_is_schema_valid(model):
+    client = MockClient(mode="synthetic", latency_mean=0, latency_std=0)
+    response = client.chat.completions.create(
+        model="mock:model", messages=_messages(model.__name__)
+    )
+    model.model_validate(json.loads(_content(response)))
+
+
+def test_synthetic_mode_is_deterministic():
+    first = MockClient(mode="synthetic", latency_mean=0, latency_std=0)
+    second = MockClient(mode="synthetic", latency_mean=0, latency_std=0)
+    messages = _messages("RecipeModel")
+    assert _content(first.create("mock:model", messages)) == _content(
+        second.create("mock:model", messages)
+    )
+
+
+def test_synthetic_mode_answers_batches():
+    client = MockClient(mode="synthetic", latency_mean=0, latency_std=0)
+    message = "### item_id: 0\ntext\n### item_id: 1\ntext"
+    response = client.create("mock:model", _messages("RecipeModel", message))
+    items = json.loads(_content(response))["items"]
+    assert [item["item_id"] for item in items] == [0, 1]
+
+
+def test_record_and_replay(tmp_path, monkeypatch):
+    recordings_path = tmp_path / "recordings.jsonl"
+
+    def mock_create(model, messages, **kwargs):
+        assert model == "groq:model"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"a": 1}'))]
+        )
+
+    real_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=mock_create))
+    )
+    monkeypatch.setattr(clients, "get_client", lambda provider: real_client)
+
+    recorder = MockClient(
+        mode="record", recordings_path=recordings_path, latency_mean=0, latency_std=0
+    )
+    recorder.create("mock:model", _messages("RecipeModel"))
+
+    player = MockClient(
+        mode="replay", recordings_path=recordings_path, latency_mean=0, latency_std=0
+    )
+    assert _content(player.create("mock:model", _messages("RecipeModel"))) == '{"a": 1}'
+    with pytest.raises(MockLLMError):
+        player.create("mock:model", _messages("RecipeModel", "other"))
+
+
+def test_injected_failures():
+    client = MockClient(
+        mode="synthetic", latency_mean=0, latency_std=0, rate_limit_rate=1.0
+    )
+    with pytest.raises(MockRateLimitError):
+        client.create("mock:model", _messages("RecipeModel"))
+
+    client = MockClient(mode="synthetic", latency_mean=0, latency_std=0, error_rate=1.0)
+    with pytest.raises(MockLLMError):
+        client.create("mock:model", _messages("RecipeModel"))
+
+
+def test_process_data_with_mock_provider(monkeypatch):
+    monkeypatch.setattr(Config, "provider", "mock")
+    monkeypatch.setattr(Config, "use_cache", False)
+    monkeypatch.setattr(Config, "mock_mode", "synthetic")
+    monkeypatch.setattr(Config, "mock_latency_mean", 0)
+    monkeypatch.setattr(Config, "mock_latency_std", 0)
+    clients.close_clients()
+
+    data = [{"recipe_text": f"recipe {i}"} for i in range(4)]
+    result = process_data(
+        data=data,
+        key="recipe_text",
+        system_message_template=Config.system_message_template_recipes,
+        message_template=Config.message_template_recipes,
+        output_model_str=get_model_source("src.datamodels", "RecipeModel"),
+        batch_token_budget=100,
+    )
+    for item in result:
+        RecipeModel.model_validate(item)
+        assert "recipe_ingredients" in item
+    clients.close_clients()
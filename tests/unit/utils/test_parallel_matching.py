@@ -0,0 +1,81 @@
+import json
+import random
+
+import pytest
+
+from src.config import Config
+from src.pipeline.matching import match_recipes
+from src.utils.parallel_matching import ParallelMatcher, match_in_parallel
+from src.utils.recipe_index import RecipeIndex
+
+from .test_recipe_index import brute_force, random_question, random_recipe
+
+pytestmark = pytest.mark.usefixtures("legal_limits")
+
+
+def test_match_in_parallel_keeps_question_order():
+    rng = random.Random(2)
+    recipes = [random_recipe(rng, i) for i in range(100)]
+    questions = [random_question(rng) for _ in range(50)]
+    index = RecipeIndex(recipes)
+
+    result = match_in_parallel(index, questions, workers=3, chunk_size=7)
+
+    assert result == [brute_force(recipes, q) for q in questions]
+
+
+def test_parallel_matcher_reuses_its_pool(monkeypatch):
+    rng = random.Random(4)
+    recipes = [random_recipe(rng, i) for i in range(60)]
+    windows = [
+        [{**random_question(rng), "galactic_code": None} for _ in range(20)]
+        for _ in range(3)
+    ]
+    index = RecipeIndex(recipes)
+    legal_calls = []
+    monkeypatch.setattr(index, "legal", lambda: legal_calls.append(1))
+
+    results, pools = [], []
+    with ParallelMatcher(index, workers=2, chunk_size=5) as matcher:
+        for window in windows:
+            results.append(matcher.match(window))
+            pools.append(matcher.pool)
+
+    assert pools[0] is not None and pools == [pools[0]] * 3
+
+    assert matcher.pool is None
+    assert results == [[brute_force(recipes, q) for q in window] for window in windows]
+    # no question has a galactic code clause
+    assert legal_calls == []
+
+
+def test_parallel_matcher_raises_legal_limit_errors(monkeypatch):
+    rng = random.Random(5)
+    index = RecipeIndex([random_recipe(rng, i) for i in range(10)])
+
+    def legal():
+        raise FileNotFoundError("illegal_ingredients.csv")
+
+    monkeypatch.setattr(index, "legal", legal)
+    questions = [{**random_question(rng), "galactic_code": ["gc"]} for _ in range(2)]
+
+    with ParallelMatcher(index, workers=2, chunk_size=1) as matcher:
+        with pytest.raises(FileNotFoundError):
+            matcher.match(questions)
+        assert matcher.pool is None
+
+
+def test_match_recipes_single_worker_is_serial(monkeypatch):
+    rng = random.Random(3)
+    recipes = [random_recipe(rng, i) for i in range(50)]
+    questions = [random_question(rng) for _ in range(20)]
+
+    serial = [
+        [recipes[i]["recipe_name"] for i in RecipeIndex(recipes).match(q)]
+        for q in questions
+    ]
+    monkeypatch.setattr(Config, "matching_workers", 1)
+    monkeypatch.setattr(Config, "matching_chunk_size", 4)
+    result = match_recipes(recipes, [dict(q) for q in questions], mode="index")
+
+    assert json.dumps([q["matching_recipes"] for q in result]) == json.dumps(serial)
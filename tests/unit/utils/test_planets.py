@@ -0,0 +1,82 @@
+import numpy as np
+
+from src.config import Config
+from src.utils.matching import check_additional_filters
+from src.utils.planets import (
+    PlanetDistanceIndex,
+    add_question_planet_ids,
+    add_recipe_planet_ids,
+)
+from src.utils.questions import update_planet_keys
+
+
+def write_distances(tmp_path):
+    distances_path = tmp_path / "distances.csv"
+    distances_path.write_text(
+        "/,Earth,Mars,Venus\nEarth,0,30,20\nMars,30,0,50\nVenus,20,50,0\n"
+    )
+    return distances_path
+
+
+def test_planet_distance_index(tmp_path):
+    index = PlanetDistanceIndex.from_csv(write_distances(tmp_path))
+
+    assert index.names == ["earth", "mars", "venus"]
+    assert index.planet_id("Mars") == 1
+    assert index.planet_ids(["earth", "pluto"]) is None
+    assert index.within([0], 25).tolist() == [0, 2]
+    assert index.within([1, 2], 15).tolist() == [1, 2]
+
+
+def test_planet_distance_index_cache(tmp_path):
+    distances_path = write_distances(tmp_path)
+    cache_path = tmp_path / "distances.npz"
+
+    index = PlanetDistanceIndex.load(distances_path, cache_path)
+    assert cache_path.exists()
+
+    cached = PlanetDistanceIndex.load(distances_path, cache_path)
+    assert cached.names == index.names
+    assert np.array_equal(cached.distances, index.distances)
+
+    # a changed CSV invalidates the cache
+    distances_path.write_text("/,Earth,Mars\nEarth,0,5\nMars,5,0\n")
+    changed = PlanetDistanceIndex.load(distances_path, cache_path)
+    assert changed.names == ["earth", "mars"]
+
+
+def test_update_planet_keys_uses_every_origin(tmp_path):
+    questions = [{"planet": ["mars", "venus"], "planet_distance": 15}]
+
+    result = update_planet_keys(questions, write_distances(tmp_path))
+
+    assert result[0]["planet"] == ["mars", "venus"]
+
+
+def test_planet_ids_in_additional_filters(tmp_path):
+    index = PlanetDistanceIndex.from_csv(write_distances(tmp_path))
+    questions = add_question_planet_ids(
+        [{"planet": ["earth", "venus"]}, {"planet": ["earth", "pluto"]}], index
+    )
+    recipes = add_recipe_planet_ids(
+        [{"restaurant_planet": "venus"}, {"restaurant_planet": "mars"}], index
+    )
+
+    assert questions[0]["planet_ids"] == [0, 2]
+    assert "planet_ids" not in questions[1]
+    assert [r["restaurant_planet_id"] for r in recipes] == [2, 1]
+    assert check_additional_filters(questions[0], recipes[0])
+    assert not check_additional_filters(questions[0], recipes[1])
+    assert not check_additional_filters(questions[1], recipes[1])
+
+
+def test_planet_distance_index_cache_defaults_to_config(tmp_path, monkeypatch):
+    distances_path = tmp_path / "raw" / "distances.csv"
+    distances_path.parent.mkdir()
+    distances_path.write_text("/,Earth,Mars\nEarth,0,5\nMars,5,0\n")
+    cache_path = tmp_path / "cache" / "planets.npz"
+    monkeypatch.setattr(Config, "planet_index_cache_path", cache_path)
+
+    PlanetDistanceIndex.load(distances_path)
+    assert cache_path.exists()
+    assert list(distances_path.parent.iterdir()) == [distances_path]
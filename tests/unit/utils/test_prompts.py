@@ -0,0 +1,37 @@
+from src.datamodels import RecipeModel
+from src.utils.prompts import compact_schema, compile_prompt, dedent
+
+
+def test_compact_schema():
+    schema = compact_schema(RecipeModel)
+    assert schema.splitlines()[0].startswith("RecipeModel")
+    assert (
+        "- recipe_ingredients (list[str]): List of ingredients that compose a recipe"
+        in schema
+    )
+    assert '"Ordine dei Naturalisti"|"Ordine degli Armonisti"' in schema
+
+
+def test_dedent():
+    template = """
+    First line
+        nested {{ brace }}
+    Last line
+    """
+    assert dedent(template) == "First line\n    nested {{ brace }}\nLast line"
+
+
+def test_compile_prompt():
+    prompt = compile_prompt(
+        "    Schema:\n{output_model_str}",
+        "    Static part.\n    Request: {request}",
+        RecipeModel,
+    )
+    assert prompt.system_message == "Schema:\n" + compact_schema(RecipeModel)
+    assert prompt.render("text") == "Static part.\nRequest: text"
+    assert prompt.tokens["system"] > 0
+    assert compile_prompt(
+        "    Schema:\n{output_model_str}",
+        "    Static part.\n    Request: {request}",
+        RecipeModel,
+    ) is prompt
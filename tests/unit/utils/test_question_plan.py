@@ -0,0 +1,91 @@
+import pytest
+
+from src.utils.recipe_index import RecipeIndex
+
+
+@pytest.fixture
+def index():
+    recipes = [
+        {
+            "recipe_name": "recipe1",
+            "recipe_ingredients": ["tomato", "cheese", "basil"],
+            "recipe_techniques": ["baking"],
+            "recipe_restaurant": "restaurant1",
+            "chef_licences": {"licenza psionica (P)": 2},
+        },
+        {
+            "recipe_name": "recipe2",
+            "recipe_ingredients": ["tomato", "meat"],
+            "recipe_techniques": ["grilling"],
+            "recipe_restaurant": "restaurant2",
+            "chef_licences": {},
+        },
+        {
+            "recipe_name": "recipe3",
+            "recipe_ingredients": ["tomato", "banana"],
+            "recipe_techniques": ["baking"],
+            "recipe_restaurant": "restaurant2",
+            "chef_licences": None,
+        },
+    ]
+    return RecipeIndex(recipes)
+
+
+def test_plan_orders_stages_by_selectivity(index):
+    plan = index.compile(
+        {
+            "ingredients": {"and": ["tomato", "basil"], "not": ["banana"]},
+            "restaurants": "restaurant1",
+            "licence_name": "licenza psionica (P)",
+        }
+    )
+
+    stages = plan.describe()
+    assert [stage["stage"] for stage in stages] == [
+        "and",
+        "restaurant",
+        "not",
+        "licence",
+    ]
+    assert [stage["estimate"] for stage in stages] == [1, 1, 2, 2]
+    assert stages[0]["args"] == {"terms": ["tomato", "basil"]}
+    assert index.match(plan.question) == [0]
+
+
+def test_plan_drops_empty_clauses(index):
+    plan = index.compile(
+        {
+            "ingredients": {"and": [], "or": None, "not": []},
+            "techniques": None,
+            "planet": [],
+            "sirius_flag": True,
+            "sirius_techniques_groups": None,
+        }
+    )
+
+    # the licence check still rejects the recipes without chef licences
+    assert [stage["stage"] for stage in plan.describe()] == ["licence"]
+    assert list(index.match(plan.question)) == [0, 1]
+
+
+def test_plan_stops_when_no_candidate_is_left(index):
+    plan = index.compile(
+        {
+            "ingredients": {"and": ["salt"]},
+            "licence_level": "II",
+            "licence_condition": "higher",
+        }
+    )
+    calls = []
+    index.licences = lambda *args: calls.append(args) or 0
+
+    assert plan.execute() == 0
+    assert calls == []
+
+
+def test_plan_of_irregular_question_scans(index):
+    # a string is checked character by character by check_not_conditions
+    plan = index.compile({"ingredients": {"not": "tomato"}})
+
+    assert plan.describe()[0]["stage"] == "scan"
+    assert index.match(plan.question) == [0, 1]
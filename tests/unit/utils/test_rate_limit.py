@@ -0,0 +1,52 @@
+import time
+from types import SimpleNamespace
+
+from src.utils.mock_llm import MockRateLimitError
+from src.utils.rate_limit import RateLimiter, TokenBucket, retry_after_seconds
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=10, refill_per_second=100)
+    assert bucket.acquire(10) == 0
+
+    start = time.monotonic()
+    bucket.acquire(5)
+    assert time.monotonic() - start >= 0.04
+
+
+def test_token_bucket_caps_large_requests():
+    bucket = TokenBucket(capacity=1, refill_per_second=100)
+    bucket.acquire(1_000)
+    assert bucket.tokens == 0
+
+
+def test_rate_limiter_pause():
+    limiter = RateLimiter(requests_per_minute=6_000, tokens_per_minute=6_000)
+    limiter.pause(0.05)
+
+    start = time.monotonic()
+    limiter.acquire(1)
+    assert time.monotonic() - start >= 0.05
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(MockRateLimitError(retry_after=3)) == 3
+
+    error = Exception("boom")
+    error.response = SimpleNamespace(headers={"retry-after": "7"})
+    assert retry_after_seconds(error) == 7
+
+    error = Exception(
+        "An error occurred: Error code: 429 - Rate limit reached. Please try again in 1m2.5s."
+    )
+    assert retry_after_seconds(error) == 62.5
+
+    try:
+        try:
+            raise MockRateLimitError(retry_after=4)
+        except MockRateLimitError as e:
+            raise ValueError("wrapped") from e
+    except ValueError as e:
+        assert retry_after_seconds(e) == 4
+
+    assert retry_after_seconds(ValueError("boom")) is None
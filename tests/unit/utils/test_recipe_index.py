@@ -0,0 +1,142 @@
+import random
+
+import pytest
+
+from src.utils.matching import (
+    check_additional_filters,
+    check_and_conditions,
+    check_not_conditions,
+    check_or_conditions,
+)
+from src.utils.recipe_index import RecipeIndex, iter_bits, to_bits
+
+pytestmark = pytest.mark.usefixtures("legal_limits")
+
+INGREDIENTS = ["tomato", "cheese", "basil", "meat", "banana"]
+TECHNIQUES = ["baking", "grilling", "frying", "boiling"]
+GROUPS = ["group1", "group2", "group3"]
+PLANETS = ["planet1", "planet2", "planet3"]
+RESTAURANTS = ["restaurant1", "restaurant2"]
+LICENCES = ["licenza psionica (P)", "licenza quantica (Q)"]
+KEYS = [("ingredients", "recipe_ingredients"), ("techniques", "recipe_techniques")]
+
+
+def brute_force(recipes, question):
+    return [
+        i
+        for i, recipe in enumerate(recipes)
+        if check_and_conditions(question, recipe, KEYS)
+        and check_or_conditions(question, recipe, KEYS)
+        and check_not_conditions(question, recipe, KEYS)
+        and check_additional_filters(question, recipe)
+    ]
+
+
+def maybe(rng, value, p=0.5):
+    return value if rng.random() < p else None
+
+
+def random_recipe(rng, i):
+    recipe = {
+        "recipe_name": f"recipe{i}",
+        "recipe_ingredients": maybe(
+            rng, rng.sample(INGREDIENTS, rng.randint(0, 4)), 0.9
+        ),
+        "recipe_techniques": maybe(rng, rng.sample(TECHNIQUES, rng.randint(0, 3)), 0.9),
+        "recipe_technique_groups": rng.sample(GROUPS, rng.randint(0, 2)),
+        "recipe_group": maybe(rng, rng.choice(["groupA", "groupB"])),
+        "recipe_restaurant": maybe(rng, rng.choice(RESTAURANTS), 0.8),
+        "restaurant_planet": maybe(rng, rng.choice(PLANETS), 0.8),
+        "chef_licences": maybe(
+            rng,
+            {
+                name: rng.choice(["I", "II", "III", 0, 3])
+                for name in rng.sample(LICENCES, rng.randint(0, 2))
+            },
+            0.9,
+        ),
+        "restricted_ingredients": [
+            {"recipe": f"recipe{i}", "ingredient": "Erba Pipa", "quantity": q}
+            for q in rng.sample(["3%", "12%"], rng.randint(0, 1))
+        ],
+    }
+    if recipe["restaurant_planet"] and rng.random() < 0.7:
+        recipe["restaurant_planet_id"] = PLANETS.index(recipe["restaurant_planet"])
+    if rng.random() < 0.05:
+        # a malformed LLM answer, handled by the per-recipe checks
+        recipe["recipe_ingredients"] = "tomato cheese"
+    return recipe
+
+
+def random_clause(rng, terms):
+    clause = {}
+    for op in ["and", "or", "not"]:
+        clause[op] = maybe(rng, rng.choices(terms, k=rng.randint(0, 3)))
+    clause["or_length"] = maybe(rng, rng.randint(0, 3), 0.7)
+    if rng.random() < 0.3:
+        del clause["or_length"]
+    return maybe(rng, clause, 0.8)
+
+
+def random_question(rng):
+    question = {
+        "ingredients": random_clause(rng, INGREDIENTS),
+        "techniques": random_clause(rng, TECHNIQUES),
+        "group": maybe(rng, rng.choice(["groupA", "groupB"]), 0.2),
+        "restaurants": maybe(rng, rng.choice(RESTAURANTS), 0.2),
+        "planet": maybe(rng, rng.sample(PLANETS, rng.randint(0, 2)), 0.3),
+        "sirius_flag": rng.random() < 0.3,
+        "sirius_techniques_groups": maybe(rng, rng.sample(GROUPS, rng.randint(0, 2))),
+        "licence_name": maybe(rng, rng.choice(LICENCES), 0.3),
+        "licence_level": maybe(rng, rng.choice(["I", "II", "III", 2]), 0.3),
+        "licence_condition": maybe(rng, rng.choice(["higher", "equal"]), 0.3),
+        "galactic_code": maybe(rng, ["quantita legali"], 0.2),
+    }
+    if question["planet"] and rng.random() < 0.7:
+        question["planet_ids"] = [
+            PLANETS.index(planet) for planet in question["planet"]
+        ]
+    return question
+
+
+def test_bits_roundtrip():
+    assert list(iter_bits(to_bits([0, 3, 9, 64], 70))) == [0, 3, 9, 64]
+    assert to_bits([], 10) == 0
+
+
+def test_recipe_index_matches_checks():
+    rng = random.Random(0)
+    recipes = [random_recipe(rng, i) for i in range(200)]
+    index = RecipeIndex(recipes)
+
+    for _ in range(500):
+        question = random_question(rng)
+        assert index.match(question) == brute_force(recipes, question), question
+
+
+def test_recipe_index_or_length():
+    recipes = [
+        {"recipe_ingredients": ["a", "b"]},
+        {"recipe_ingredients": ["a"]},
+        {"recipe_ingredients": None},
+    ]
+    index = RecipeIndex(recipes)
+    assert index.match({"ingredients": {"or": ["a", "b", "c"], "or_length": 2}}) == [0]
+    assert index.match({"ingredients": {"or": ["a", "a"], "or_length": 2}}) == [0, 1]
+    assert index.match({"ingredients": {"or": ["c"], "or_length": None}}) == [0, 1]
+
+
+def test_recipe_index_compares_planet_ids():
+    recipes = [
+        {"recipe_name": "a", "restaurant_planet": "Pandora", "restaurant_planet_id": 0},
+        {"recipe_name": "b", "restaurant_planet": "pandora"},
+        {"recipe_name": "c", "restaurant_planet": "ego", "restaurant_planet_id": 1},
+        {"recipe_name": "d", "restaurant_planet": None},
+    ]
+    question = {"planet": ["pandora"], "planet_ids": [0]}
+    index = RecipeIndex(recipes)
+
+    assert index.match(question) == brute_force(recipes, question) == [0, 1, 3]
+    assert index.match({"planet": ["pandora"]}) == brute_force(
+        recipes, {"planet": ["pandora"]}
+    )
@@ -0,0 +1,151 @@
+import copy
+import json
+
+from src.utils.lookup_lists import get_vocabulary
+from src.utils.match_cache import corpus_version
+from src.utils.misc import clean_data
+from src.utils.recipe_index import RecipeIndex
+from src.utils.recipe_store import RESTAURANT_KEYS, RecipeRecord, RecipeStore
+from src.utils.recipes import add_restaurant_info_to_recipes
+
+RESTAURANTS = [
+    {
+        "restaurant_name": "pizza_place",
+        "chef_name": "mario",
+        "restaurant_planet": "pandora",
+        "chef_licences": {"licenza_psionica_p_": 3},
+        "source_file": "pizza_place.md",
+    },
+    {"restaurant_name": "pasta_house", "restaurant_planet": "ego"},
+]
+
+RECIPES = [
+    {
+        "recipe_name": "margherita",
+        "recipe_restaurant": "pizza_place",
+        "chef_name": "luigi",
+        "source_file": "menu.md",
+        "recipe_ingredients": ["tomato", "basil", "tomato"],
+        "recipe_techniques": ["marinatura psionca", "bollitura entropica"],
+    },
+    {
+        "recipe_name": "carbonara",
+        "recipe_restaurant": "pasta_house",
+        "recipe_ingredients": ["egg", "basil"],
+        "recipe_techniques": None,
+    },
+    {
+        "recipe_name": "orphan",
+        "recipe_restaurant": "nowhere",
+        "recipe_ingredients": "egg",
+    },
+]
+
+
+def join(recipes):
+    shared = [
+        {k: v for k, v in r.items() if k in RESTAURANT_KEYS or k == "restaurant_name"}
+        for r in RESTAURANTS
+    ]
+    return add_restaurant_info_to_recipes(copy.deepcopy(recipes), shared)
+
+
+def test_store_exports_the_joined_json_shape():
+    store = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+    expected = join(RECIPES)
+
+    assert list(store.to_json()) == expected
+    assert [dict(record) for record in store] == expected
+    # only the RESTAURANT_KEYS fields come from the restaurant
+    assert store[0]["chef_name"] == "luigi"
+    assert store[0]["source_file"] == "menu.md"
+    assert "source_file" not in store[1]
+    assert store[0].get("recipe_ingredients") == ["tomato", "basil", "tomato"]
+    assert store[2].get("restaurant_planet") is None
+    assert "chef_licences" not in store[1]
+
+    # restaurant fields are shared, not copied on every recipe
+    assert "restaurant_planet" not in store[0].fields
+    assert store[0].get("chef_licences") is RESTAURANTS[0]["chef_licences"]
+    assert len(store.dictionary) == 5
+
+
+def test_store_round_trips_a_joined_corpus(tmp_path):
+    joined = join(RECIPES)
+    store = RecipeStore.from_json(joined, RESTAURANTS)
+    path = tmp_path / "recipes.json"
+    store.save(path)
+
+    assert path.read_text() == json.dumps(joined, indent=4)
+    assert list(RecipeStore.load(path).to_json()) == joined
+
+    empty = tmp_path / "empty.json"
+    RecipeStore().save(empty)
+    assert empty.read_text() == json.dumps([], indent=4)
+
+
+def test_record_writes_shadow_the_restaurant():
+    store = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+    record = store[0]
+
+    record["restaurant_planet_id"] = 5
+    record["restaurant_planet"] = "ego"
+    record["recipe_technique_groups"] = ["marinatura"]
+    assert record["restaurant_planet"] == "ego"
+    assert store[1]["restaurant_planet"] == "ego"
+    assert store.records[0].fields["recipe_technique_groups"].typecode == "I"
+
+    del record["chef_licences"]
+    assert "chef_licences" not in record
+    assert RESTAURANTS[0]["chef_licences"] == {"licenza_psionica_p_": 3}
+    assert record.pop("restaurant_planet_id") == 5
+    assert "restaurant_planet_id" not in record.to_dict()
+
+
+def test_store_clean_matches_clean_data():
+    store = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+    expected = join(RECIPES)
+    technique_vocabulary = get_vocabulary("techniques")
+    for key in ["recipe_techniques", "recipe_ingredients"]:
+        store.clean(key, technique_vocabulary)
+        expected = clean_data(expected, key, technique_vocabulary)
+
+    assert list(store.to_json()) == expected
+    assert store[0]["recipe_techniques"] == [
+        "marinatura_psionica",
+        "bollitura_entropica_sincronizzata",
+    ]
+
+
+def test_store_version_is_kept_until_a_change(monkeypatch):
+    store = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+    same = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+
+    def no_decoding(self):
+        raise AssertionError("records are hashed without decoding them")
+
+    monkeypatch.setattr(RecipeRecord, "to_dict", no_decoding)
+    version = corpus_version(store.records)
+    assert version == store.version() == same.version()
+    assert store._version == version
+
+    store[1]["recipe_group"] = "groupA"
+    assert store._version is None
+    assert corpus_version(store.records) != version
+
+
+def test_index_reads_the_term_ids_of_records(monkeypatch):
+    store = RecipeStore.from_json(copy.deepcopy(RECIPES), RESTAURANTS)
+    expected = RecipeIndex(list(store.to_json()))
+
+    def decode(ids):
+        raise AssertionError("term lists should not be decoded")
+
+    monkeypatch.setattr(store.dictionary, "decode", decode)
+    index = RecipeIndex(store.records)
+
+    assert index.bits == expected.bits
+    assert index.terms == expected.terms
+    ids = store[1].fields["recipe_ingredients"]
+    assert store[1].term_ids("recipe_ingredients") is ids
+    assert store[2].term_ids("recipe_ingredients") is None
@@ -0,0 +1,77 @@
+from array import array
+
+from src.utils.terms import (
+    TermDictionary,
+    find_unknown_terms,
+    snap_question_terms,
+    term_dictionaries,
+)
+
+RECIPES = [
+    {
+        "recipe_ingredients": ["tomato", "basil", "tomato"],
+        "recipe_techniques": ["boiling"],
+    },
+    {"recipe_ingredients": ["mozzarella", "basil"], "recipe_techniques": "frying"},
+    {"recipe_name": "no terms"},
+]
+
+
+def test_term_dictionary_encode_and_decode():
+    dictionary = TermDictionary()
+
+    assert dictionary.encode(["tomato", "basil", "tomato"]) == array("I", [0, 1])
+    assert dictionary.encode(["basil", "mozzarella"]) == array("I", [1, 2])
+    assert dictionary.decode([2, 0]) == ["mozzarella", "tomato"]
+    ordered = dictionary.encode(["mozzarella", "basil", "basil"], keep_order=True)
+    assert ordered == array("I", [2, 1, 1])
+    assert "salt" not in dictionary and len(dictionary) == 3
+
+
+def test_term_dictionaries_skip_irregular_values():
+    dictionaries = term_dictionaries(RECIPES)
+
+    assert dictionaries["recipe_ingredients"].terms == ["tomato", "basil", "mozzarella"]
+    assert dictionaries["recipe_techniques"].terms == ["boiling"]
+    assert dictionaries["recipe_technique_groups"].terms == []
+
+
+def test_unknown_question_terms_are_reported_and_snapped():
+    dictionaries = term_dictionaries(RECIPES)
+    questions = [
+        {"ingredients": {"and": ["tomatos", "basil"], "not": ["tomatos"]}},
+        {"ingredients": {"or": ["basil"]}, "techniques": {"and": ["grilling"]}},
+        {"ingredients": "tomato"},
+    ]
+
+    assert find_unknown_terms(questions, dictionaries) == {
+        ("ingredients", "tomatos"): [0],
+        ("techniques", "grilling"): [1],
+    }
+
+    snap_question_terms(questions, dictionaries, cutoff=0.8)
+    assert questions[0]["ingredients"] == {
+        "and": ["tomato", "basil"],
+        "not": ["tomato"],
+    }
+    assert questions[1]["techniques"] == {"and": ["grilling"]}
+    assert find_unknown_terms(questions, dictionaries) == {
+        ("techniques", "grilling"): [1]
+    }
+
+
+def test_question_terms_are_resolved_within_their_field():
+    dictionaries = term_dictionaries(RECIPES)
+    questions = [
+        {"ingredients": {"and": ["boiling"]}, "techniques": {"or": ["basil", "boilng"]}}
+    ]
+
+    assert find_unknown_terms(questions, dictionaries) == {
+        ("ingredients", "boiling"): [0],
+        ("techniques", "basil"): [0],
+        ("techniques", "boilng"): [0],
+    }
+
+    snap_question_terms(questions, dictionaries, cutoff=0.8)
+    assert questions[0]["ingredients"] == {"and": ["boiling"]}
+    assert questions[0]["techniques"] == {"or": ["basil", "boiling"]}
@@ -0,0 +1,52 @@
+from src.datamodels import RecipeModel, RequestModel
+from src.utils.validation import validate_response
+
+
+def test_validate_response_accepts_valid_answers():
+    response = {
+        "ingredients": {"and": ["a"], "or": None, "or_length": None, "not": ["b"]},
+        "restaurants": None,
+        "planet": ["Asgard"],
+        "licence_level": "II",
+        "technique_groups": {"and": []},
+    }
+    result, invalid = validate_response(response, RequestModel)
+    assert result == response
+    assert invalid == {}
+
+
+def test_validate_response_coerces_values():
+    response = {
+        "ingredients": {"and": "a", "nott": ["b"]},
+        "restaurants": "anima cosmica",
+        "planet": ["asgard"],
+        "planet_distance": "10",
+    }
+    result, invalid = validate_response(response, RequestModel)
+    assert result == {
+        "ingredients": {"and": ["a"], "not": ["b"]},
+        "restaurants": "Anima Cosmica",
+        "planet": ["Asgard"],
+        "planet_distance": 10,
+    }
+    assert invalid == {}
+
+
+def test_validate_response_reports_invalid_fields():
+    response = {
+        "recipe_ingredients": ["a"],
+        "recipe_group": "something else entirely",
+    }
+    result, invalid = validate_response(response, RecipeModel)
+    assert result == response
+    assert list(invalid) == ["recipe_group"]
+
+
+def test_validate_response_reports_mistyped_clauses():
+    response = {
+        "ingredients": {"or": ["a"], "or_length": ["2"]},
+        "techniques": {"and": ["b"], "or_length": "2", "nott": ["c"]},
+    }
+    result, invalid = validate_response(response, RequestModel)
+    assert list(invalid) == ["ingredients"]
+    assert result["techniques"] == {"and": ["b"], "or_length": 2, "not": ["c"]}